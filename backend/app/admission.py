@@ -0,0 +1,278 @@
+"""
+Admission control for /api/query and /api/query/batch.
+
+Each gunicorn worker answers at most ADMISSION_MAX_CONCURRENCY requests
+at a time; the rest wait in a bounded queue with two lanes:
+
+- priority: answers that need no LLM call (guardrail refusals, verified
+  and direct symbolic answers). Dispatched first, and allowed
+  ADMISSION_PRIORITY_RESERVE extra slots so cheap requests keep flowing
+  while slow LLM calls hold every standard slot.
+- standard: everything that goes through the LLM.
+
+Within a lane, clients are served round-robin, so one client flooding
+the queue delays its own requests rather than everyone else's. A
+request is shed up front with `Overloaded` (503 + Retry-After) when the
+queue is full, its client already has ADMISSION_MAX_PER_CLIENT requests
+queued, or its estimated wait exceeds ADMISSION_QUEUE_SLO; a request
+that has queued for the whole SLO is shed as well.
+
+The lane is only known once retrieval has run, so that preparation step
+is gated too: `preparing()` sheds up front what not even the priority
+lane could take, and runs at most ADMISSION_MAX_PREPARING preparations
+at a time.
+
+All state lives on the worker's event loop, so no locks are needed.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional
+
+from fastapi import Request
+
+from app.config import settings
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, StageTimer
+
+PRIORITY = "priority"
+STANDARD = "standard"
+LANES = (PRIORITY, STANDARD)
+
+
+class Overloaded(Exception):
+    """Request shed by admission control; `retry_after` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(request: Request) -> str:
+    """Fairness key: first X-Forwarded-For hop (we run behind a proxy), else the peer address."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class AdmissionController:
+    """Bounded two-lane queue with per-client round-robin and SLO-based shedding."""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        priority_reserve: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_per_client: Optional[int] = None,
+        slo: Optional[float] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.ADMISSION_MAX_CONCURRENCY
+        self.priority_reserve = settings.ADMISSION_PRIORITY_RESERVE if priority_reserve is None else priority_reserve
+        self.max_queue = max_queue or settings.ADMISSION_MAX_QUEUE
+        self.max_per_client = max_per_client or settings.ADMISSION_MAX_PER_CLIENT
+        self.slo = slo or settings.ADMISSION_QUEUE_SLO
+        self.max_preparing = settings.ADMISSION_MAX_PREPARING
+        self._preparing = asyncio.Semaphore(self.max_preparing)
+        self.in_preparation = 0
+
+        self.in_flight = {lane: 0 for lane in LANES}
+        self.depth = {lane: 0 for lane in LANES}
+        self.shed: Dict[str, int] = {}
+        self.abandoned = 0  # left the queue unserved (timed out or disconnected)
+        # lane -> client -> waiters; OrderedDict order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {lane: OrderedDict() for lane in LANES}
+        # EWMA of slot hold time per lane (seconds); None until observed
+        self._service: Dict[str, Optional[float]] = {lane: None for lane in LANES}
+
+    # ===== PREPARATION =====
+
+    @asynccontextmanager
+    async def preparing(self, client: str, timer: Optional[StageTimer] = None):
+        """Hold a preparation slot (retrieval before the lane is known); raises Overloaded when shed."""
+        if not self._can_start(PRIORITY):
+            # Shed what would be shed even in the cheapest lane
+            if sum(self.depth.values()) >= self.max_queue:
+                self._shed(PRIORITY, "queue_full")
+            if sum(len(self._queues[lane].get(client, ())) for lane in LANES) >= self.max_per_client:
+                self._shed(PRIORITY, "client_limit")
+            if self.estimated_wait(PRIORITY, client) > self.slo:
+                self._shed(PRIORITY, "slo")
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._preparing.acquire(), timeout=self.slo)
+        except asyncio.TimeoutError:
+            self._shed(PRIORITY, "prepare_timeout")
+        if timer is not None:
+            timer.record("queue_wait", time.perf_counter() - queued_at)
+        self.in_preparation += 1
+        try:
+            yield
+        finally:
+            self.in_preparation -= 1
+            self._preparing.release()
+
+    # ===== SLOTS =====
+
+    @asynccontextmanager
+    async def slot(self, client: str, lane: str = STANDARD, timer: Optional[StageTimer] = None):
+        """Hold an answer slot for the body of the `async with`; raises Overloaded when shed."""
+        await self.acquire(client, lane, timer)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(lane, time.perf_counter() - started)
+
+    @contextmanager
+    def blocking_slot(self, loop: asyncio.AbstractEventLoop, client: str, lane: str = STANDARD):
+        """`slot()` for code running in a worker thread; the state stays on the event loop `loop`."""
+        asyncio.run_coroutine_threadsafe(self.acquire(client, lane), loop).result()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self._release, lane, time.perf_counter() - started)
+
+    async def acquire(self, client: str, lane: str = STANDARD, timer: Optional[StageTimer] = None):
+        """Take a slot, queueing if needed; pair with `_release`."""
+        queued_at = time.perf_counter()
+        if not self._can_start(lane):
+            await self._wait(client, lane)
+        else:
+            self._take(lane)
+        if timer is not None:
+            timer.record("queue_wait", time.perf_counter() - queued_at)
+
+    def _capacity(self, lane: str) -> int:
+        return self.max_concurrency + (self.priority_reserve if lane == PRIORITY else 0)
+
+    def _has_slot(self, lane: str) -> bool:
+        return sum(self.in_flight.values()) < self._capacity(lane)
+
+    def _can_start(self, lane: str) -> bool:
+        """A free slot and nobody queued ahead (priority waiters are ahead of standard ones)."""
+        waiting = self.depth[PRIORITY] + (self.depth[STANDARD] if lane == STANDARD else 0)
+        return waiting == 0 and self._has_slot(lane)
+
+    def _take(self, lane: str):
+        self.in_flight[lane] += 1
+        ADMISSION_IN_FLIGHT.labels(lane=lane).inc()
+
+    def _release(self, lane: str, held: float):
+        previous = self._service[lane]
+        self._service[lane] = held if previous is None else 0.8 * previous + 0.2 * held
+        self._free(lane)
+
+    def _free(self, lane: str):
+        """Give a slot back without a service-time sample (it was never used)."""
+        self.in_flight[lane] -= 1
+        ADMISSION_IN_FLIGHT.labels(lane=lane).dec()
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiters: priority lane first, round-robin over clients."""
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._has_slot(lane):
+                client, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    queue.move_to_end(client)
+                else:
+                    del queue[client]
+                self._dequeued(lane)
+                if waiter.done():  # cancelled by a disconnected client
+                    continue
+                # The slot is taken here, not when the waiter wakes, so a new arrival cannot steal it
+                self._take(lane)
+                waiter.set_result(None)
+
+    # ===== QUEUE =====
+
+    async def _wait(self, client: str, lane: str):
+        queue = self._queues[lane]
+        if sum(self.depth.values()) >= self.max_queue:
+            self._shed(lane, "queue_full")
+        if len(queue.get(client, ())) >= self.max_per_client:
+            self._shed(lane, "client_limit")
+        if self.estimated_wait(lane, client) > self.slo:
+            self._shed(lane, "slo")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.setdefault(client, deque()).append(waiter)
+        self.depth[lane] += 1
+        ADMISSION_QUEUE_DEPTH.labels(lane=lane).inc()
+        try:
+            # shield: on timeout/disconnect the waiter stays inspectable below
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.slo)
+        except BaseException as e:
+            self.abandoned += 1
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up: pass the slot on
+                self._free(lane)
+            else:
+                waiter.cancel()
+                self._remove(client, lane, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed(lane, "timeout")
+            raise
+
+    def _remove(self, client: str, lane: str, waiter: asyncio.Future):
+        waiters = self._queues[lane].get(client)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queues[lane][client]
+        self._dequeued(lane)
+
+    def _dequeued(self, lane: str):
+        self.depth[lane] -= 1
+        ADMISSION_QUEUE_DEPTH.labels(lane=lane).dec()
+
+    def estimated_wait(self, lane: str, client: str = "") -> float:
+        """
+        Seconds a new request from `client` would queue in `lane`. With
+        round-robin it goes after at most one more request from each
+        client already queued than `client` has queued itself.
+        """
+        own = len(self._queues[lane].get(client, ()))
+        ahead = sum(min(len(waiters), own + 1) for waiters in self._queues[lane].values()) + 1
+        priority_service = self._service[PRIORITY] or 0.0
+        if lane == PRIORITY:
+            return ahead * priority_service / self._capacity(PRIORITY)
+        if self._service[STANDARD] is None:
+            return 0.0
+        work = ahead * self._service[STANDARD] + self.depth[PRIORITY] * priority_service
+        return work / self.max_concurrency
+
+    def _shed(self, lane: str, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        ADMISSION_SHED.labels(lane=lane, reason=reason).inc()
+        retry_after = self.estimated_wait(lane) or self._service[lane] or 1.0
+        raise Overloaded(reason, retry_after=max(1, math.ceil(min(retry_after, 4 * self.slo))))
+
+    def stats(self) -> Dict:
+        """Snapshot for /api/health."""
+        return {
+            "in_flight": dict(self.in_flight),
+            "preparing": self.in_preparation,
+            "queue_depth": dict(self.depth),
+            "estimated_wait": {lane: round(self.estimated_wait(lane), 3) for lane in LANES},
+            "shed": dict(self.shed),
+            "abandoned": self.abandoned
+        }
+
+
+_admission: Optional[AdmissionController] = None
+
+def get_admission() -> AdmissionController:
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
@@ -1,75 +1,43 @@
-from typing import Dict, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
 from langchain.prompts import ChatPromptTemplate
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+from langchain_core.runnables import RunnableLambda
 from app.config import settings  # ← Add app.
 from app.web_search import get_web_search_client
+from app.resilience import LLMExecutor, LLMUnavailableError
+from app.providers import get_llm
+from app.retrieval import get_retriever
+from app.cache import AnswerCache, EmbeddingCache, normalize_query
+from app.metrics import StageTimer
+from app.rerank import Reranker
+from app.symbolic import SymbolicSolver, describe
+from app.topics import make_title
+from app.guardrails import SemanticMathCheck, get_guardrails
 # from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from app.config import settings
 
 def basic_input_guardrails(text: str) -> bool:
-    t = text.lower()
-    for bad in ["politics","religion","weapon","nsfw","hack","adult"]:
-        if bad in t: return False
-    return True
-
-class QdrantRetriever:
-    def __init__(self):
-        settings.validate()
-        self.client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY,
-            timeout=120
-        )
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.collection = settings.QDRANT_COLLECTION_NAME
-        
-        try:
-            info = self.client.get_collection(self.collection)
-            if hasattr(info, "points_count"):
-                print(f"✓ Qdrant '{self.collection}' has {info.points_count} points")
-        except Exception as e:
-            raise RuntimeError(f"Cannot access Qdrant collection: {e}")
-    
-    def search(self, query: str, top_k: int, threshold: float) -> List[Dict]:
-        vec = self.model.encode(query).tolist()
-        results = self.client.search(
-            collection_name=self.collection,
-            query_vector=vec,
-            limit=top_k
-        )
-        
-        # Filter with threshold
-        filtered = []
-        for r in results:
-            score = float(r.score or 0.0)
-            if score >= threshold:
-                filtered.append(r)
-        
-        return [
-            {
-                "problem": r.payload.get("problem",""),
-                "solution": r.payload.get("solution",""),
-                "level": r.payload.get("level",""),
-                "type": r.payload.get("type",""),
-                "score": float(r.score or 0.0)
-            }
-            for r in filtered
-        ]
-
-
+    return get_guardrails().allows(text)
 
 class MathAgent:
-    def __init__(self):
-        self.retriever = QdrantRetriever()
-        self.llm = ChatGoogleGenerativeAI(
-            model=settings.GEMINI_MODEL,
-            api_key=settings.GOOGLE_API_KEY,
-            temperature=0.2
-        )
+    def __init__(self, retriever=None, llm=None, web_search_client=None):
+        # Providers are pluggable so the serving path can run offline
+        self.retriever = retriever if retriever is not None else get_retriever()
+        self.llm = llm if llm is not None else get_llm()
+        self.llm_executor = LLMExecutor()
+        self.reranker = Reranker()
+        self.symbolic = SymbolicSolver() if settings.SYMBOLIC_ENABLED else None
+        self.answer_cache = AnswerCache() if settings.ANSWER_CACHE_SIZE > 0 else None
+        self.embedding_cache = EmbeddingCache() if settings.EMBEDDING_CACHE_SIZE > 0 else None
         # FIX: Initialize web search client
-        self.web_search_client = get_web_search_client()
+        self.web_search_client = web_search_client or get_web_search_client()
+        # Optional "is this math?" check on the retrieval query vector
+        self.math_check = (
+            SemanticMathCheck(self.retriever.model, settings.GUARDRAIL_MATH_MIN_SIMILARITY)
+            if settings.GUARDRAIL_MATH_MIN_SIMILARITY > 0 else None
+        )
         
         self.prompt = ChatPromptTemplate.from_messages([
             ("system",
@@ -97,61 +65,333 @@ class MathAgent:
             )
         ])
     
-    def route_and_answer(self, query: str) -> Dict:
+    def route_and_answer(self, query: str, timer: Optional[StageTimer] = None) -> Dict:
+        timer = timer or StageTimer()
+        return self.complete(self.prepare(query, timer), timer)
+    
+    def prepare(self, query: str, timer: StageTimer) -> Dict:
+        """
+        Everything before generation: guardrails, the symbolic fast path and
+        retrieval. Returns a plan for `complete()`; `needs_llm()` tells the
+        caller (admission control) whether finishing it is expensive.
+        """
+        plan = {"query": query, "kb_hits": [], "symbolic": None, "result": None, "cache_hit": False}
+        
         # FIX: Complete guardrails return
-        if not basic_input_guardrails(query):
+        with timer.stage("guardrails"):
+            allowed = basic_input_guardrails(query)
+        if not allowed:
+            plan["result"] = self._guardrails_result(query)
+            return plan
+        
+        # Repeat of a recent (or pre-warmed) question
+        if self.answer_cache is not None:
+            plan["result"] = self.answer_cache.get(query)
+            if plan["result"] is not None:
+                plan["cache_hit"] = True
+                return plan
+        
+        # STEP 0: Mechanical questions are solved locally (no embedding, KB or Wolfram)
+        if self.symbolic is not None:
+            with timer.stage("symbolic"):
+                plan["symbolic"] = self.symbolic.solve(query)
+            if plan["symbolic"] is not None:
+                return plan
+        
+        # STEP 1: Try Knowledge Base
+        with timer.stage("embed"):
+            query_vector = self._embed(query)
+        if self.math_check is not None:
+            with timer.stage("guardrails"):
+                is_math = self.math_check.is_math(query_vector)
+            if not is_math:
+                plan["result"] = self._guardrails_result(query)
+                return plan
+        with timer.stage("vector_search"):
+            kb_hits = self.retriever.search(
+                query, self.reranker.fetch_k, settings.SCORE_THRESHOLD,
+                vector=query_vector, with_vectors=self.reranker.enabled
+            )
+        with timer.stage("rerank"):
+            plan["kb_hits"] = self.reranker.rerank(query, kb_hits, settings.TOP_K)
+        return plan
+    
+    def needs_llm(self, plan: Dict) -> bool:
+        """False when `complete(plan)` is answered without calling the LLM."""
+        if plan["result"] is not None or self._direct_hit(plan["kb_hits"]) is not None:
+            return False
+        return not (plan["symbolic"] is not None and settings.SYMBOLIC_MODE == "direct")
+    
+    def complete(self, plan: Dict, timer: StageTimer) -> Dict:
+        """Route and generate the answer for a plan from `prepare()`."""
+        if plan["result"] is not None:
+            return plan["result"]
+        answer = lambda: self._answer(plan["query"], plan["kb_hits"], timer, symbolic=plan["symbolic"])
+        if self.answer_cache is None:
+            return answer()
+        # Concurrent identical questions (in any worker) share one generation
+        return self.answer_cache.get_or_answer(plan["query"], answer)
+    
+    def _embed(self, query: str) -> np.ndarray:
+        vector = self.embedding_cache.get(query) if self.embedding_cache is not None else None
+        if vector is None:
+            vector = self.retriever.embed(query)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(query, vector)
+        return vector
+    
+    def _embed_batch(self, queries: List[str]) -> np.ndarray:
+        """Embed only the queries missing from the embedding cache, in one call."""
+        if self.embedding_cache is None:
+            return self.retriever.embed_batch(queries)
+        vectors = [self.embedding_cache.get(q) for q in queries]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            for i, vector in zip(missing, self.retriever.embed_batch([queries[i] for i in missing])):
+                self.embedding_cache.put(queries[i], vector)
+                vectors[i] = vector
+        return np.stack(vectors).astype(np.float32, copy=False)
+    
+    def _remember(self, result: Dict) -> Dict:
+        if self.answer_cache is not None:
+            self.answer_cache.put(result["query"], result)
+        return result
+    
+    def answer_batch(
+        self,
+        queries: List[str],
+        concurrency: Optional[int] = None,
+        gate: Optional[Callable[[bool], ContextManager]] = None,
+        use_cache: bool = True
+    ) -> Iterator[Tuple[int, Dict]]:
+        """
+        Answer many queries with one embedding call and one batched search,
+        fanning generation out under `concurrency` (default BATCH_CONCURRENCY).
+        Each generation runs inside `gate(needs_llm)` when given (an admission
+        slot); an exception it raises fails just that query. With
+        `use_cache=False` every query is answered afresh (the new answers
+        still replace what the answer cache holds).
+        Yields (index, result) in completion order; failures carry an "error" key.
+        """
+        allowed = []
+        for i, query in enumerate(queries):
+            if not basic_input_guardrails(query):
+                yield i, self._guardrails_result(query)
+                continue
+            cached = self.answer_cache.get(query) if self.answer_cache is not None and use_cache else None
+            if cached is not None:
+                yield i, cached
+            else:
+                allowed.append(i)
+        
+        symbolic = {}
+        if self.symbolic is not None and allowed:
+            solved = self.symbolic.solve_many([queries[i] for i in allowed])
+            symbolic = {i: s for i, s in zip(allowed, solved) if s is not None}
+            allowed = [i for i in allowed if i not in symbolic]
+        
+        hits = []
+        if allowed:
+            vectors = self._embed_batch([queries[i] for i in allowed])
+            if self.math_check is not None:
+                keep = [self.math_check.is_math(vec) for vec in vectors]
+                for i, ok in zip(allowed, keep):
+                    if not ok:
+                        yield i, self._guardrails_result(queries[i])
+                allowed = [i for i, ok in zip(allowed, keep) if ok]
+                vectors = vectors[keep]
+        if allowed:
+            hits = self.retriever.search_batch(
+                vectors, self.reranker.fetch_k, settings.SCORE_THRESHOLD, with_vectors=self.reranker.enabled
+            )
+            hits = [self.reranker.rerank(queries[i], kb_hits, settings.TOP_K) for i, kb_hits in zip(allowed, hits)]
+        if not allowed and not symbolic:
+            return
+        
+        def generate(query: str, kb_hits: List[Dict], solved: Optional[Dict] = None) -> Dict:
+            if gate is None:
+                return self._answer(query, kb_hits, StageTimer(), solved)
+            plan = {"query": query, "kb_hits": kb_hits, "symbolic": solved, "result": None}
+            with gate(self.needs_llm(plan)):
+                return self._answer(query, kb_hits, StageTimer(), solved)
+        
+        pool = ThreadPoolExecutor(max_workers=concurrency or settings.BATCH_CONCURRENCY)
+        try:
+            futures = {
+                pool.submit(generate, queries[i], kb_hits): i
+                for i, kb_hits in zip(allowed, hits)
+            }
+            futures.update({
+                pool.submit(generate, queries[i], [], solved): i
+                for i, solved in symbolic.items()
+            })
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    yield i, self._remember(future.result())
+                except Exception as e:
+                    yield i, {"query": queries[i], "error": str(e)}
+        finally:
+            # A closed generator (client gone) drops the queries not yet started
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _answer(self, query: str, kb_hits: List[Dict], timer: StageTimer, symbolic: Optional[Dict] = None) -> Dict:
+        """
+        Route on retrieved hits (KB -> WolframAlpha -> LLM only) and generate
+        the answer. A `symbolic` result replaces retrieval and WolframAlpha.
+        """
+        web_result = None
+        
+        # Near-exact match on a verified answer: serve it without the LLM
+        best = self._direct_hit(kb_hits)
+        if best is not None:
+            print(f"✓ Serving verified answer directly (score: {best['score']:.3f})")
             return {
                 "query": query,
-                "answer": "Only mathematics content allowed.",
-                "source": "guardrails",
-                "confidence_score": 0.0,
-                "kb_matches": 0
+                "answer": self._verified_answer(query, best),
+                "source": "verified_kb",
+                "confidence_score": float(best["score"]),
+                "kb_matches": len(kb_hits),
+                "title": make_title(query, kb_hits)
             }
         
-        # STEP 1: Try Knowledge Base
-        kb_hits = self.retriever.search(query, settings.TOP_K, settings.SCORE_THRESHOLD)
+        if symbolic is not None:
+            # SymPy result: exact, so it is either returned as is or explained by the LLM
+            confidence = 1.0
+            source = "symbolic"
+            print(f"✓ Solved symbolically ({symbolic['intent']}): {symbolic['result']}")
+            if settings.SYMBOLIC_MODE == "direct":
+                return {
+                    "query": query,
+                    "answer": self._symbolic_answer(symbolic),
+                    "source": source,
+                    "confidence_score": confidence,
+                    "kb_matches": 0,
+                    "title": make_title(query)
+                }
         
-        if kb_hits:
+        elif kb_hits:
             # KB found results
             confidence = max((h["score"] for h in kb_hits), default=0.0)
-            context = "\n\n---\n\n".join(
-                f"Problem: {h['problem']}\nSolution: {h['solution']}\n"
-                f"[Score={h['score']:.3f}, Level={h['level']}, Type={h['type']}]"
-                for h in kb_hits
-            )
             source = "knowledge_base"
             print(f"✓ Using {len(kb_hits)} KB results (best: {confidence:.3f})")
         
+        elif not self.web_search_client.allow():
+            # Don't add a slow or failing WolframAlpha call in front of the LLM
+            source = "llm_knowledge"
+            confidence = 0.0
+            print("⚠️ KB failed; WolframAlpha circuit is open, using LLM only")
+        
         else:
             # STEP 2: Fallback to Web Search
             print("⚠️ KB failed; trying WolframAlpha...")
             # FIX: Use correct variable name
-            web_result = self.web_search_client.search_web(query)
+            with timer.stage("wolfram"):
+                web_result = self.web_search_client.search_web(query)
             
             if web_result["success"]:
-                context = f"WolframAlpha answer:\n{web_result['content']}"
                 source = "web_search"
                 confidence = 0.5
                 print(f"✓ WolframAlpha returned answer")
             else:
-                context = "No KB or web results. Solve from first principles."
                 source = "llm_knowledge"
                 confidence = 0.0
                 print("⚠️ Both KB and web search failed; using LLM only")
         
         # STEP 3: Generate explanation with LLM
-        chain = self.prompt | self.llm
-        resp = chain.invoke({"question": query, "context": context})
-        answer = resp.content
+        with timer.stage("prompt_build"):
+            context = self._build_context(source, kb_hits, web_result, symbolic)
+            messages = self.prompt.format_messages(question=query, context=context)
+        try:
+            with timer.stage("llm_total"):
+                answer = self.llm_executor.invoke(
+                    RunnableLambda(lambda msgs: self._stream_answer(msgs, timer)), messages
+                )
+        except LLMUnavailableError as e:
+            # Degrade to the retrieved context when there is any to return
+            if source == "llm_knowledge":
+                raise
+            print(f"⚠️ LLM unavailable ({e}); returning context only")
+            answer = self._context_only_answer(source, kb_hits, web_result, symbolic)
+            source = f"{source}_only"
         
         return {
             "query": query,
             "answer": answer,
             "source": source,
             "confidence_score": float(confidence),
-            "kb_matches": len(kb_hits) if kb_hits else 0
+            "kb_matches": len(kb_hits) if kb_hits else 0,
+            "title": make_title(query, kb_hits)
         }
 
+    def _direct_hit(self, kb_hits: List[Dict]) -> Optional[Dict]:
+        """The top hit if it is a verified answer close enough to serve as is."""
+        best = kb_hits[0] if kb_hits else None
+        if best and best["verified"] and best["score"] >= settings.VERIFIED_DIRECT_THRESHOLD:
+            return best
+        return None
+
+    def _guardrails_result(self, query: str) -> Dict:
+        return {
+            "query": query,
+            "answer": "Only mathematics content allowed.",
+            "source": "guardrails",
+            "confidence_score": 0.0,
+            "kb_matches": 0,
+            "title": make_title(query)
+        }
+
+    def _build_context(
+        self, source: str, kb_hits: List[Dict], web_result: Optional[Dict], symbolic: Optional[Dict] = None
+    ) -> str:
+        if source == "symbolic":
+            return (
+                "Verified result computed with SymPy (it is correct; explain how to reach it):\n"
+                f"{describe(symbolic)}"
+            )
+        if source == "knowledge_base":
+            return "\n\n---\n\n".join(
+                f"Problem: {h['problem']}\nSolution: {h['solution']}\n"
+                f"[Score={h['score']:.3f}, Level={h['level']}, Type={h['type']}]"
+                for h in kb_hits
+            )
+        if source == "web_search":
+            return f"WolframAlpha answer:\n{web_result['content']}"
+        return "No KB or web results. Solve from first principles."
+
+    def _stream_answer(self, messages, timer: StageTimer) -> str:
+        """Stream the LLM response, recording time to first token."""
+        started = time.perf_counter()
+        parts = []
+        for chunk in self.llm.stream(messages):
+            if not parts:
+                timer.record_once("llm_first_token", time.perf_counter() - started)
+            parts.append(chunk.content)
+        return "".join(parts)
+
+    def _verified_answer(self, query: str, hit: Dict) -> str:
+        """Cheap templated wrapper around a verified answer."""
+        if normalize_query(hit["problem"]) == normalize_query(query):
+            return hit["solution"]
+        return f"Closest verified question: {hit['problem']}\n\n{hit['solution']}"
+
+    def _symbolic_answer(self, solved: Dict) -> str:
+        return f"{describe(solved)}\n\nFINAL ANSWER: {solved['result']}"
+
+    def _context_only_answer(
+        self, source: str, kb_hits: List[Dict], web_result: Optional[Dict], symbolic: Optional[Dict] = None
+    ) -> str:
+        """Build an answer from retrieved material alone (used when the LLM is unavailable)."""
+        if source == "symbolic":
+            return self._symbolic_answer(symbolic)
+        header = "The tutor is temporarily unavailable, so here is the closest reference material.\n\n"
+        if source == "knowledge_base":
+            return header + "\n\n---\n\n".join(
+                f"Similar problem: {h['problem']}\nSolution: {h['solution']}"
+                for h in kb_hits
+            )
+        return header + f"WolframAlpha answer: {web_result['content']}"
+
 _agent: Optional[MathAgent] = None
 
 def get_agent() -> MathAgent:
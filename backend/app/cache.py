@@ -0,0 +1,393 @@
+"""
+Two-level caches for answers and query embeddings.
+
+`TwoLevelCache` keeps an in-process LRU (L1) in front of an optional
+shared tier (L2) that every worker and replica sees, so one worker's
+answer serves all of them. CACHE_BACKEND picks the shared tier:
+
+- "none":   L1 only (per worker)
+- "sqlite": a WAL-mode SQLite file (CACHE_SQLITE_PATH); shared by the
+            workers of one host, and the local/dev stand-in for Redis
+- "redis":  Redis at CACHE_REDIS_URL (redis-py is imported lazily)
+
+Values go to L2 as msgpack envelopes; embeddings are stored as raw
+float16 bytes (768 bytes for a 384-d vector). `get_or_compute`
+coalesces concurrent misses for the same key: threads in a worker wait
+for one leader, and other processes wait on a lease key in L2 while
+its holder computes. A failing shared tier degrades to L1 only.
+
+Finished answers are keyed by the normalized question and expire after
+ANSWER_CACHE_TTL seconds. Degraded answers (context-only fallbacks) and
+guardrail refusals are never cached.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import msgpack
+import numpy as np
+
+from app.config import settings
+from app.metrics import CACHE_LOOKUPS
+
+UNCACHEABLE_SOURCES = {"guardrails"}
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key: collapsed whitespace, no trailing "?" or ".". Case and "!"
+    are kept, since in math they change the question (X vs x, 5! vs 5).
+    """
+    return " ".join(text.split()).rstrip("?. ")
+
+
+def is_cacheable(result: Dict) -> bool:
+    source = result.get("source", "")
+    return "error" not in result and source not in UNCACHEABLE_SOURCES and not source.endswith("_only")
+
+
+# ===== SHARED BACKENDS =====
+
+class SQLiteCacheBackend:
+    """Key/value table with expiry in a WAL-mode SQLite file; one connection per thread."""
+
+    PURGE_EVERY = 1000  # writes between sweeps of expired rows
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or settings.CACHE_SQLITE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set only if absent or expired; True if this call set it."""
+        now = time.time()
+        cursor = self._conn().execute("""
+            INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            WHERE cache.expires_at <= ?
+        """, (key, value, now + ttl, now))
+        return cursor.rowcount == 1
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisCacheBackend:
+    """Redis (or anything speaking its protocol) at CACHE_REDIS_URL."""
+
+    def __init__(self, url: Optional[str] = None):
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url or settings.CACHE_REDIS_URL,
+            socket_timeout=settings.CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def exists(self, key: str) -> bool:
+        return self.client.exists(key) > 0
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+
+_backend = None
+_backend_ready = False
+
+def get_shared_cache_backend():
+    """Shared tier selected by CACHE_BACKEND, or None for L1-only caching."""
+    global _backend, _backend_ready
+    if not _backend_ready:
+        if settings.CACHE_BACKEND == "sqlite":
+            _backend = SQLiteCacheBackend()
+        elif settings.CACHE_BACKEND == "redis":
+            _backend = RedisCacheBackend()
+        elif settings.CACHE_BACKEND != "none":
+            raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
+        _backend_ready = True
+        if _backend is not None:
+            print(f"✅ Shared cache tier: {settings.CACHE_BACKEND}")
+    return _backend
+
+
+# ===== TWO-LEVEL CACHE =====
+
+class TwoLevelCache:
+    """In-process LRU (L1) in front of an optional shared backend (L2), with per-layer hit counts."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl: float,
+        backend=None,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.encode = encode  # value -> msgpack-able
+        self.decode = decode
+        self.lock_timeout = settings.CACHE_LOCK_TIMEOUT
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.counts = {"l1_hit": 0, "l2_hit": 0, "miss": 0, "coalesced": 0}
+        self._backend_error_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _count(self, outcome: str):
+        self.counts[outcome] += 1
+        CACHE_LOOKUPS.labels(cache=self.name, outcome=outcome).inc()
+
+    def _shared_key(self, key: str) -> str:
+        return f"ma:{self.name}:{hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def _shared(self, method: str, *args, default=None):
+        """Call the backend; on failure log (at most every 30 s) and behave as L1-only."""
+        if self.backend is None:
+            return default
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._backend_error_at > 30:
+                print(f"⚠️ Shared {self.name} cache unavailable ({type(e).__name__}: {e}); using L1 only")
+                self._backend_error_at = now
+            return default
+
+    # ===== LOOKUP / STORE =====
+
+    def _l1_get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _l1_put(self, key: str, value, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _l2_get(self, key: str):
+        raw = self._shared("get", self._shared_key(key))
+        if raw is None:
+            return None
+        expires_at, payload = msgpack.unpackb(raw, raw=False)
+        value = self.decode(payload)
+        self._l1_put(key, value, expires_at)  # promote
+        return value
+
+    def _lookup(self, key: str, count: bool = True):
+        value = self._l1_get(key)
+        outcome = "l1_hit"
+        if value is None:
+            value = self._l2_get(key)
+            outcome = "l2_hit" if value is not None else "miss"
+        if count:
+            self._count(outcome)
+        return value
+
+    def _store(self, key: str, value, expires_at: Optional[float] = None):
+        expires_at = expires_at or time.time() + self.ttl
+        ttl = expires_at - time.time()
+        if ttl <= 0:
+            return
+        self._l1_put(key, value, expires_at)
+        if self.backend is not None:
+            raw = msgpack.packb([expires_at, self.encode(value)], use_bin_type=True)
+            self._shared("set", self._shared_key(key), raw, ttl)
+
+    def get(self, key: str):
+        return self._lookup(key)
+
+    def put(self, key: str, value, expires_at: Optional[float] = None):
+        self._store(key, value, expires_at)
+
+    def delete(self, key: str):
+        """Drop `key` from this worker's L1 and from L2 (other workers' L1 keeps it until it expires)."""
+        with self._lock:
+            self._entries.pop(key, None)
+        self._shared("delete", self._shared_key(key))
+
+    # ===== STAMPEDE PROTECTION =====
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], cacheable: Callable[[Any], bool] = lambda v: True):
+        """
+        Cached value for `key`, or `compute()` run once for all concurrent
+        callers (in this process via a shared future, across processes via
+        an L2 lease). The caller is expected to have counted its miss.
+        """
+        value = self._lookup(key, count=False)
+        if value is not None:
+            return value
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            return flight.result()
+
+        try:
+            value = self._compute_shared(key, compute, cacheable)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _compute_shared(self, key: str, compute: Callable[[], Any], cacheable: Callable[[Any], bool]):
+        lease = self._shared_key(key) + ":lease"
+        held = self._shared("add", lease, b"1", self.lock_timeout, default=True)
+        if not held:
+            # Another process is computing it: wait while its lease lives
+            deadline = time.monotonic() + self.lock_timeout
+            delay = 0.05
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                value = self._l2_get(key)
+                if value is not None:
+                    self._count("coalesced")
+                    return value
+                if not self._shared("exists", lease, default=False):
+                    break  # holder finished without a cacheable value (or died)
+        try:
+            value = compute()
+            if cacheable(value):
+                self._store(key, value)
+            return value
+        finally:
+            if held and self.backend is not None:
+                self._shared("delete", lease)
+
+    def stats(self) -> Dict:
+        lookups = self.counts["l1_hit"] + self.counts["l2_hit"] + self.counts["miss"]
+        hits = self.counts["l1_hit"] + self.counts["l2_hit"]
+        return {
+            "entries": len(self._entries),
+            "l1_hits": self.counts["l1_hit"],
+            "l2_hits": self.counts["l2_hit"],
+            "misses": self.counts["miss"],
+            "coalesced": self.counts["coalesced"],
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "shared_tier": settings.CACHE_BACKEND if self.backend is not None else None
+        }
+
+
+class AnswerCache(TwoLevelCache):
+    """Answer dicts keyed by the normalized question."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, backend=None):
+        super().__init__(
+            "answer",
+            settings.ANSWER_CACHE_SIZE if max_entries is None else max_entries,
+            ttl or settings.ANSWER_CACHE_TTL,
+            backend if backend is not None else get_shared_cache_backend()
+        )
+
+    def get(self, query: str) -> Optional[Dict]:
+        """Cached answer for `query` (echoing the caller's wording), or None."""
+        result = self._lookup(normalize_query(query))
+        return {**result, "query": query} if result is not None else None
+
+    def put(self, query: str, result: Dict, expires_at: Optional[float] = None):
+        if is_cacheable(result):
+            self._store(normalize_query(query), result, expires_at)
+
+    def delete(self, query: str):
+        super().delete(normalize_query(query))
+
+    def get_or_answer(self, query: str, answer: Callable[[], Dict]) -> Dict:
+        """Run `answer()` once for concurrent identical questions."""
+        result = self.get_or_compute(normalize_query(query), answer, cacheable=is_cacheable)
+        return {**result, "query": query}
+
+
+class EmbeddingCache(TwoLevelCache):
+    """Query vectors keyed by the whitespace-normalized text; float16 in the shared tier."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, backend=None):
+        super().__init__(
+            "embedding",
+            settings.EMBEDDING_CACHE_SIZE if max_entries is None else max_entries,
+            ttl or settings.EMBEDDING_CACHE_TTL,
+            backend if backend is not None else get_shared_cache_backend(),
+            encode=lambda vector: np.asarray(vector, dtype="<f2").tobytes(),
+            decode=lambda raw: np.frombuffer(raw, dtype="<f2").astype(np.float32)
+        )
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self._lookup(" ".join(text.split()))
+
+    def put(self, text: str, vector: np.ndarray, expires_at: Optional[float] = None):
+        self._store(" ".join(text.split()), np.asarray(vector, dtype=np.float32), expires_at)
@@ -0,0 +1,119 @@
+"""
+Negotiated response compression (brotli or gzip).
+
+A pure ASGI middleware: when the whole body arrives in one message (every
+JSON endpoint) and is at least COMPRESSION_MIN_BYTES, it is compressed
+with the best encoding the client accepts. Brotli is preferred at a low
+quality: compression runs on the event loop, and on answer lists it is
+about 3x faster than gzip -6 for a somewhat larger body (see
+benchmarks/bench_serialization.py). Gzip is the fallback. Streaming
+bodies (the NDJSON batch endpoint) pass through untouched, so their
+lines are not held back by a compressor buffer. When disabled nothing is
+installed and brotli is never imported.
+"""
+
+import gzip
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI
+
+from app.config import settings
+
+# Already-compressed or streamed formats are left alone
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def choose_encoding(accept_encoding: str, available: Dict[str, Callable]) -> Optional[str]:
+    """Best available encoding the client accepts (q > 0), preferring brotli."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app, encoders: Dict[str, Callable[[bytes], bytes]], minimum_size: int):
+        self.app = app
+        self.encoders = encoders
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start, streaming
+            if message["type"] == "http.response.start":
+                start = message  # held until we know whether the body is compressed
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = [(k, v) for k, v in start["headers"]]
+            names = {k.lower(): v for k, v in response_headers}
+            content_type = names.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in names
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                streaming = message.get("more_body", False)
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self.encoders[encoding](body)
+            response_headers = [(k, v) for k, v in response_headers if k.lower() != b"content-length"]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding")
+            ]
+            await send(dict(start, headers=response_headers))
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def get_encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {"gzip": lambda body: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)}
+    try:
+        import brotli
+
+        encoders["br"] = lambda body: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    except ImportError:
+        print("⚠️ brotli not installed; responses are gzip-compressed only")
+    return encoders
+
+
+def install_compression(app: FastAPI):
+    """Register the compression middleware if enabled in settings."""
+    if not settings.COMPRESSION_ENABLED:
+        return
+    app.add_middleware(
+        CompressionMiddleware,
+        encoders=get_encoders(),
+        minimum_size=settings.COMPRESSION_MIN_BYTES
+    )
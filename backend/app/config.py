@@ -15,6 +15,12 @@ DATA_DIR = PROJECT_ROOT / "data"
 env_path = BACKEND_DIR.parent / ".env"
 load_dotenv(env_path)
 
+def _default_dataset_path() -> Path:
+    """Streaming JSONL dataset, or the legacy JSON array if only that exists."""
+    jsonl = DATA_DIR / "math_kb.jsonl"
+    legacy = DATA_DIR / "math_kb.json"
+    return legacy if legacy.exists() and not jsonl.exists() else jsonl
+
 class Settings:
     """Application settings with production defaults."""
     
@@ -30,9 +36,70 @@ class Settings:
     # Paths
     BASE_DIR: Path = BACKEND_DIR
     DATA_DIR: Path = DATA_DIR
-    DATASET_PATH: Path = DATA_DIR / "math_kb.json"
+    DATASET_PATH: Path = Path(os.getenv("DATASET_PATH", str(_default_dataset_path())))
     DATABASE_PATH: Path = DATA_DIR / "conversations.db"
     
+    # Conversation DB text storage: every distinct query/answer is stored once
+    # (content-addressed), zstd-compressed when at least DB_COMPRESS_MIN_BYTES long
+    DB_ZSTD_LEVEL: int = int(os.getenv("DB_ZSTD_LEVEL", "3"))
+    DB_COMPRESS_MIN_BYTES: int = int(os.getenv("DB_COMPRESS_MIN_BYTES", "64"))
+    
+    # Retention: months older than the newest RETENTION_HOT_MONTHS (current month
+    # included) are rolled out of the DB into ARCHIVE_DIR by `python -m app.retention`
+    RETENTION_HOT_MONTHS: int = int(os.getenv("RETENTION_HOT_MONTHS", "3"))
+    ARCHIVE_DIR: Path = Path(os.getenv("ARCHIVE_DIR", str(DATA_DIR / "archive")))
+    ARCHIVE_ZSTD_LEVEL: int = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "12"))
+    
+    # Provider Settings ("fake" / "memory" / "hashing" run fully offline)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    RETRIEVER_PROVIDER: str = os.getenv("RETRIEVER_PROVIDER", "qdrant")
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "sentence_transformers")
+    MEMORY_KB_LIMIT: int = int(os.getenv("MEMORY_KB_LIMIT", "0"))
+    
+    # Embedding Sidecar: one process owns the model and serves every worker over a Unix socket
+    EMBEDDING_SIDECAR: bool = os.getenv("EMBEDDING_SIDECAR", "false").lower() == "true"
+    EMBEDDING_SIDECAR_SOCKET: str = os.getenv("EMBEDDING_SIDECAR_SOCKET", "/tmp/math-agent-embed.sock")
+    EMBEDDING_SIDECAR_TIMEOUT: float = float(os.getenv("EMBEDDING_SIDECAR_TIMEOUT", "10"))
+    EMBEDDING_SIDECAR_MAX_BATCH: int = int(os.getenv("EMBEDDING_SIDECAR_MAX_BATCH", "64"))
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0"))  # torch intra-op threads, 0 = default
+    
+    # KB Enrichment Settings (verified tier from human feedback)
+    KB_ENRICH_INTERVAL: float = float(os.getenv("KB_ENRICH_INTERVAL", "300"))  # seconds, 0 = off
+    KB_ENRICH_MIN_RATING: int = int(os.getenv("KB_ENRICH_MIN_RATING", "5"))
+    KB_ENRICH_BATCH_SIZE: int = int(os.getenv("KB_ENRICH_BATCH_SIZE", "256"))
+    # Verified hits at or above this cosine score are returned without the LLM
+    VERIFIED_DIRECT_THRESHOLD: float = float(os.getenv("VERIFIED_DIRECT_THRESHOLD", "0.95"))
+    
+    # Answer / Embedding Caches: in-process LRU (sizes are L1 entries) in front of
+    # an optional shared tier, CACHE_BACKEND = "none", "sqlite" or "redis"
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))  # 0 = off
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))  # 0 = off
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", "604800"))
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "none")
+    CACHE_SQLITE_PATH: Path = Path(os.getenv("CACHE_SQLITE_PATH", str(DATA_DIR / "cache.db")))
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_REDIS_TIMEOUT: float = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.25"))
+    CACHE_LOCK_TIMEOUT: float = float(os.getenv("CACHE_LOCK_TIMEOUT", "35"))  # stampede lease, > LLM_TIMEOUT
+    
+    # Cache warm-up from popular questions
+    WARMUP_PATH: Path = Path(os.getenv("WARMUP_PATH", str(DATA_DIR / "answer_cache_warm.jsonl")))
+    WARMUP_TOP_N: int = int(os.getenv("WARMUP_TOP_N", "200"))
+    WARMUP_LOOKBACK_DAYS: int = int(os.getenv("WARMUP_LOOKBACK_DAYS", "30"))
+    WARMUP_HALF_LIFE_DAYS: float = float(os.getenv("WARMUP_HALF_LIFE_DAYS", "7"))
+    WARMUP_CONCURRENCY: int = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+    
+    # Batch Query Settings
+    BATCH_MAX_QUERIES: int = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    
+    # Fake LLM Settings (LLM_PROVIDER=fake)
+    FAKE_LLM_LATENCY_DIST: str = os.getenv("FAKE_LLM_LATENCY_DIST", "lognormal")
+    FAKE_LLM_LATENCY_MS: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+    FAKE_LLM_LATENCY_SIGMA: float = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+    FAKE_LLM_TOKEN_MS: float = float(os.getenv("FAKE_LLM_TOKEN_MS", "5"))
+    FAKE_LLM_SEED: int = int(os.getenv("FAKE_LLM_SEED", "0"))
+    
     # Model Settings
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
@@ -41,7 +108,79 @@ class Settings:
     TOP_K: int = int(os.getenv("TOP_K", "5"))
     SCORE_THRESHOLD: float = float(os.getenv("SCORE_THRESHOLD", "0.5"))
     
+    # Vector quantization: "none", "int8" (scalar) or "pq" (product); the top
+    # limit * QUANTIZATION_OVERSAMPLING candidates are rescored at full precision
+    QUANTIZATION: str = os.getenv("QUANTIZATION", "none")
+    QUANTIZATION_OVERSAMPLING: float = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+    
+    # Also search the full problem+solution vector and keep each point's best score
+    RETRIEVAL_FUSE_FULL: bool = os.getenv("RETRIEVAL_FUSE_FULL", "false").lower() == "true"
+    
+    # Re-ranking Settings: fetch RERANK_CANDIDATES, keep TOP_K diverse hits (MMR)
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    RERANK_MMR_LAMBDA: float = float(os.getenv("RERANK_MMR_LAMBDA", "0.7"))  # 1.0 = relevance only
+    RERANK_DUPLICATE_THRESHOLD: float = float(os.getenv("RERANK_DUPLICATE_THRESHOLD", "0.95"))
+    RERANK_CROSS_ENCODER: str = os.getenv("RERANK_CROSS_ENCODER", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "50"))
+    
+    # Symbolic Fast Path (SymPy in a process pool, tried before retrieval and Wolfram)
+    SYMBOLIC_ENABLED: bool = os.getenv("SYMBOLIC_ENABLED", "true").lower() == "true"
+    SYMBOLIC_MODE: str = os.getenv("SYMBOLIC_MODE", "context")  # "context" (LLM explains it) or "direct"
+    SYMBOLIC_TIMEOUT: float = float(os.getenv("SYMBOLIC_TIMEOUT", "2.0"))
+    SYMBOLIC_WORKERS: int = int(os.getenv("SYMBOLIC_WORKERS", "1"))
+    
+    # Guardrail Settings: min cosine similarity to math prototypes (0 = off)
+    GUARDRAIL_MATH_MIN_SIMILARITY: float = float(os.getenv("GUARDRAIL_MATH_MIN_SIMILARITY", "0"))
+    
+    # LLM Resilience Settings
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "1"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MIN_CONCURRENCY: int = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_COOLDOWN: float = float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+    
+    # Admission Control for /api/query and /api/query/batch (per gunicorn worker)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+    ADMISSION_PRIORITY_RESERVE: int = int(os.getenv("ADMISSION_PRIORITY_RESERVE", "4"))  # extra slots for no-LLM answers
+    ADMISSION_MAX_PREPARING: int = int(os.getenv("ADMISSION_MAX_PREPARING", "12"))  # concurrent retrievals before the lane is known
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_MAX_PER_CLIENT: int = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "8"))  # queued requests per client
+    ADMISSION_QUEUE_SLO: float = float(os.getenv("ADMISSION_QUEUE_SLO", "10"))  # seconds of queueing before 503
+    
+    # Health Probes (background; /api/health only reads their cached results)
+    HEALTH_PROBE_INTERVAL: float = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+    HEALTH_LLM_PROBE_INTERVAL: float = float(os.getenv("HEALTH_LLM_PROBE_INTERVAL", "60"))
+    HEALTH_STALE_AFTER: float = float(os.getenv("HEALTH_STALE_AFTER", "180"))  # then status is "unknown"
+    HEALTH_WARMUP_TIMEOUT: float = float(os.getenv("HEALTH_WARMUP_TIMEOUT", "10"))
+    HEALTH_QDRANT_DEGRADED_MS: float = float(os.getenv("HEALTH_QDRANT_DEGRADED_MS", "500"))
+    HEALTH_LLM_DEGRADED_MS: float = float(os.getenv("HEALTH_LLM_DEGRADED_MS", "10000"))
+    HEALTH_WOLFRAM_DEGRADED_MS: float = float(os.getenv("HEALTH_WOLFRAM_DEGRADED_MS", "3000"))  # slower = a failed call
+    # WolframAlpha is skipped after this many slow or failed calls in a row, then retried with one trial call
+    WOLFRAM_FAILURE_THRESHOLD: int = int(os.getenv("WOLFRAM_FAILURE_THRESHOLD", "3"))
+    WOLFRAM_COOLDOWN: float = float(os.getenv("WOLFRAM_COOLDOWN", "60"))
+    
+    # Response compression (brotli preferred, gzip fallback) for bodies >= COMPRESSION_MIN_BYTES;
+    # turn off when a reverse proxy already compresses
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))  # 0-11, low = fast
+    
+    # Profiling Settings (off by default; costs nothing when disabled)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE: int = int(os.getenv("PROFILING_SAMPLE_RATE", "100"))  # 1 in N requests
+    PROFILING_HEADER: str = os.getenv("PROFILING_HEADER", "X-Profile")
+    PROFILING_INTERVAL: float = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+    PROFILING_MAX_FILES: int = int(os.getenv("PROFILING_MAX_FILES", "50"))
+    PROFILING_DIR: Path = DATA_DIR / "profiles"
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
     # Server Settings
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     PORT: int = int(os.getenv("PORT", "8000"))
     HOST: str = os.getenv("HOST", "0.0.0.0")
     
@@ -55,12 +194,13 @@ class Settings:
         """Validate required settings."""
         errors = []
         
-        if not self.GOOGLE_API_KEY:
+        if self.LLM_PROVIDER == "gemini" and not self.GOOGLE_API_KEY:
             errors.append("GOOGLE_API_KEY not set")
-        if not self.QDRANT_URL:
-            errors.append("QDRANT_URL not set")
-        if not self.QDRANT_API_KEY:
-            errors.append("QDRANT_API_KEY not set")
+        if self.RETRIEVER_PROVIDER == "qdrant":
+            if not self.QDRANT_URL:
+                errors.append("QDRANT_URL not set")
+            if not self.QDRANT_API_KEY:
+                errors.append("QDRANT_API_KEY not set")
         
         if errors:
             raise ValueError(f"Missing configuration: {', '.join(errors)}")
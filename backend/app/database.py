@@ -1,15 +1,61 @@
 """
 SQLite database for storing conversations and feedback.
 Auto-creates tables on first run.
+
+Query and answer texts live once each in the content-addressed `texts`
+table (BLAKE2b-128 of the UTF-8 text -> zstd-compressed bytes); the
+conversation, feedback and intervention rows only hold the 16-byte
+hashes. A popular question asked a thousand times, and the feedback rows
+that repeat its answer, cost one stored copy. Reads go through the
+`*_texts` views, which join the texts back in and decompress them with
+the `text_of()` SQL function registered on every connection.
+
+Databases written before this layout (PRAGMA user_version 0 with text
+columns) are migrated in place on first open, then VACUUMed.
+
+Only recent months stay in these tables; older ones are rolled out to
+archive files by app/retention.py. Each archived month leaves a rollup
+in `archived_partitions`, so all-time aggregates add a few catalog rows
+to a query over the hot rows instead of scanning history.
 """
 
+import hashlib
+import json
 import sqlite3
+import threading
+import time
+import zstandard
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
 from contextlib import contextmanager
 from app.config import settings  # ← Add app.
 
+SCHEMA_VERSION = 3
+MIGRATION_CHUNK = 5_000
+
+
+# ==================== TEXT STORE ====================
+
+def text_hash(text: str) -> bytes:
+    """Content address of a text (16-byte BLAKE2b)."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def pack_text(text: str) -> Tuple[bytes, int]:
+    """(stored bytes, compressed flag); short texts are not worth a zstd frame."""
+    raw = text.encode("utf-8")
+    if len(raw) < settings.DB_COMPRESS_MIN_BYTES:
+        return raw, 0
+    return zstandard.compress(raw, settings.DB_ZSTD_LEVEL), 1
+
+
+def unpack_text(data: Optional[bytes], compressed: int) -> Optional[str]:
+    if data is None:
+        return None
+    return (zstandard.decompress(data) if compressed else data).decode("utf-8")
+
+
 class Database:
     """SQLite database manager for Math Agent."""
     
@@ -23,73 +69,274 @@ class Database:
         
         # Ensure data directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
         
-        # Initialize tables
-        self._create_tables()
+        # Initialize (or migrate) tables
+        self._migrate()
         print(f"✅ Database initialized: {self.db_path}")
     
+    def _connect(self, timeout: float = 5.0) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=timeout)
+        conn.row_factory = sqlite3.Row  # Return dict-like rows
+        conn.create_function("text_of", 2, unpack_text, deterministic=True)
+        return conn
+    
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on its first query and kept for the next ones."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row  # Return dict-like rows
+        """Context manager for one transaction on this thread's connection."""
+        conn = self._conn()
         try:
             yield conn
             conn.commit()
         except Exception as e:
             conn.rollback()
             raise e
-        finally:
-            conn.close()
     
-    def _create_tables(self):
+    def _create_tables(self, cursor):
         """Create database tables if they don't exist."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Table 1: Conversations
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    query TEXT NOT NULL,
-                    answer TEXT NOT NULL,
-                    source TEXT NOT NULL,
-                    confidence_score REAL,
-                    kb_matches INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Table 2: Feedback
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS feedback (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversation_id INTEGER,
-                    query TEXT NOT NULL,
-                    answer TEXT NOT NULL,
-                    rating INTEGER CHECK(rating >= 1 AND rating <= 5),
-                    is_correct BOOLEAN,
-                    correction TEXT,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+        # Table 0: Content-addressed texts (queries, answers, corrections)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS texts (
+                hash BLOB PRIMARY KEY,
+                data BLOB NOT NULL,
+                compressed INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        
+        # Table 1: Conversations
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query_hash BLOB NOT NULL,
+                answer_hash BLOB NOT NULL,
+                source TEXT NOT NULL,
+                confidence_score REAL,
+                kb_matches INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Table 2: Feedback
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id INTEGER,
+                query_hash BLOB NOT NULL,
+                answer_hash BLOB NOT NULL,
+                rating INTEGER CHECK(rating >= 1 AND rating <= 5),
+                is_correct BOOLEAN,
+                correction TEXT,
+                notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+            )
+        """)
+        
+        # Table 3: Human Interventions (for significant corrections)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS human_interventions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                feedback_id INTEGER NOT NULL,
+                original_answer_hash BLOB NOT NULL,
+                corrected_answer_hash BLOB NOT NULL,
+                reason TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (feedback_id) REFERENCES feedback(id)
+            )
+        """)
+        
+        # Table 4: Sync checkpoints (e.g. KB enrichment progress)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Table 5: Admin approvals of human interventions; only approved corrections reach the KB.
+        # AUTOINCREMENT keeps ids increasing after archiving, so KB enrichment can checkpoint on them.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS intervention_approvals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                intervention_id INTEGER NOT NULL UNIQUE,
+                approved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (intervention_id) REFERENCES human_interventions(id)
+            )
+        """)
+        
+        # Table 6: Monthly partitions rolled out to archive files (see app/retention.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archived_partitions (
+                table_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                rollup TEXT NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, month)
+            )
+        """)
+        
+        # Recent-history, warm-up window and monthly partition queries use these
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_created ON conversations(created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created ON feedback(created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_interventions_created ON human_interventions(created_at)")
+        
+        # Read views with the texts joined back in
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS conversation_texts AS
+            SELECT c.id, text_of(q.data, q.compressed) AS query, text_of(a.data, a.compressed) AS answer,
+                   c.source, c.confidence_score, c.kb_matches, c.created_at
+            FROM conversations c
+            JOIN texts q ON q.hash = c.query_hash
+            JOIN texts a ON a.hash = c.answer_hash
+        """)
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS feedback_texts AS
+            SELECT f.id, f.conversation_id, text_of(q.data, q.compressed) AS query,
+                   text_of(a.data, a.compressed) AS answer, f.rating, f.is_correct,
+                   f.correction, f.notes, f.created_at
+            FROM feedback f
+            JOIN texts q ON q.hash = f.query_hash
+            JOIN texts a ON a.hash = f.answer_hash
+        """)
+        cursor.execute("""
+            CREATE VIEW IF NOT EXISTS intervention_texts AS
+            SELECT hi.id, hi.feedback_id, text_of(o.data, o.compressed) AS original_answer,
+                   text_of(c.data, c.compressed) AS corrected_answer, hi.reason, hi.created_at,
+                   ap.approved_at
+            FROM human_interventions hi
+            JOIN texts o ON o.hash = hi.original_answer_hash
+            JOIN texts c ON c.hash = hi.corrected_answer_hash
+            LEFT JOIN intervention_approvals ap ON ap.intervention_id = hi.id
+        """)
+    
+    def put_texts(self, cursor, texts: Iterable[str]) -> List[bytes]:
+        """Store texts not stored yet; returns their hashes in order."""
+        hashes, new = [], {}
+        for text in texts:
+            digest = text_hash(text)
+            hashes.append(digest)
+            if digest not in new:
+                new[digest] = text
+        if new:
+            # Take the write lock first, so gc_texts() cannot drop a text between the check and its use
+            if not cursor.connection.in_transaction:
+                cursor.execute("BEGIN IMMEDIATE")
+            # Skip compressing texts that are already stored (the common case for popular answers)
+            stored = set()
+            keys = list(new)
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                cursor.execute(
+                    f"SELECT hash FROM texts WHERE hash IN ({','.join('?' * len(chunk))})", chunk
                 )
-            """)
-            
-            # Table 3: Human Interventions (for significant corrections)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS human_interventions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    feedback_id INTEGER NOT NULL,
-                    original_answer TEXT NOT NULL,
-                    corrected_answer TEXT NOT NULL,
-                    reason TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (feedback_id) REFERENCES feedback(id)
+                stored.update(row[0] for row in cursor.fetchall())
+            cursor.executemany(
+                "INSERT OR IGNORE INTO texts (hash, data, compressed, raw_size) VALUES (?, ?, ?, ?)",
+                (
+                    (digest, *pack_text(text), len(text.encode("utf-8")))
+                    for digest, text in new.items() if digest not in stored
                 )
-            """)
-            
+            )
+        return hashes
+    
+    # ==================== MIGRATION ====================
+    
+    def _migrate(self):
+        """Create the schema, or convert a pre-text-store database in place."""
+        conn = self._connect(timeout=600)  # other workers wait for a running migration
+        migrated = False
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                conn.rollback()
+                return
+            cursor = conn.cursor()
+            columns = {row["name"] for row in cursor.execute("PRAGMA table_info(conversations)")}
+            if "answer" in columns:
+                self._migrate_to_text_store(cursor)
+                migrated = True
+            else:
+                # Version 3 adds approved_at to this view; CREATE VIEW IF NOT EXISTS would keep the old one
+                cursor.execute("DROP VIEW IF EXISTS intervention_texts")
+                self._create_tables(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        if migrated:
+            before = self.db_path.stat().st_size
+            conn = self._connect(timeout=600)
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+            after = self.db_path.stat().st_size
+            print(f"📊 Database compacted: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    
+    def _migrate_to_text_store(self, cursor):
+        """Move text columns into the content-addressed store (one transaction)."""
+        started = time.perf_counter()
+        print("⚠️ Migrating conversations DB to content-addressed text storage...")
+        for table in ("conversations", "feedback", "human_interventions"):
+            cursor.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+        self._create_tables(cursor)
+        
+        copies = [
+            ("conversations",
+             "SELECT id, query, answer, source, confidence_score, kb_matches, created_at FROM legacy_conversations",
+             "INSERT INTO conversations (id, query_hash, answer_hash, source, confidence_score, kb_matches, created_at) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?)"),
+            ("feedback",
+             "SELECT id, query, answer, conversation_id, rating, is_correct, correction, notes, created_at FROM legacy_feedback",
+             "INSERT INTO feedback (id, query_hash, answer_hash, conversation_id, rating, is_correct, correction, notes, created_at) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+            ("human_interventions",
+             "SELECT id, original_answer, corrected_answer, feedback_id, reason, created_at FROM legacy_human_interventions",
+             "INSERT INTO human_interventions (id, original_answer_hash, corrected_answer_hash, feedback_id, reason, created_at) "
+             "VALUES (?, ?, ?, ?, ?, ?)")
+        ]
+        # The first two selected text columns become hashes, the rest is copied as is
+        read = cursor.connection.cursor()
+        for table, select, insert in copies:
+            read.execute(select + " ORDER BY id")
+            copied = 0
+            while True:
+                rows = read.fetchmany(MIGRATION_CHUNK)
+                if not rows:
+                    break
+                hashes = self.put_texts(cursor, (text for row in rows for text in (row[1], row[2])))
+                cursor.executemany(insert, (
+                    (row[0], hashes[2 * i], hashes[2 * i + 1], *tuple(row)[3:])
+                    for i, row in enumerate(rows)
+                ))
+                copied += len(rows)
+            print(f"   ... {table}: {copied} rows")
+        
+        for table in ("human_interventions", "feedback", "conversations"):
+            cursor.execute(f"DROP TABLE legacy_{table}")
+        print(f"✅ Migration finished in {time.perf_counter() - started:.1f}s")
+    
+    def ping(self):
+        """Cheapest possible round trip on this thread's connection (used by the health probe)."""
+        self._conn().execute("SELECT 1").fetchone()
     
     # ==================== CONVERSATION METHODS ====================
     
@@ -109,33 +356,69 @@ class Database:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            query_hash, answer_hash = self.put_texts(cursor, (query, answer))
             cursor.execute("""
                 INSERT INTO conversations 
-                (query, answer, source, confidence_score, kb_matches)
+                (query_hash, answer_hash, source, confidence_score, kb_matches)
                 VALUES (?, ?, ?, ?, ?)
-            """, (query, answer, source, confidence_score, kb_matches))
+            """, (query_hash, answer_hash, source, confidence_score, kb_matches))
             return cursor.lastrowid
     
+    def save_conversations(self, rows: List[Dict]) -> List[int]:
+        """
+        Save many conversations with one executemany in a single transaction.
+        
+        Returns:
+            conversation ids, in the order of `rows`
+        """
+        if not rows:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            hashes = self.put_texts(cursor, (text for r in rows for text in (r["query"], r["answer"])))
+            cursor.executemany("""
+                INSERT INTO conversations 
+                (query_hash, answer_hash, source, confidence_score, kb_matches)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (hashes[2 * i], hashes[2 * i + 1], r["source"], r["confidence_score"], r["kb_matches"])
+                for i, r in enumerate(rows)
+            ])
+            # One writer per transaction, so the new ids are consecutive
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            return list(range(last_id - len(rows) + 1, last_id + 1))
+    
     def get_conversation(self, conversation_id: int) -> Optional[Dict]:
         """Get conversation by ID."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT * FROM conversations WHERE id = ?",
+                "SELECT * FROM conversation_texts WHERE id = ?",
                 (conversation_id,)
             )
             row = cursor.fetchone()
             return dict(row) if row else None
     
-    def get_recent_conversations(self, limit: int = 10) -> List[Dict]:
-        """Get recent conversations."""
+    def get_recent_conversations(self, limit: int = 10, summary: bool = False) -> List[Dict]:
+        """Get recent conversations (`summary`: no answer text, only its size; nothing to decompress)."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM conversations 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            """, (limit,))
+            if summary:
+                cursor.execute("""
+                    SELECT c.id, text_of(q.data, q.compressed) AS query, c.source,
+                           c.confidence_score, c.kb_matches, c.created_at, a.raw_size AS answer_bytes
+                    FROM conversations c
+                    JOIN texts q ON q.hash = c.query_hash
+                    JOIN texts a ON a.hash = c.answer_hash
+                    ORDER BY c.created_at DESC 
+                    LIMIT ?
+                """, (limit,))
+            else:
+                cursor.execute("""
+                    SELECT * FROM conversation_texts 
+                    ORDER BY created_at DESC 
+                    LIMIT ?
+                """, (limit,))
             return [dict(row) for row in cursor.fetchall()]
     
     # ==================== FEEDBACK METHODS ====================
@@ -158,17 +441,19 @@ class Database:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # Usually the same texts as the conversation row, so nothing new is stored
+            query_hash, answer_hash = self.put_texts(cursor, (query, answer))
             cursor.execute("""
                 INSERT INTO feedback
-                (conversation_id, query, answer, rating, is_correct, correction, notes)
+                (conversation_id, query_hash, answer_hash, rating, is_correct, correction, notes)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (conversation_id, query, answer, rating, is_correct, correction, notes))
+            """, (conversation_id, query_hash, answer_hash, rating, is_correct, correction, notes))
             
             feedback_id = cursor.lastrowid
             
             # If significant correction provided, save as human intervention
             if correction and len(correction) > 50:
-                self._save_intervention(cursor, feedback_id, answer, correction)
+                self._save_intervention(cursor, feedback_id, answer_hash, correction)
             
             return feedback_id
     
@@ -176,80 +461,386 @@ class Database:
         self,
         cursor,
         feedback_id: int,
-        original_answer: str,
+        original_answer_hash: bytes,
         corrected_answer: str
     ):
         """Save significant corrections as human interventions."""
+        corrected_hash, = self.put_texts(cursor, (corrected_answer,))
         cursor.execute("""
             INSERT INTO human_interventions
-            (feedback_id, original_answer, corrected_answer, reason)
+            (feedback_id, original_answer_hash, corrected_answer_hash, reason)
             VALUES (?, ?, ?, ?)
-        """, (feedback_id, original_answer, corrected_answer, "User provided substantial correction"))
+        """, (feedback_id, original_answer_hash, corrected_hash, "User provided substantial correction"))
     
     def get_feedback_stats(self) -> Dict:
-        """Get aggregate feedback statistics."""
+        """Get aggregate feedback statistics (hot rows plus archived rollups)."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_feedback,
-                    AVG(rating) as avg_rating,
-                    SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) as correct_count,
-                    SUM(CASE WHEN is_correct = 0 THEN 1 ELSE 0 END) as incorrect_count,
-                    SUM(CASE WHEN correction IS NOT NULL THEN 1 ELSE 0 END) as corrections_count
-                FROM feedback
-            """)
+            totals = self._feedback_rollup(cursor)
+            for rollup in self._archived_rollups(cursor, "feedback"):
+                for key, value in rollup.items():
+                    totals[key] += value
+        return {
+            "total_feedback": totals["count"],
+            "avg_rating": totals["rating_sum"] / totals["rating_count"] if totals["rating_count"] else None,
+            "correct_count": totals["correct"],
+            "incorrect_count": totals["incorrect"],
+            "corrections_count": totals["corrections"]
+        }
+    
+    def get_feedback(self, feedback_id: int) -> Optional[Dict]:
+        """Get feedback entry by ID."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM feedback_texts WHERE id = ?", (feedback_id,))
             row = cursor.fetchone()
-            return dict(row) if row else {}
+            return dict(row) if row else None
     
-    def get_recent_feedback(self, limit: int = 10) -> List[Dict]:
-        """Get recent feedback entries."""
+    def get_recent_feedback(self, limit: int = 10, summary: bool = False) -> List[Dict]:
+        """Get recent feedback entries (`summary`: without answer and correction texts)."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM feedback 
+            cursor.execute(f"""
+                SELECT {"id, conversation_id, query, rating, is_correct, correction IS NOT NULL AS has_correction, notes, created_at"
+                        if summary else "*"}
+                FROM feedback_texts 
                 ORDER BY created_at DESC 
                 LIMIT ?
             """, (limit,))
             return [dict(row) for row in cursor.fetchall()]
     
-    def get_human_interventions(self, limit: int = 10) -> List[Dict]:
-        """Get recent human interventions (significant corrections)."""
+    def get_human_intervention(self, intervention_id: int) -> Optional[Dict]:
+        """Get one human intervention by ID, with its question."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT hi.*, f.query, f.rating
-                FROM human_interventions hi
-                JOIN feedback f ON hi.feedback_id = f.id
+                FROM intervention_texts hi
+                JOIN feedback_texts f ON hi.feedback_id = f.id
+                WHERE hi.id = ?
+            """, (intervention_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def get_human_interventions(self, limit: int = 10, summary: bool = False) -> List[Dict]:
+        """Get recent human interventions (significant corrections); `summary` drops both answers."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {"hi.id, hi.feedback_id, hi.reason, hi.created_at" if summary else "hi.*"}, f.query, f.rating
+                FROM intervention_texts hi
+                JOIN feedback_texts f ON hi.feedback_id = f.id
                 ORDER BY hi.created_at DESC
                 LIMIT ?
             """, (limit,))
             return [dict(row) for row in cursor.fetchall()]
     
-    # ==================== ANALYTICS METHODS ====================
+    def get_pending_interventions(self, limit: int = 50) -> List[Dict]:
+        """Human interventions not approved yet, oldest first, with their question."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT hi.*, f.query, f.rating
+                FROM intervention_texts hi
+                JOIN feedback_texts f ON hi.feedback_id = f.id
+                WHERE hi.approved_at IS NULL
+                ORDER BY hi.id
+                LIMIT ?
+            """, (limit,))
+            return [dict(row) for row in cursor.fetchall()]
     
-    def get_source_distribution(self) -> Dict[str, int]:
-        """Get distribution of answer sources (KB vs web vs LLM)."""
+    def approve_intervention(self, intervention_id: int) -> Optional[int]:
+        """
+        Approve a human intervention for the verified KB tier.
+        
+        Returns:
+            approval id (the existing one if already approved), or None if no such intervention
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT source, COUNT(*) as count
-                FROM conversations
-                GROUP BY source
-            """)
-            return {row['source']: row['count'] for row in cursor.fetchall()}
+                INSERT OR IGNORE INTO intervention_approvals (intervention_id)
+                SELECT id FROM human_interventions WHERE id = ?
+            """, (intervention_id,))
+            cursor.execute(
+                "SELECT id FROM intervention_approvals WHERE intervention_id = ?", (intervention_id,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
     
-    def get_average_confidence_by_source(self) -> Dict[str, float]:
-        """Get average confidence score by source."""
+    def get_approved_interventions_since(self, last_approval_id: int, limit: int = 256) -> List[Dict]:
+        """Interventions approved after approval id `last_approval_id`, in approval order, with their question."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT ap.id AS approval_id, hi.id, hi.corrected_answer, f.query, f.rating
+                FROM intervention_approvals ap
+                JOIN intervention_texts hi ON hi.id = ap.intervention_id
+                JOIN feedback_texts f ON hi.feedback_id = f.id
+                WHERE ap.id > ?
+                ORDER BY ap.id
+                LIMIT ?
+            """, (last_approval_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_rated_feedback_since(self, last_id: int, min_rating: int, limit: int = 256) -> List[Dict]:
+        """
+        Uncorrected feedback rated >= min_rating (and not marked wrong) with id > last_id.
+        Only feedback on a stored conversation whose question and answer it repeats
+        exactly counts; free-form pairs posted to /api/feedback never qualify.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT f.id, text_of(q.data, q.compressed) AS query,
+                       text_of(a.data, a.compressed) AS answer, f.rating
+                FROM feedback f
+                JOIN conversations c
+                  ON c.id = f.conversation_id
+                 AND c.query_hash = f.query_hash
+                 AND c.answer_hash = f.answer_hash
+                JOIN texts q ON q.hash = f.query_hash
+                JOIN texts a ON a.hash = f.answer_hash
+                WHERE f.id > ?
+                  AND f.rating >= ?
+                  AND (f.is_correct IS NULL OR f.is_correct = 1)
+                  AND f.correction IS NULL
+                ORDER BY f.id
+                LIMIT ?
+            """, (last_id, min_rating, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    # ==================== CACHE WARM-UP ====================
+
+    def get_query_activity(self, days: int) -> List[Dict]:
+        """Ask counts per (exact query, day) over the last `days` days."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Group on the hash first, so each distinct query is decompressed once per day
+            cursor.execute("""
+                SELECT text_of(t.data, t.compressed) AS query, g.age_days, g.asks
+                FROM (
+                    SELECT query_hash,
+                           julianday('now') - julianday(date(created_at)) AS age_days,
+                           COUNT(*) AS asks
+                    FROM conversations
+                    WHERE created_at >= datetime('now', ?)
+                    GROUP BY query_hash, date(created_at)
+                ) g
+                JOIN texts t ON t.hash = g.query_hash
+            """, (f"-{int(days)} days",))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_query_ratings(self, days: int) -> List[Dict]:
+        """Feedback totals per exact query over the last `days` days."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # Same shape as get_query_activity: callers merge spellings with normalize_query
             cursor.execute("""
-                SELECT source, AVG(confidence_score) as avg_confidence
-                FROM conversations
-                WHERE confidence_score > 0
-                GROUP BY source
+                SELECT text_of(t.data, t.compressed) AS query, g.rating_sum, g.rated, g.marked_wrong, g.ratings
+                FROM (
+                    SELECT query_hash,
+                           COALESCE(SUM(rating), 0) AS rating_sum,
+                           COUNT(rating) AS rated,
+                           SUM(CASE WHEN is_correct = 0 THEN 1 ELSE 0 END) AS marked_wrong,
+                           COUNT(*) AS ratings
+                    FROM feedback
+                    WHERE created_at >= datetime('now', ?)
+                    GROUP BY query_hash
+                ) g
+                JOIN texts t ON t.hash = g.query_hash
+            """, (f"-{int(days)} days",))
+            return [dict(row) for row in cursor.fetchall()]
+
+    # ==================== SYNC CHECKPOINTS ====================
+    
+    def get_checkpoint(self, name: str) -> int:
+        """Last processed id for a sync job (0 if never run)."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT last_id FROM sync_state WHERE name = ?", (name,))
+            row = cursor.fetchone()
+            return row["last_id"] if row else 0
+    
+    def set_checkpoint(self, name: str, last_id: int):
+        with self.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO sync_state (name, last_id, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(name) DO UPDATE SET
+                    last_id = MAX(last_id, excluded.last_id),
+                    updated_at = excluded.updated_at
+            """, (name, last_id))
+    
+    def reset_checkpoint(self, name: str):
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM sync_state WHERE name = ?", (name,))
+    
+    # ==================== PARTITIONS ====================
+    
+    # Read view for each partitioned table (texts joined back in)
+    TEXT_VIEWS = {
+        "conversations": "conversation_texts",
+        "feedback": "feedback_texts",
+        "human_interventions": "intervention_texts"
+    }
+    
+    @staticmethod
+    def month_bounds(month: str) -> Tuple[str, str]:
+        """('YYYY-MM-01', first day of the next month) for a 'YYYY-MM' month."""
+        year, mon = int(month[:4]), int(month[5:7])
+        nxt = f"{year + 1:04d}-01" if mon == 12 else f"{year:04d}-{mon + 1:02d}"
+        return f"{month}-01", f"{nxt}-01"
+    
+    def get_hot_months(self, table: str, before: Optional[str] = None) -> List[str]:
+        """Months ('YYYY-MM') with rows still in `table`, oldest first, optionally only those before a date."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT DISTINCT substr(created_at, 1, 7) AS month
+                FROM {table}
+                WHERE ? IS NULL OR created_at < ?
+                ORDER BY month
+            """, (before, before))
+            return [row["month"] for row in cursor.fetchall()]
+    
+    def iter_month(self, table: str, month: str) -> Iterator[Dict]:
+        """Every row of one month of `table`, with texts, in id order."""
+        start, end = self.month_bounds(month)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM {self.TEXT_VIEWS[table]}
+                WHERE created_at >= ? AND created_at < ?
+                ORDER BY id
+            """, (start, end))
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                yield from (dict(row) for row in rows)
+    
+    def month_rollup(self, table: str, month: str) -> Dict:
+        """The aggregates `table` contributes to all-time stats, for one month."""
+        start, end = self.month_bounds(month)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            where = ("created_at >= ? AND created_at < ?", (start, end))
+            if table == "feedback":
+                return self._feedback_rollup(cursor, *where)
+            if table == "conversations":
+                return self._source_rollup(cursor, *where)
+            return {}
+    
+    def drop_month(self, table: str, month: str, expected_rows: int, path: str, rollup: Dict):
+        """Delete an archived month and record it in the catalog, in one transaction."""
+        start, end = self.month_bounds(month)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"DELETE FROM {table} WHERE created_at >= ? AND created_at < ?", (start, end))
+            if cursor.rowcount != expected_rows:
+                raise RuntimeError(
+                    f"{table} {month}: archived {expected_rows} rows but {cursor.rowcount} matched; nothing deleted"
+                )
+            if table == "human_interventions":
+                # Their approval state is in the archive (intervention_texts.approved_at)
+                cursor.execute("""
+                    DELETE FROM intervention_approvals
+                    WHERE intervention_id NOT IN (SELECT id FROM human_interventions)
+                """)
+            cursor.execute("""
+                INSERT INTO archived_partitions (table_name, month, rows, path, rollup)
+                VALUES (?, ?, ?, ?, ?)
+            """, (table, month, expected_rows, path, json.dumps(rollup)))
+    
+    def get_archived_partitions(self, table: Optional[str] = None) -> List[Dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT table_name, month, rows, path, archived_at FROM archived_partitions
+                WHERE ? IS NULL OR table_name = ?
+                ORDER BY table_name, month
+            """, (table, table))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def gc_texts(self) -> int:
+        """Delete texts no row references any more (after archiving); returns how many."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM texts WHERE hash NOT IN (
+                    SELECT query_hash FROM conversations
+                    UNION SELECT answer_hash FROM conversations
+                    UNION SELECT query_hash FROM feedback
+                    UNION SELECT answer_hash FROM feedback
+                    UNION SELECT original_answer_hash FROM human_interventions
+                    UNION SELECT corrected_answer_hash FROM human_interventions
+                )
             """)
-            return {row['source']: round(row['avg_confidence'], 3) for row in cursor.fetchall()}
+            return cursor.rowcount
+    
+    def vacuum(self):
+        conn = self._connect(timeout=600)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    
+    def _archived_rollups(self, cursor, table: str) -> List[Dict]:
+        cursor.execute("SELECT rollup FROM archived_partitions WHERE table_name = ?", (table,))
+        return [json.loads(row["rollup"]) for row in cursor.fetchall()]
+    
+    def _feedback_rollup(self, cursor, where: str = "1", params: tuple = ()) -> Dict:
+        cursor.execute(f"""
+            SELECT 
+                COUNT(*) as count,
+                COALESCE(SUM(rating), 0) as rating_sum,
+                COUNT(rating) as rating_count,
+                COALESCE(SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END), 0) as correct,
+                COALESCE(SUM(CASE WHEN is_correct = 0 THEN 1 ELSE 0 END), 0) as incorrect,
+                COALESCE(SUM(CASE WHEN correction IS NOT NULL THEN 1 ELSE 0 END), 0) as corrections
+            FROM feedback
+            WHERE {where}
+        """, params)
+        return dict(cursor.fetchone())
+    
+    def _source_rollup(self, cursor, where: str = "1", params: tuple = ()) -> Dict[str, Dict]:
+        cursor.execute(f"""
+            SELECT source,
+                   COUNT(*) as count,
+                   COALESCE(SUM(CASE WHEN confidence_score > 0 THEN confidence_score END), 0) as confidence_sum,
+                   COUNT(CASE WHEN confidence_score > 0 THEN 1 END) as confidence_count
+            FROM conversations
+            WHERE {where}
+            GROUP BY source
+        """, params)
+        return {row["source"]: {k: row[k] for k in ("count", "confidence_sum", "confidence_count")}
+                for row in cursor.fetchall()}
+    
+    def _sources_all_time(self) -> Dict[str, Dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            totals = self._source_rollup(cursor)
+            for rollup in self._archived_rollups(cursor, "conversations"):
+                for source, counts in rollup.items():
+                    entry = totals.setdefault(source, {"count": 0, "confidence_sum": 0.0, "confidence_count": 0})
+                    for key, value in counts.items():
+                        entry[key] += value
+            return totals
+    
+    # ==================== ANALYTICS METHODS ====================
+    
+    def get_source_distribution(self) -> Dict[str, int]:
+        """Get distribution of answer sources (KB vs web vs LLM)."""
+        return {source: counts["count"] for source, counts in self._sources_all_time().items()}
+    
+    def get_average_confidence_by_source(self) -> Dict[str, float]:
+        """Get average confidence score by source."""
+        return {
+            source: round(counts["confidence_sum"] / counts["confidence_count"], 3)
+            for source, counts in self._sources_all_time().items()
+            if counts["confidence_count"]
+        }
 
 # Global database instance
 _db: Optional[Database] = None
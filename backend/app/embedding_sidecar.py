@@ -0,0 +1,264 @@
+"""
+Shared embedding sidecar.
+
+With EMBEDDING_SIDECAR set, one process per host owns the embedding
+model (and its torch runtime, with EMBEDDING_THREADS intra-op threads)
+instead of every gunicorn worker loading its own copy. Workers talk to
+it over a Unix-domain socket through `SidecarEmbedder`, which mirrors
+`SentenceTransformer.encode`, so `get_embedder()` hands it to the
+retrievers and guardrails unchanged.
+
+Requests that arrive while the model is busy are encoded together in
+the next batch (up to EMBEDDING_SIDECAR_MAX_BATCH texts), so concurrent
+queries from all workers share one forward pass.
+
+Wire format, little-endian:
+    request:  u32 length, UTF-8 JSON list of texts
+    response: i32 rows, u32 dim, rows * dim float32
+              (rows = -1: u32 length + UTF-8 error message instead)
+
+Run standalone with `python -m app.embedding_sidecar`; gunicorn_config.py
+starts and supervises it automatically.
+"""
+
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import List, Optional, Union
+
+import numpy as np
+
+from app.config import settings
+
+_LENGTH = struct.Struct("<I")
+_SHAPE = struct.Struct("<iI")
+
+
+# ===== WIRE PROTOCOL =====
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if not k:
+            raise ConnectionError("embedding sidecar connection closed")
+        got += k
+    return bytes(buf)
+
+
+def _send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, length)
+
+
+def _send_vectors(sock: socket.socket, vectors: np.ndarray):
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    sock.sendall(_SHAPE.pack(*vectors.shape) + vectors.tobytes())
+
+
+def _send_error(sock: socket.socket, message: str):
+    sock.sendall(_SHAPE.pack(-1, 0))
+    _send_frame(sock, message.encode("utf-8"))
+
+
+def _recv_vectors(sock: socket.socket) -> np.ndarray:
+    rows, dim = _SHAPE.unpack(_recv_exact(sock, _SHAPE.size))
+    if rows < 0:
+        raise RuntimeError(f"embedding sidecar error: {_recv_frame(sock).decode('utf-8')}")
+    data = _recv_exact(sock, rows * dim * 4)
+    return np.frombuffer(data, dtype="<f4").reshape(rows, dim)
+
+
+# ===== SERVER =====
+
+class _Pending:
+    __slots__ = ("texts", "vectors", "error", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.vectors: Optional[np.ndarray] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class EmbeddingServer:
+    """Accepts connections from every worker and feeds one batching encode loop."""
+
+    def __init__(self, model, path: Optional[str] = None, max_batch: Optional[int] = None):
+        self.model = model
+        self.path = path or settings.EMBEDDING_SIDECAR_SOCKET
+        self.max_batch = max_batch or settings.EMBEDDING_SIDECAR_MAX_BATCH
+        self.dim = model.get_sentence_embedding_dimension()
+        self._requests: "queue.Queue[_Pending]" = queue.Queue()
+        self._sock: Optional[socket.socket] = None
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._sock.listen(128)
+        threading.Thread(target=self._encode_loop, name="embed-batcher", daemon=True).start()
+        print(f"✅ Embedding sidecar listening on {self.path} (dim {self.dim})")
+
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _handle(self, conn: socket.socket):
+        """One worker connection; requests on it are served in order."""
+        with conn:
+            while True:
+                try:
+                    texts = json.loads(_recv_frame(conn))
+                except (ConnectionError, OSError):
+                    return
+                pending = _Pending(texts)
+                self._requests.put(pending)
+                pending.done.wait()
+                try:
+                    if pending.error is not None:
+                        _send_error(conn, pending.error)
+                    else:
+                        _send_vectors(conn, pending.vectors)
+                except OSError:
+                    return
+
+    def _encode_loop(self):
+        """Encode everything queued so far in one call, then hand each request its rows."""
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0].texts)
+            while size < self.max_batch:
+                try:
+                    pending = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.texts)
+
+            texts = [text for pending in batch for text in pending.texts]
+            try:
+                if texts:
+                    vectors = np.asarray(self.model.encode(texts, batch_size=self.max_batch), dtype=np.float32)
+                else:
+                    vectors = np.zeros((0, self.dim), dtype=np.float32)
+                start = 0
+                for pending in batch:
+                    pending.vectors = vectors[start:start + len(pending.texts)]
+                    start += len(pending.texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = f"{type(e).__name__}: {e}"
+            for pending in batch:
+                pending.done.set()
+
+
+# ===== CLIENT =====
+
+class SidecarEmbedder:
+    """
+    Drop-in for `SentenceTransformer` that embeds through the sidecar.
+    Keeps a small pool of connections so concurrent threads in a worker
+    do not serialise on one socket.
+    """
+
+    CONNECT_TIMEOUT = 60.0  # the sidecar may still be loading the model
+
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = None):
+        self.path = path or settings.EMBEDDING_SIDECAR_SOCKET
+        self.timeout = timeout or settings.EMBEDDING_SIDECAR_TIMEOUT
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"embedding sidecar not reachable at {self.path}")
+                time.sleep(0.2)
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps(texts).encode("utf-8")
+        for attempt in range(2):
+            with self._lock:
+                sock = self._idle.pop() if self._idle else None
+            fresh = sock is None
+            sock = sock or self._connect()
+            try:
+                _send_frame(sock, payload)
+                vectors = _recv_vectors(sock)
+            except (ConnectionError, BrokenPipeError):
+                sock.close()
+                # A pooled socket may predate a sidecar restart: retry once on a new one
+                if fresh or attempt:
+                    raise
+                continue
+            except BaseException:
+                sock.close()
+                raise
+            with self._lock:
+                self._idle.append(sock)
+            return vectors
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._request([sentences])[0]
+        return self._request(list(sentences))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = self._request([]).shape[1]
+        return self._dim
+
+
+def main():
+    if settings.EMBEDDING_THREADS > 0:
+        try:
+            import torch
+
+            torch.set_num_threads(settings.EMBEDDING_THREADS)
+        except ImportError:
+            pass
+
+    from app.providers import get_local_embedder
+
+    server = EmbeddingServer(get_local_embedder())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
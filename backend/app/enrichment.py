@@ -0,0 +1,147 @@
+"""
+Feedback-driven KB enrichment.
+
+Human interventions (substantial corrections) and highly rated answers
+are embedded in batches and upserted into the retriever's "verified"
+tier, so repeat questions are served from the KB. Neither is taken on
+trust: a correction is synced only once an admin approves it
+(POST /api/admin/interventions/{id}/approve), and a rating only counts
+when it names a stored conversation and repeats that conversation's
+question and answer. Progress is checkpointed per source by last
+processed id (approval id for interventions) in the `sync_state` table.
+Once a correction is in the verified tier, its question is dropped from
+the answer cache, which is checked first and would keep serving the
+answer that was corrected.
+
+Runs as a background thread inside the API (KB_ENRICH_INTERVAL) or once
+from the command line:
+
+    python -m app.enrichment            # process everything new
+    python -m app.enrichment --reset    # re-sync from scratch (after re-ingesting the KB)
+"""
+
+import argparse
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.topics import classify_topic
+
+INTERVENTIONS = "kb_enrich_approved_interventions"
+RATED_FEEDBACK = "kb_enrich_feedback"
+
+
+class KBEnricher:
+    """Moves verified Q&A pairs from the conversations DB into the vector index."""
+
+    def __init__(self, retriever, db, batch_size: Optional[int] = None, answer_cache=None):
+        self.retriever = retriever
+        self.db = db
+        self.answer_cache = answer_cache
+        self.batch_size = batch_size or settings.KB_ENRICH_BATCH_SIZE
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # A per-process index (InMemoryRetriever) must not share checkpoints
+        # with other workers, or only the first one would receive the pairs.
+        self._local_checkpoints: Optional[Dict[str, int]] = (
+            None if getattr(retriever, "shared_index", True) else {}
+        )
+
+    def _checkpoint(self, name: str) -> int:
+        if self._local_checkpoints is not None:
+            return self._local_checkpoints.get(name, 0)
+        return self.db.get_checkpoint(name)
+
+    def _advance(self, name: str, last_id: int):
+        if self._local_checkpoints is not None:
+            self._local_checkpoints[name] = last_id
+        else:
+            self.db.set_checkpoint(name, last_id)
+
+    def _entry(self, key: str, question: str, answer: str, rating) -> Dict:
+        return {
+            "key": key,
+            "problem": question,
+            "solution": answer,
+            "type": classify_topic(question) or "",
+            "rating": rating
+        }
+
+    def _sync(self, checkpoint: str, rows: List[Dict], entries: List[Dict], id_key: str = "id") -> int:
+        if not rows:
+            return 0
+        vectors = self.retriever.embed_batch([e["problem"] for e in entries])
+        self.retriever.upsert_verified(entries, vectors)
+        # Only advance the checkpoint after a successful upsert
+        self._advance(checkpoint, max(r[id_key] for r in rows))
+        return len(entries)
+
+    def run_once(self) -> int:
+        """Process one batch from each source; returns the number of pairs upserted."""
+        rows = self.db.get_approved_interventions_since(self._checkpoint(INTERVENTIONS), self.batch_size)
+        total = self._sync(INTERVENTIONS, rows, [
+            self._entry(f"intervention:{r['id']}", r["query"], r["corrected_answer"], r["rating"])
+            for r in rows
+        ], id_key="approval_id")
+        if self.answer_cache is not None:
+            for r in rows:
+                self.answer_cache.delete(r["query"])
+
+        rows = self.db.get_rated_feedback_since(
+            self._checkpoint(RATED_FEEDBACK), settings.KB_ENRICH_MIN_RATING, self.batch_size
+        )
+        total += self._sync(RATED_FEEDBACK, rows, [
+            self._entry(f"feedback:{r['id']}", r["query"], r["answer"], r["rating"])
+            for r in rows
+        ])
+        return total
+
+    def run_until_caught_up(self) -> int:
+        total = 0
+        while True:
+            n = self.run_once()
+            total += n
+            if n == 0:
+                return total
+
+    def start(self, interval: Optional[float] = None):
+        """Run in a daemon thread every `interval` seconds."""
+        interval = interval if interval is not None else settings.KB_ENRICH_INTERVAL
+        if interval <= 0 or self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    n = self.run_until_caught_up()
+                    if n:
+                        print(f"✓ KB enrichment: {n} verified pairs upserted")
+                except Exception as e:
+                    print(f"⚠️ KB enrichment failed: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="kb-enrichment", daemon=True)
+        self._thread.start()
+        print(f"✅ KB enrichment running every {interval:g}s")
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    from app.database import get_db
+    from app.retrieval import get_retriever
+
+    parser = argparse.ArgumentParser(description="Sync verified Q&A pairs into the vector index")
+    parser.add_argument("--reset", action="store_true", help="Forget checkpoints and re-sync everything")
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.reset:
+        db.reset_checkpoint(INTERVENTIONS)
+        db.reset_checkpoint(RATED_FEEDBACK)
+
+    started = time.perf_counter()
+    n = KBEnricher(get_retriever(), db).run_until_caught_up()
+    print(f"✅ Upserted {n} verified pairs in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,154 @@
+"""
+Input guardrails.
+
+`GuardrailEngine` compiles every blocked term into one regex built from a
+prefix trie, with word boundaries, so the cost of a check barely grows
+with the number of rules and words like "hackenbush" or "adultery" no
+longer trip on "hack" / "adult". `SemanticMathCheck` is an optional
+"is this math?" test that reuses the query vector already computed for
+retrieval.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# category -> blocked terms (matched case-insensitively as whole words,
+# with an optional plural "s"/"es"; spaces match any whitespace)
+DEFAULT_RULES: Dict[str, List[str]] = {
+    "politics": [
+        "politics", "political party", "propaganda", "campaign donation",
+        "vote for", "who should i vote",
+    ],
+    "religion": ["religion", "religious", "blasphemy", "scripture"],
+    "weapons": [
+        "weapon", "firearm", "explosive", "bomb making", "make a bomb", "build a bomb",
+        "ammunition", "assault rifle", "silencer",
+    ],
+    "adult": [
+        "nsfw", "porn", "pornography", "pornographic", "nude", "nudity",
+        "adult content", "adult video", "adult site", "sexting", "erotic",
+    ],
+    "hacking": [
+        "hack", "hacker", "hacking", "hacked", "malware", "ransomware", "keylogger",
+        "phishing", "ddos", "sql injection", "crack a password", "password cracking",
+    ],
+    "self_harm": ["suicide", "self harm", "self-harm", "kill myself"],
+    "drugs": ["cocaine", "heroin", "methamphetamine", "buy drugs"],
+}
+
+
+def _trie_pattern(node: Dict) -> Optional[str]:
+    """Regex for a character trie node; shared prefixes are matched once."""
+    if "" in node and len(node) == 1:
+        return None
+
+    alternatives = []
+    single_chars = []
+    optional = False
+    for ch in sorted(node):
+        if ch == "":
+            optional = True
+            continue
+        sub = _trie_pattern(node[ch])
+        # A space in a term matches any run of whitespace
+        token = r"\s+" if ch == " " else re.escape(ch)
+        if sub is None and ch != " ":
+            single_chars.append(token)
+        else:
+            alternatives.append(token + (sub or ""))
+
+    only_chars = not alternatives
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else "[" + "".join(single_chars) + "]")
+
+    result = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if optional:
+        result = result + "?" if only_chars else "(?:" + result + ")?"
+    return result
+
+
+def compile_terms(terms: Iterable[str]) -> Optional["re.Pattern"]:
+    """
+    Compile terms into a single word-bounded trie regex. Terms are
+    lowercased; match against lowercased text (cheaper than IGNORECASE).
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in " ".join(term.lower().split()):
+            node = node.setdefault(ch, {})
+        node[""] = True
+    if not trie:
+        return None
+    return re.compile(rf"\b({_trie_pattern(trie)})(?:s|es)?\b")
+
+
+class GuardrailEngine:
+    """Blocklist guardrail backed by one precompiled regex."""
+
+    def __init__(self, rules: Optional[Dict[str, List[str]]] = None):
+        rules = rules if rules is not None else DEFAULT_RULES
+        self._categories = {
+            " ".join(term.lower().split()): category
+            for category, terms in rules.items()
+            for term in terms
+        }
+        self._pattern = compile_terms(self._categories)
+
+    def check(self, text: str) -> Optional[str]:
+        """Return the category of the first blocked term in `text`, or None."""
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text.lower())
+        return self._categories.get(" ".join(match.group(1).split())) if match else None
+
+    def allows(self, text: str) -> bool:
+        return self.check(text) is None
+
+
+MATH_PROTOTYPES = [
+    "Solve the equation for x.",
+    "Find the derivative of the function.",
+    "Evaluate the integral.",
+    "What is the area of the triangle?",
+    "How many ways can the items be arranged?",
+    "What is the probability of rolling a six?",
+    "Simplify the expression.",
+    "Find the remainder when the number is divided by 7.",
+    "Compute the sum of the series.",
+    "What is the value of sin(30 degrees)?",
+]
+
+
+class SemanticMathCheck:
+    """
+    Embedding-similarity "is this math?" check.
+
+    Compares the (already computed) query vector with a handful of math
+    prototype questions; anything below `min_similarity` is off-topic.
+    """
+
+    def __init__(self, model, min_similarity: float):
+        self.min_similarity = min_similarity
+        prototypes = np.asarray(model.encode(MATH_PROTOTYPES), dtype=np.float32)
+        self._prototypes = prototypes / np.linalg.norm(prototypes, axis=1, keepdims=True)
+
+    def similarity(self, query_vector: np.ndarray) -> float:
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        q = q / (np.linalg.norm(q) or 1.0)
+        return float(np.max(self._prototypes @ q))
+
+    def is_math(self, query_vector: np.ndarray) -> bool:
+        return self.similarity(query_vector) >= self.min_similarity
+
+
+_engine: Optional[GuardrailEngine] = None
+
+
+def get_guardrails() -> GuardrailEngine:
+    global _engine
+    if _engine is None:
+        _engine = GuardrailEngine()
+    return _engine
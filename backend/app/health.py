@@ -0,0 +1,154 @@
+"""
+Dependency health: background probes, cached results, connection warm-up.
+
+`HealthMonitor` probes each dependency from its own daemon thread and
+keeps the latest result, so /api/health only reads memory. A probe that
+fails marks its component "down"; one slower than the component's
+HEALTH_*_DEGRADED_MS threshold marks it "degraded".
+
+- database: `SELECT 1` every HEALTH_PROBE_INTERVAL seconds, on the probe
+            thread's persistent connection (the kind requests use too)
+- qdrant:   a one-point scroll every HEALTH_PROBE_INTERVAL seconds
+- llm:      a one-word prompt every HEALTH_LLM_PROBE_INTERVAL seconds,
+            skipped while real calls (reported by LLMExecutor) are fresh
+- wolfram:  passive only (real calls report in), the API is metered
+- embedder: once at startup (loads the model / opens the sidecar socket)
+
+`warm_up()` runs the first round of probes concurrently at startup, so
+the TLS handshakes and lazy client setup happen before the first user
+request. SQLite has no shared pool to warm: each thread opens its own
+connection on its first query and keeps it, so the startup probe only
+checks the file opens and pages in the schema. Results older than
+HEALTH_STALE_AFTER count as unknown.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+DOWN = "down"
+UNKNOWN = "unknown"
+
+
+class HealthMonitor:
+    """Latest probe result per component, refreshed in the background."""
+
+    def __init__(self):
+        self._results: Dict[str, Dict] = {}
+        self._probes: Dict[str, tuple] = {}  # name -> (probe, interval)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = False
+        self.thresholds = {
+            "qdrant": settings.HEALTH_QDRANT_DEGRADED_MS / 1000,
+            "llm": settings.HEALTH_LLM_DEGRADED_MS / 1000,
+            "wolfram": settings.HEALTH_WOLFRAM_DEGRADED_MS / 1000
+        }
+
+    # ===== RESULTS =====
+
+    def record(self, component: str, seconds: float, ok: bool = True, error: Optional[str] = None):
+        """Store one observation (from a probe or from a real call)."""
+        threshold = self.thresholds.get(component)
+        if not ok:
+            status = DOWN
+        elif threshold is not None and seconds > threshold:
+            status = DEGRADED
+        else:
+            status = HEALTHY
+        with self._lock:
+            self._results[component] = {
+                "status": status,
+                "latency_ms": round(seconds * 1000, 1),
+                "checked_at": time.time(),
+                "error": error
+            }
+
+    def status(self, component: str) -> str:
+        result = self._results.get(component)
+        if result is None or time.time() - result["checked_at"] > settings.HEALTH_STALE_AFTER:
+            return UNKNOWN
+        return result["status"]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        for name, result in results.items():
+            result["status"] = self.status(name)
+        return results
+
+    # ===== PROBES =====
+
+    def register(self, component: str, probe: Callable[[], Optional[bool]], interval: float):
+        """`probe()` raises on failure and returns False to skip a round; it is timed by the monitor."""
+        self._probes[component] = (probe, interval)
+
+    def probe(self, component: str):
+        probe, _ = self._probes[component]
+        started = time.perf_counter()
+        try:
+            if probe() is False:
+                return
+        except Exception as e:
+            self.record(component, time.perf_counter() - started, ok=False, error=f"{type(e).__name__}: {e}")
+            return
+        self.record(component, time.perf_counter() - started)
+
+    def warm_up(self, timeout: Optional[float] = None):
+        """First round of probes, concurrently; waits at most `timeout` seconds."""
+        if not self._probes:
+            return
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=len(self._probes), thread_name_prefix="warmup")
+        futures = [pool.submit(self.probe, name) for name in self._probes]
+        wait(futures, timeout=timeout if timeout is not None else settings.HEALTH_WARMUP_TIMEOUT)
+        pool.shutdown(wait=False)
+        summary = ", ".join(f"{name} {self.status(name)}" for name in self._probes)
+        print(f"✅ Connections warmed in {time.perf_counter() - started:.2f}s ({summary})")
+
+    def start(self):
+        """One daemon thread per probe, so a slow LLM never delays the Qdrant probe."""
+        if self._started:
+            return
+        self._started = True
+        for name, (_, interval) in self._probes.items():
+            if interval > 0:
+                threading.Thread(target=self._loop, args=(name, interval), name=f"health-{name}", daemon=True).start()
+
+    def _loop(self, component: str, interval: float):
+        while not self._stop.wait(interval):
+            self.probe(component)
+
+    def stop(self):
+        self._stop.set()
+
+
+def register_probes(monitor: HealthMonitor, agent, db):
+    """Wire up the standard probes for the serving components."""
+    monitor.register("database", db.ping, settings.HEALTH_PROBE_INTERVAL)
+    monitor.register("qdrant", agent.retriever.ping, settings.HEALTH_PROBE_INTERVAL)
+
+    def probe_llm():
+        # Real traffic already measures the LLM; only probe when it is quiet
+        last = monitor._results.get("llm")
+        if last and last["error"] is None and time.time() - last["checked_at"] < settings.HEALTH_LLM_PROBE_INTERVAL:
+            return False
+        agent.llm.invoke("Reply with the single word: ok")
+
+    monitor.register("llm", probe_llm, settings.HEALTH_LLM_PROBE_INTERVAL)
+    monitor.register("wolfram", agent.web_search_client.warm, 0)  # connection only, no query
+    monitor.register("embedder", lambda: agent.retriever.embed("warm up"), 0)
+
+
+_health: Optional[HealthMonitor] = None
+
+def get_health() -> HealthMonitor:
+    global _health
+    if _health is None:
+        _health = HealthMonitor()
+    return _health
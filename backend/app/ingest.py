@@ -0,0 +1,220 @@
+"""
+Shared KB ingestion helpers.
+
+Each KB point carries two named vectors: "problem" (the problem text
+alone, which is what a student's question looks like) and "full"
+("Problem: ...\\n\\nSolution: ..."). Used by scripts/setup_qdrant_cloud.py,
+the in-memory retriever and the ingest benchmarks.
+
+Datasets are stored as JSONL (one problem per line) and read as a
+stream, so download, normalization, embedding and upload hold only a
+few batches in memory at a time. Legacy JSON array files still load.
+"""
+
+import json
+import queue
+import threading
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.models import (
+    CompressionRatio,
+    Distance,
+    PointStruct,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+
+VECTOR_PROBLEM = "problem"
+VECTOR_FULL = "full"
+VECTOR_NAMES = (VECTOR_PROBLEM, VECTOR_FULL)
+
+
+def normalize_item(raw: Dict) -> Optional[Dict]:
+    """Map a raw dataset row to a KB item; None if it has no problem or solution."""
+    problem = (raw.get("problem") or "").strip()
+    solution = (raw.get("solution") or "").strip()
+    if not problem or not solution:
+        return None
+    return {
+        "problem": problem,
+        "solution": solution,
+        "level": raw.get("level") or "",
+        "type": raw.get("type") or ""
+    }
+
+
+def iter_dataset(path: Path) -> Iterator[Dict]:
+    """Stream KB items from a .jsonl file (or load a legacy .json array)."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_jsonl(items: Iterable[Dict], path: Path) -> int:
+    """Write items one per line via a temp file, so readers never see a partial dataset."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    tmp.replace(path)
+    return count
+
+
+def batched(items: Iterable[Dict], size: int) -> Iterator[Tuple[int, List[Dict]]]:
+    """Yield (offset, batch) chunks of `size` items."""
+    it = iter(items)
+    offset = 0
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield offset, batch
+        offset += len(batch)
+
+
+def prefetch(items: Iterable, depth: int = 2) -> Iterator:
+    """
+    Produce `items` on a background thread, at most `depth` ahead of the
+    consumer, e.g. to embed the next batch while the current one uploads.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(e)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+class DatasetStats:
+    """Dataset statistics accumulated while items stream past."""
+
+    def __init__(self):
+        self.total = 0
+        self.skipped = 0
+        self.levels: Counter = Counter()
+        self.types: Counter = Counter()
+        self.problem_chars = 0
+        self.solution_chars = 0
+
+    def track(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        """Pass items through, counting them; None entries (rejected rows) are dropped."""
+        for item in items:
+            if item is None:
+                self.skipped += 1
+                continue
+            self.total += 1
+            self.levels[item["level"]] += 1
+            self.types[item["type"]] += 1
+            self.problem_chars += len(item["problem"])
+            self.solution_chars += len(item["solution"])
+            yield item
+
+    def print_summary(self):
+        print(f"📊 Dataset statistics: {self.total} problems ({self.skipped} skipped)\n")
+        if self.total:
+            print(f"Average length: problem {self.problem_chars / self.total:.0f} chars, "
+                  f"solution {self.solution_chars / self.total:.0f} chars\n")
+        print("By Difficulty Level:")
+        for level, count in sorted(self.levels.items()):
+            print(f"  {level}: {count}")
+        print("\nBy Math Topic:")
+        for topic, count in sorted(self.types.items()):
+            print(f"  {topic}: {count}")
+
+
+def full_text(item: Dict) -> str:
+    return f"Problem: {item['problem']}\n\nSolution: {item['solution']}"
+
+
+def vectors_config(dim: int, named: bool = True, on_disk: bool = False):
+    """
+    Collection vectors config: both named vectors, or the legacy single
+    vector. With `on_disk` the original vectors live on disk (used with
+    quantization, where only the codes need to stay in RAM).
+    """
+    if not named:
+        return VectorParams(size=dim, distance=Distance.COSINE, on_disk=on_disk)
+    return {name: VectorParams(size=dim, distance=Distance.COSINE, on_disk=on_disk) for name in VECTOR_NAMES}
+
+
+def quantization_config(kind: str):
+    """Qdrant quantization for QUANTIZATION "none", "int8" or "pq"; codes are kept in RAM."""
+    if kind == "none":
+        return None
+    if kind == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "pq":
+        return ProductQuantization(product=ProductQuantizationConfig(compression=CompressionRatio.X16, always_ram=True))
+    raise ValueError(f"Unknown QUANTIZATION: {kind}")
+
+
+def embed_items(model, items: List[Dict], batch_size: int = 64, named: bool = True) -> Dict[str, np.ndarray]:
+    """Batch-encode a chunk of items; returns {vector name: (n, dim) array}."""
+    full = np.asarray(model.encode([full_text(item) for item in items], batch_size=batch_size), dtype=np.float32)
+    if not named:
+        return {VECTOR_FULL: full}
+    problem = np.asarray(model.encode([item["problem"] for item in items], batch_size=batch_size), dtype=np.float32)
+    return {VECTOR_PROBLEM: problem, VECTOR_FULL: full}
+
+
+def build_points(
+    items: List[Dict],
+    vectors: Dict[str, np.ndarray],
+    start_id: int = 0,
+    named: bool = True
+) -> List[PointStruct]:
+    points = []
+    for i, item in enumerate(items):
+        if named:
+            vector = {name: vectors[name][i].tolist() for name in VECTOR_NAMES}
+        else:
+            vector = vectors[VECTOR_FULL][i].tolist()
+        points.append(PointStruct(
+            id=start_id + i,
+            vector=vector,
+            payload={
+                "problem": item["problem"],
+                "solution": item["solution"],
+                "level": item.get("level", ""),
+                "type": item.get("type", ""),
+                "text": full_text(item)
+            }
+        ))
+    return points
+
+
+def named_vectors(collection_info) -> Optional[List[str]]:
+    """Vector names of an existing collection, or None for a single unnamed vector."""
+    vectors = collection_info.config.params.vectors
+    return list(vectors) if isinstance(vectors, dict) else None
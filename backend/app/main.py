@@ -2,17 +2,30 @@
 FastAPI application with SQLite database integration.
 """
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Annotated, Iterator, Literal, Optional, List, Dict
+import orjson
 import uvicorn
 
 
 # Use absolute imports (app.module instead of module)
+from app.compression import install_compression
+from app.admission import PRIORITY, STANDARD, Overloaded, client_key, get_admission
 from app.agent import get_agent
+from app.resilience import LLMUnavailableError
+from app.metrics import StageTimer, observe_request, render_metrics
+from app.profiling import get_profile_path, install_profiler, list_profiles, profiled
+from app.topics import classify_topic, make_title
 from app.config import settings
 from app.database import get_db, init_db
+from app.enrichment import KBEnricher
+from app.warmup import CacheWarmer
+from app.health import DEGRADED, DOWN, get_health, register_probes
 
 import os
 from pathlib import Path
@@ -26,7 +39,8 @@ sys.path.insert(0, str(Path(__file__).parent))
 app = FastAPI(
     title="Math Routing Agent API",
     description="AI-powered math tutor with knowledge base, web search, and human feedback",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # orjson: several times faster than json.dumps on answer lists
 )
 
 # CORS middleware
@@ -38,6 +52,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Sampling profiler (no-op unless PROFILING_ENABLED)
+install_profiler(app)
+
+# brotli/gzip for responses over COMPRESSION_MIN_BYTES (no-op unless COMPRESSION_ENABLED)
+install_compression(app)
+
 # ==================== PYDANTIC MODELS ====================
 
 class QueryRequest(BaseModel):
@@ -55,6 +75,25 @@ class QueryResponse(BaseModel):
     source: str
     confidence_score: float
     kb_matches: int
+    title: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None  # per-stage ms, DEBUG only
+
+class BatchQueryRequest(BaseModel):
+    queries: List[Annotated[str, Field(min_length=3, max_length=1000)]] = Field(
+        ..., min_length=1, max_length=settings.BATCH_MAX_QUERIES
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {"queries": ["What is 2+2?", "Find the derivative of x^2."]}
+        }
+
+class TopicTitleRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=1000)
+
+class TopicTitleResponse(BaseModel):
+    title: str
+    topic: Optional[str]
 
 class FeedbackRequest(BaseModel):
     query: str
@@ -92,18 +131,35 @@ class StatsResponse(BaseModel):
 # Global instances
 agent = None
 db = None
+enricher = None
+
+# Without any of these a query cannot be answered at all
+CORE_COMPONENTS = ("database", "qdrant", "llm")
 
 # ==================== STARTUP/SHUTDOWN ====================
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize agent and database on startup."""
-    global agent, db
+    global agent, db, enricher
     try:
         settings.validate()
         db = init_db()
         agent = get_agent()
         print("✅ Math Agent and Database initialized")
+        
+        # Hottest questions precomputed off-peak by `python -m app.warmup`
+        CacheWarmer(agent, db).load()
+        
+        # Feed verified answers from human feedback back into retrieval
+        enricher = KBEnricher(agent.retriever, db, answer_cache=agent.answer_cache)
+        enricher.start()
+        
+        # Set up every client before the first request, then keep probing in the background
+        health = get_health()
+        register_probes(health, agent, db)
+        await run_in_threadpool(health.warm_up)
+        health.start()
     except Exception as e:
         print(f"❌ Startup failed: {e}")
         raise
@@ -119,15 +175,19 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "query": "/api/query",
+            "query_batch": "/api/query/batch",
+            "topic_title": "/api/topic-title",
             "feedback": "/api/feedback",
             "stats": "/api/stats",
             "recent": "/api/conversations/recent",
+            "conversation": "/api/conversations/{conversation_id}",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
 @app.post("/api/query", response_model=QueryResponse)
-async def query_math(request: QueryRequest):
+async def query_math(request: QueryRequest, http_request: Request):
     """
     Submit a math question and get step-by-step answer.
     Saves conversation to database.
@@ -135,31 +195,118 @@ async def query_math(request: QueryRequest):
     if not agent or not db:
         raise HTTPException(status_code=503, detail="Service not initialized")
     
+    timer = StageTimer()
     try:
-        # Get answer from agent
-        result = agent.route_and_answer(request.query)
+        # Retrieval runs off the event loop so queued requests stay responsive
+        if settings.ADMISSION_ENABLED:
+            admission, client = get_admission(), client_key(http_request)
+            # Bounded before the lane is known; no-LLM answers then take the priority lane
+            async with admission.preparing(client, timer):
+                plan = await run_in_threadpool(profiled(agent.prepare), request.query, timer)
+            lane = STANDARD if agent.needs_llm(plan) else PRIORITY
+            async with admission.slot(client, lane, timer):
+                result = await run_in_threadpool(profiled(agent.complete), plan, timer)
+        else:
+            plan = await run_in_threadpool(profiled(agent.prepare), request.query, timer)
+            result = await run_in_threadpool(profiled(agent.complete), plan, timer)
         
         # Save to database
-        conversation_id = db.save_conversation(
-            query=result["query"],
-            answer=result["answer"],
-            source=result["source"],
-            confidence_score=result["confidence_score"],
-            kb_matches=result["kb_matches"]
-        )
+        with timer.stage("db_write"):
+            conversation_id = await run_in_threadpool(
+                profiled(db.save_conversation),
+                query=result["query"],
+                answer=result["answer"],
+                source=result["source"],
+                confidence_score=result["confidence_score"],
+                kb_matches=result["kb_matches"]
+            )
+        # Lets the profiler key its output by conversation
+        http_request.state.conversation_id = conversation_id
+        
+        timer.finish()
+        observe_request(timer, source=result["source"], cache_hit=plan["cache_hit"])
         
         return QueryResponse(
             conversation_id=conversation_id,
+            timings=timer.as_ms() if settings.DEBUG else None,
             **result
         )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except LLMUnavailableError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"LLM unavailable: {str(e)}",
+            headers={"Retry-After": str(int(settings.CIRCUIT_COOLDOWN))}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+def _batch_lines(queries: List[str], gate=None) -> Iterator[bytes]:
+    """NDJSON lines: one per question as it completes, then a summary line."""
+    # Identical questions are answered once
+    normalized = [" ".join(q.split()) for q in queries]
+    unique = list(dict.fromkeys(normalized))
+    positions: Dict[str, List[int]] = {}
+    for i, q in enumerate(normalized):
+        positions.setdefault(q, []).append(i)
+    
+    conversation_ids: List[Optional[int]] = [None] * len(queries)
+    for u, result in agent.answer_batch(unique, gate=gate):
+        indices = positions[unique[u]]
+        # Saved before the lines go out, so a client that disconnects mid-batch loses nothing answered
+        ids = db.save_conversations([result] * len(indices)) if "error" not in result else [None] * len(indices)
+        for i, conversation_id in zip(indices, ids):
+            conversation_ids[i] = conversation_id
+            yield orjson.dumps({"index": i, "conversation_id": conversation_id, **result}) + b"\n"
+    
+    yield orjson.dumps({
+        "done": True,
+        "total": len(queries),
+        "unique": len(unique),
+        "errors": conversation_ids.count(None),
+        "conversation_ids": conversation_ids
+    }) + b"\n"
+
+@app.post("/api/query/batch")
+async def query_math_batch(request: BatchQueryRequest, http_request: Request):
+    """
+    Answer a list of questions (e.g. a homework set).
+    Streams NDJSON: {"index": i, "conversation_id": id, ...answer} per question
+    as it completes, then a final {"done": true, "conversation_ids": [...]} line.
+    Each generation holds its own admission slot, in the lane /api/query would
+    use; a question shed by admission comes back as an "error" line.
+    """
+    if not agent or not db:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    
+    gate = None
+    if settings.ADMISSION_ENABLED:
+        admission, loop, client = get_admission(), asyncio.get_running_loop(), client_key(http_request)
+        gate = lambda needs_llm: admission.blocking_slot(loop, client, STANDARD if needs_llm else PRIORITY)
+    return StreamingResponse(_batch_lines(request.queries, gate), media_type="application/x-ndjson")
+
+@app.post("/api/topic-title", response_model=TopicTitleResponse)
+async def topic_title(request: TopicTitleRequest):
+    """
+    Short conversation title from a local keyword classifier (no LLM call).
+    /api/query also returns `title`, so clients can skip this round trip.
+    """
+    return TopicTitleResponse(
+        title=make_title(request.query),
+        topic=classify_topic(request.query)
+    )
+
 @app.post("/api/feedback", response_model=FeedbackResponse)
 async def submit_feedback(request: FeedbackRequest):
     """
     Submit feedback for an answer.
-    Saves to database and creates human intervention if correction is substantial.
+    Saves to database and creates human intervention if correction is substantial
+    (it reaches the KB only after an admin approves it).
     """
     if not db:
         raise HTTPException(status_code=503, detail="Database not initialized")
@@ -194,7 +341,7 @@ async def get_stats():
     
     try:
         feedback_stats = db.get_feedback_stats()
-        conversations = db.get_recent_conversations(limit=1000)  # Get all for count
+        conversations = db.get_recent_conversations(limit=1000, summary=True)  # Get all for count
         
         return StatsResponse(
             total_conversations=len(conversations),
@@ -206,55 +353,139 @@ async def get_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats retrieval failed: {str(e)}")
 
+# List endpoints take view=summary to leave out the long texts (answers,
+# corrections); clients fetch a full item by id when it is opened. These
+# return ORJSONResponse directly: DB rows are already plain JSON types, so
+# FastAPI's jsonable_encoder pass (slower than the encoding itself) is skipped.
+ListView = Literal["full", "summary"]
+
 @app.get("/api/conversations/recent")
-async def get_recent_conversations(limit: int = 10):
+async def get_recent_conversations(limit: int = 10, view: ListView = "full"):
     """Get recent conversations."""
     if not db:
         raise HTTPException(status_code=503, detail="Database not initialized")
     
-    return {"conversations": db.get_recent_conversations(limit=limit)}
+    return ORJSONResponse({"conversations": db.get_recent_conversations(limit=limit, summary=view == "summary")})
+
+@app.get("/api/conversations/{conversation_id}")
+async def get_conversation(conversation_id: int):
+    """Get one conversation with its full answer."""
+    if not db:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    
+    conversation = db.get_conversation(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return ORJSONResponse(conversation)
 
 @app.get("/api/feedback/recent")
-async def get_recent_feedback(limit: int = 10):
+async def get_recent_feedback(limit: int = 10, view: ListView = "full"):
     """Get recent feedback entries."""
     if not db:
         raise HTTPException(status_code=503, detail="Database not initialized")
     
-    return {"feedback": db.get_recent_feedback(limit=limit)}
+    return ORJSONResponse({"feedback": db.get_recent_feedback(limit=limit, summary=view == "summary")})
+
+@app.get("/api/feedback/{feedback_id}")
+async def get_feedback(feedback_id: int):
+    """Get one feedback entry with its answer and correction."""
+    if not db:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    
+    feedback = db.get_feedback(feedback_id)
+    if feedback is None:
+        raise HTTPException(status_code=404, detail="Feedback not found")
+    return ORJSONResponse(feedback)
 
 @app.get("/api/interventions")
-async def get_interventions(limit: int = 10):
+async def get_interventions(limit: int = 10, view: ListView = "full"):
     """Get human interventions (significant corrections)."""
     if not db:
         raise HTTPException(status_code=503, detail="Database not initialized")
     
-    return {"interventions": db.get_human_interventions(limit=limit)}
+    return ORJSONResponse({"interventions": db.get_human_interventions(limit=limit, summary=view == "summary")})
 
-@app.get("/api/health")
-async def health_check():
-    """Detailed health check."""
+@app.get("/api/interventions/{intervention_id}")
+async def get_intervention(intervention_id: int):
+    """Get one human intervention with the original and corrected answers."""
+    if not db:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    
+    intervention = db.get_human_intervention(intervention_id)
+    if intervention is None:
+        raise HTTPException(status_code=404, detail="Intervention not found")
+    return ORJSONResponse(intervention)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (aggregated across gunicorn workers)."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+def _require_admin(token: Optional[str]):
+    if not settings.ADMIN_TOKEN or token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/admin/profiles")
+async def get_profiles(x_admin_token: Optional[str] = Header(None)):
+    """List recently captured request profiles."""
+    _require_admin(x_admin_token)
+    return {"profiles": list_profiles()}
+
+@app.get("/api/admin/profiles/{name}")
+async def download_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download one profile (open it at https://www.speedscope.app)."""
+    _require_admin(x_admin_token)
+    path = get_profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
+
+@app.get("/api/admin/interventions/pending")
+async def get_pending_interventions(limit: int = 50, x_admin_token: Optional[str] = Header(None)):
+    """Corrections waiting for review before they can reach the verified KB tier."""
+    _require_admin(x_admin_token)
+    if not db:
+        raise HTTPException(status_code=503, detail="Database not initialized")
+    return ORJSONResponse({"interventions": db.get_pending_interventions(limit=limit)})
+
+@app.post("/api/admin/interventions/{intervention_id}/approve")
+async def approve_intervention(intervention_id: int, x_admin_token: Optional[str] = Header(None)):
+    """Approve a correction and sync it into the verified tier now, dropping its cached answer."""
+    _require_admin(x_admin_token)
+    if not db or not enricher:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    approval_id = db.approve_intervention(intervention_id)
+    if approval_id is None:
+        raise HTTPException(status_code=404, detail="Intervention not found")
     try:
-        db_status = "healthy" if db else "not_initialized"
-        agent_status = "healthy" if agent else "not_initialized"
-        
-        # Test database connection
-        if db:
-            try:
-                db.get_feedback_stats()
-            except:
-                db_status = "connection_failed"
-        
-        return {
-            "status": "healthy" if db_status == "healthy" and agent_status == "healthy" else "degraded",
-            "components": {
-                "database": db_status,
-                "agent": agent_status,
-                "qdrant": "healthy",
-                "llm": "healthy"
-            }
-        }
+        synced = await run_in_threadpool(enricher.run_until_caught_up)
     except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+        # The background loop retries; until then the old cached answer may still be served
+        print(f"⚠️ KB enrichment after approval failed: {e}")
+        synced = None
+    return {"status": "approved", "intervention_id": intervention_id, "approval_id": approval_id, "synced": synced}
+
+@app.get("/api/health")
+async def health_check():
+    """Detailed health check (cached background probe results; never calls a dependency)."""
+    components = get_health().snapshot()
+    statuses = {name: c["status"] for name, c in components.items()}
+    if agent is None or db is None:
+        status = "unhealthy"
+    elif any(statuses.get(name) == DOWN for name in CORE_COMPONENTS):
+        status = "unhealthy"
+    elif any(s in (DEGRADED, DOWN) for s in statuses.values()):
+        status = "degraded"
+    else:
+        status = "healthy"
+    
+    return {
+        "status": status,
+        "components": components,
+        "admission": get_admission().stats() if settings.ADMISSION_ENABLED else None,
+        "answer_cache": agent.answer_cache.stats() if agent and agent.answer_cache else None
+    }
 
 if __name__ == "__main__":
     uvicorn.run(
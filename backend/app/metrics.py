@@ -0,0 +1,122 @@
+"""
+Per-stage latency instrumentation and Prometheus export.
+
+A `StageTimer` collects timings for one request; `observe_request()`
+pushes them into the stage histogram once the route source is known.
+When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn_config.py) samples
+from every gunicorn worker are aggregated at scrape time.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGES = (
+    "queue_wait",
+    "guardrails",
+    "symbolic",
+    "embed",
+    "vector_search",
+    "rerank",
+    "wolfram",
+    "prompt_build",
+    "llm_first_token",
+    "llm_total",
+    "db_write",
+    "end_to_end",
+)
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+STAGE_SECONDS = Histogram(
+    "math_agent_stage_seconds",
+    "Time spent in each stage of a /api/query request",
+    ["stage", "source", "cache_hit"],
+    buckets=LATENCY_BUCKETS
+)
+
+# Admission control (app/admission.py); gauges are summed across workers
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "math_agent_admission_queue_depth",
+    "Requests waiting for an answer slot",
+    ["lane"],
+    multiprocess_mode="livesum"
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "math_agent_admission_in_flight",
+    "Requests holding an answer slot",
+    ["lane"],
+    multiprocess_mode="livesum"
+)
+ADMISSION_SHED = Counter(
+    "math_agent_admission_shed_total",
+    "Requests rejected with 503 by admission control",
+    ["lane", "reason"]
+)
+
+# Answer / embedding caches (app/cache.py): l1_hit, l2_hit, miss, coalesced
+CACHE_LOOKUPS = Counter(
+    "math_agent_cache_lookups_total",
+    "Cache lookups by cache and outcome",
+    ["cache", "outcome"]
+)
+
+
+class StageTimer:
+    """Collects per-stage wall-clock durations (seconds) for a single request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float):
+        """Add `seconds` to stage `name` (stages may run more than once)."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def record_once(self, name: str, seconds: float):
+        """Record `name` only if it has not been recorded yet (first token, hedged calls)."""
+        self.durations.setdefault(name, seconds)
+
+    def finish(self):
+        self.durations["end_to_end"] = time.perf_counter() - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.durations.items()}
+
+
+def observe_request(timer: StageTimer, source: str, cache_hit: bool = False):
+    """Export a finished request's stage timings to the histogram."""
+    for name, seconds in timer.durations.items():
+        STAGE_SECONDS.labels(stage=name, source=source, cache_hit=str(cache_hit).lower()).observe(seconds)
+
+
+def render_metrics() -> tuple:
+    """Return (payload, content_type) for the /metrics endpoint."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
@@ -0,0 +1,154 @@
+"""
+Opt-in sampling profiler for production requests.
+
+When PROFILING_ENABLED is set, 1-in-N requests (or any request carrying
+the PROFILING_HEADER header) run under pyinstrument and the result is
+written as a speedscope JSON file keyed by conversation id. When
+disabled nothing is installed and pyinstrument is never imported.
+
+pyinstrument samples only the thread it was started in, and the request
+work runs in the threadpool, not on the event loop. So a profiled request
+gets one profiler on the event loop plus one inside every threadpool
+callable wrapped with `profiled()`. Each of them becomes a separate
+profile in the saved file (speedscope lists them by thread). Threads those
+callables start themselves, such as the LLM executor's, are not sampled;
+their time shows up as the caller's wait.
+"""
+
+import functools
+import json
+import random
+import re
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+
+from app.config import settings
+
+PROFILE_SUFFIX = ".speedscope.json"
+_name_re = re.compile(r"^[\w.-]+$")
+
+# (label, pyinstrument session) per sampled thread of the request being profiled
+_sessions: ContextVar[Optional[List[Tuple[str, object]]]] = ContextVar("profiling_sessions", default=None)
+
+
+def _should_profile(request: Request) -> bool:
+    if request.headers.get(settings.PROFILING_HEADER):
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < 1.0 / rate
+
+
+def profiled(fn: Callable) -> Callable:
+    """Wrap a callable for run_in_threadpool so that a profiled request also samples its worker thread."""
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        sessions = _sessions.get()  # run_in_threadpool copies the request's context
+        if sessions is None:
+            return fn(*args, **kwargs)
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="disabled")
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sessions.append((f"thread: {fn.__qualname__}", profiler.stop()))
+    return run
+
+
+def _speedscope(sessions: List[Tuple[str, object]]) -> str:
+    """One speedscope file holding one named profile per session, over a shared frame table."""
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    merged = None
+    for label, session in sessions:
+        doc = json.loads(SpeedscopeRenderer().render(session))
+        if merged is None:
+            merged = dict(doc, profiles=[], shared={"frames": []})
+        offset = len(merged["shared"]["frames"])
+        merged["shared"]["frames"].extend(doc["shared"]["frames"])
+        for profile in doc["profiles"]:
+            for event in profile["events"]:
+                event["frame"] += offset
+            merged["profiles"].append(dict(profile, name=label))
+    return json.dumps(merged)
+
+
+def _save_profile(sessions: List[Tuple[str, object]], request: Request) -> Path:
+    conversation_id = getattr(request.state, "conversation_id", None)
+    slug = request.url.path.strip("/").replace("/", "-") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}_{conversation_id or 'none'}_{slug}{PROFILE_SUFFIX}"
+
+    profile_dir = settings.PROFILING_DIR
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    path = profile_dir / name
+    path.write_text(_speedscope(sessions), encoding="utf-8")
+
+    # Keep only the most recent profiles
+    for old in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        (profile_dir / old["name"]).unlink(missing_ok=True)
+    return path
+
+
+def install_profiler(app: FastAPI):
+    """Register the profiling middleware if profiling is enabled in settings."""
+    if not settings.PROFILING_ENABLED:
+        return
+
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not _should_profile(request):
+            return await call_next(request)
+
+        sessions: List[Tuple[str, object]] = []
+        token = _sessions.set(sessions)
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            return await call_next(request)
+        finally:
+            sessions.insert(0, ("event loop", profiler.stop()))
+            _sessions.reset(token)
+            try:
+                path = _save_profile(sessions, request)
+                print(f"✓ Profile saved: {path.name}")
+            except Exception as e:
+                print(f"⚠️ Could not save profile: {e}")
+
+    print(f"✅ Request profiling enabled (1 in {settings.PROFILING_SAMPLE_RATE})")
+
+
+def list_profiles() -> List[Dict]:
+    """Saved profiles, newest first."""
+    if not settings.PROFILING_DIR.exists():
+        return []
+    files = sorted(
+        settings.PROFILING_DIR.glob(f"*{PROFILE_SUFFIX}"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True
+    )
+    profiles = []
+    for path in files:
+        parts = path.name.split("_", 2)
+        stat = path.stat()
+        profiles.append({
+            "name": path.name,
+            "conversation_id": parts[1] if len(parts) == 3 and parts[1] != "none" else None,
+            "size_bytes": stat.st_size,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stat.st_mtime))
+        })
+    return profiles
+
+
+def get_profile_path(name: str) -> Optional[Path]:
+    """Resolve a profile name to its file, refusing anything outside the profile dir."""
+    if not _name_re.match(name) or not name.endswith(PROFILE_SUFFIX):
+        return None
+    path = settings.PROFILING_DIR / name
+    return path if path.is_file() else None
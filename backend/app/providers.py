@@ -0,0 +1,191 @@
+"""
+Pluggable LLM and embedding providers.
+
+`get_llm()` and `get_embedder()` pick the implementation from settings so
+the serving path can run against Gemini / SentenceTransformers in
+production, or against deterministic local stand-ins for load testing
+and CI without any network access.
+"""
+
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional, Union
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from app.config import settings
+
+EMBEDDING_DIM = 384
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedder (feature hashing, L2-normalised).
+
+    Mirrors the `SentenceTransformer.encode` call signature so it can be
+    dropped in wherever the real model is used. Quality is far below a
+    trained model, but identical text always maps to the same vector and
+    shared vocabulary produces positive cosine similarity.
+    """
+
+    _token_re = re.compile(r"[a-z0-9]+|[^\sa-z0-9]")
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in self._token_re.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._embed_one(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed_one(s) for s in sentences])
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model with a configurable latency distribution.
+
+    The answer text depends only on the prompt. Time-to-first-token is
+    drawn from `latency_dist` ("constant", "uniform" or "lognormal")
+    around `latency_ms`; each streamed token then costs `token_ms`.
+    """
+
+    latency_dist: str = "lognormal"
+    latency_ms: float = 800.0
+    latency_sigma: float = 0.5
+    token_ms: float = 5.0
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-math-tutor"
+
+    def sample_latency(self) -> float:
+        """Draw one time-to-first-token value in seconds."""
+        with self._lock:
+            if self.latency_dist == "constant":
+                ms = self.latency_ms
+            elif self.latency_dist == "uniform":
+                ms = self._rng.uniform(0.0, 2 * self.latency_ms)
+            elif self.latency_dist == "lognormal":
+                ms = self._rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+            else:
+                raise ValueError(f"Unknown latency distribution: {self.latency_dist}")
+        return ms / 1000.0
+
+    def _render(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        question = prompt.split("Question:\n", 1)[-1].split("\n\nContext:", 1)[0].strip()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"Step 1: Restate the problem\n{question}\n\n"
+            "Step 2: Apply the relevant method from the context\n"
+            "Work through the computation one step at a time.\n\n"
+            f"FINAL ANSWER: see steps above (ref {digest})\n\n"
+            "TIP: Check your result by substituting it back."
+        )
+
+    def _tokens(self, text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> ChatResult:
+        text = self._render(messages)
+        time.sleep(self.sample_latency() + len(self._tokens(text)) * self.token_ms / 1000.0)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        text = self._render(messages)
+        time.sleep(self.sample_latency())
+        for token in self._tokens(text):
+            time.sleep(self.token_ms / 1000.0)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def get_llm():
+    """Build the chat model selected by LLM_PROVIDER ("gemini" or "fake")."""
+    if settings.LLM_PROVIDER == "fake":
+        return FakeChatModel(
+            latency_dist=settings.FAKE_LLM_LATENCY_DIST,
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            latency_sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+            token_ms=settings.FAKE_LLM_TOKEN_MS,
+            seed=settings.FAKE_LLM_SEED
+        )
+    if settings.LLM_PROVIDER == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=settings.GEMINI_MODEL,
+            api_key=settings.GOOGLE_API_KEY,
+            temperature=0.2,
+            timeout=settings.LLM_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
+
+
+def get_embedder():
+    """
+    Embedder for this process: a client of the shared sidecar when
+    EMBEDDING_SIDECAR is set (see app/embedding_sidecar.py), otherwise
+    the model itself.
+    """
+    if settings.EMBEDDING_SIDECAR:
+        from app.embedding_sidecar import SidecarEmbedder
+
+        return SidecarEmbedder()
+    return get_local_embedder()
+
+
+def get_local_embedder():
+    """Build the embedder selected by EMBEDDING_PROVIDER ("sentence_transformers" or "hashing")."""
+    if settings.EMBEDDING_PROVIDER == "hashing":
+        return HashingEmbedder()
+    if settings.EMBEDDING_PROVIDER == "sentence_transformers":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(settings.EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {settings.EMBEDDING_PROVIDER}")
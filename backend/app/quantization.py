@@ -0,0 +1,127 @@
+"""
+Vector quantizers for the local index.
+
+`ScalarQuantizer` stores one uint8 per dimension (4x smaller than
+float32); `ProductQuantizer` splits vectors into sub-spaces and stores
+one centroid id per sub-space (16x smaller with 4-dim sub-spaces, the
+same ratio as Qdrant's CompressionRatio.X16). Both score inner products
+directly against the codes; `QuantizedVectorIndex` in app/retrieval.py
+then rescores the best candidates with full-precision vectors.
+"""
+
+import numpy as np
+
+SCORE_CHUNK = 16_384  # rows decoded per step, bounds temporary memory
+FIT_SAMPLE = 100_000
+
+
+def _sample(vectors: np.ndarray, n: int, seed: int) -> np.ndarray:
+    if len(vectors) <= n:
+        return np.asarray(vectors, dtype=np.float32)
+    rows = np.random.default_rng(seed).choice(len(vectors), n, replace=False)
+    return np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension uint8 quantization over each dimension's min..max range.
+    A `quantile` below 1 clips outliers, but on sparse embeddings it
+    saturates most non-zero values, so it is off by default.
+    """
+
+    def __init__(self, quantile: float = 1.0, seed: int = 0):
+        self.quantile = quantile
+        self.seed = seed
+        self.low = None
+        self.scale = None
+
+    def fit(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        sample = _sample(vectors, FIT_SAMPLE, self.seed)
+        self.low = np.quantile(sample, 1 - self.quantile, axis=0).astype(np.float32)
+        high = np.quantile(sample, self.quantile, axis=0).astype(np.float32)
+        self.scale = np.maximum((high - self.low) / 255.0, 1e-8).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, len(vectors), SCORE_CHUNK):
+            block = np.asarray(vectors[start:start + SCORE_CHUNK], dtype=np.float32)
+            codes[start:start + SCORE_CHUNK] = np.clip(np.rint((block - self.low) / self.scale), 0, 255)
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products, shape (len(queries), len(codes))."""
+        scaled = queries * self.scale
+        bias = queries @ self.low
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK].astype(np.float32)
+            out[:, start:start + SCORE_CHUNK] = scaled @ block.T
+        out += bias[:, None]
+        return out
+
+    def nbytes(self) -> int:
+        return self.low.nbytes + self.scale.nbytes
+
+
+class ProductQuantizer:
+    """Product quantization with 256 k-means centroids per sub-space."""
+
+    def __init__(self, dim: int, subspace_dim: int = 4, iterations: int = 15, sample: int = 20_000, seed: int = 0):
+        if dim % subspace_dim:
+            raise ValueError(f"dim {dim} is not divisible by subspace_dim {subspace_dim}")
+        self.dim = dim
+        self.subspace_dim = subspace_dim
+        self.subspaces = dim // subspace_dim
+        self.iterations = iterations
+        self.sample = sample
+        self.seed = seed
+        self.centroids = None  # (subspaces, 256, subspace_dim)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subspaces, self.subspace_dim)
+
+    def fit(self, vectors: np.ndarray) -> "ProductQuantizer":
+        rng = np.random.default_rng(self.seed)
+        parts = self._split(_sample(vectors, self.sample, self.seed))
+        k = min(256, len(parts))
+        self.centroids = np.zeros((self.subspaces, 256, self.subspace_dim), dtype=np.float32)
+        for j in range(self.subspaces):
+            x = parts[:, j, :]
+            centroids = x[rng.choice(len(x), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assign = self._nearest(x, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, x)
+                counts = np.bincount(assign, minlength=k)[:, None]
+                # Empty clusters keep their previous centroid
+                centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            self.centroids[j, :k] = centroids
+        return self
+
+    @staticmethod
+    def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmin((centroids ** 2).sum(axis=1) - 2.0 * x @ centroids.T, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), SCORE_CHUNK):
+            parts = self._split(np.asarray(vectors[start:start + SCORE_CHUNK], dtype=np.float32))
+            for j in range(self.subspaces):
+                codes[start:start + SCORE_CHUNK, j] = self._nearest(parts[:, j, :], self.centroids[j])
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner products via per-query lookup tables."""
+        # (queries, subspaces, 256): partial inner product with every centroid
+        tables = np.einsum("qms,mcs->qmc", self._split(queries), self.centroids)
+        subspace = np.arange(self.subspaces)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK):
+            block = codes[start:start + SCORE_CHUNK]
+            for i, table in enumerate(tables):
+                out[i, start:start + SCORE_CHUNK] = table[subspace, block].sum(axis=1)
+        return out
+
+    def nbytes(self) -> int:
+        return self.centroids.nbytes
@@ -0,0 +1,130 @@
+"""
+Post-retrieval diversification and re-ranking.
+
+The retriever fetches RERANK_CANDIDATES hits (with their vectors) and
+`Reranker` trims them to TOP_K: maximal marginal relevance drops
+near-duplicate MATH problems, then an optional CPU cross-encoder reorders
+what is left. The cross-encoder only scores as many pairs as fit in the
+remaining RERANK_BUDGET_MS, based on its measured per-pair cost.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.retrieval import _unit_rows
+
+
+def mmr_select(
+    relevance: np.ndarray,
+    vectors: np.ndarray,
+    k: int,
+    lambda_mult: float,
+    duplicate_threshold: float = 1.0,
+    pinned: Optional[np.ndarray] = None
+) -> List[int]:
+    """
+    Greedy maximal marginal relevance over unit `vectors`.
+
+    Picks up to `k` indices maximising
+    `lambda_mult * relevance - (1 - lambda_mult) * max_sim_to_selected`.
+    Candidates at least `duplicate_threshold` similar to something already
+    selected (or to a `pinned` vector) are dropped outright, so fewer than
+    `k` indices may come back.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    sim = vectors @ vectors.T
+    if pinned is not None and len(pinned):
+        max_sim = (vectors @ pinned.T).max(axis=1)
+    else:
+        max_sim = np.full(n, -np.inf, dtype=np.float32)
+
+    available = np.ones(n, dtype=bool)
+    chosen: List[int] = []
+    while len(chosen) < k:
+        available &= max_sim < duplicate_threshold
+        if not available.any():
+            break
+        penalty = np.where(np.isfinite(max_sim), max_sim, 0.0)
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        chosen.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, sim[best])
+    return chosen
+
+
+class Reranker:
+    """MMR diversification plus an optional cross-encoder, under a latency budget."""
+
+    def __init__(self, cross_encoder=None):
+        self.enabled = settings.RERANK_ENABLED
+        self.candidates = max(settings.RERANK_CANDIDATES, settings.TOP_K)
+        self.lambda_mult = settings.RERANK_MMR_LAMBDA
+        self.duplicate_threshold = settings.RERANK_DUPLICATE_THRESHOLD
+        self.budget = settings.RERANK_BUDGET_MS / 1000.0
+        self.cross_encoder = cross_encoder
+        if self.cross_encoder is None and self.enabled and settings.RERANK_CROSS_ENCODER:
+            from sentence_transformers import CrossEncoder
+
+            self.cross_encoder = CrossEncoder(settings.RERANK_CROSS_ENCODER, device="cpu")
+            print(f"✓ Cross-encoder re-ranker loaded: {settings.RERANK_CROSS_ENCODER}")
+        self._pair_seconds: Optional[float] = None  # EWMA of cross-encoder cost per pair
+
+    @property
+    def fetch_k(self) -> int:
+        """How many hits to ask the retriever for."""
+        return self.candidates if self.enabled else settings.TOP_K
+
+    def rerank(self, query: str, hits: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Reduce `hits` (carrying a "vector" key) to at most `top_k`.
+        Verified hits stay pinned at the front; the "vector" keys are removed.
+        """
+        started = time.perf_counter()
+        hits = [dict(h) for h in hits]
+        vectors = [h.pop("vector", None) for h in hits]
+        if not self.enabled or not hits or any(v is None for v in vectors):
+            return hits[:top_k]
+
+        vectors = np.stack(vectors)
+        vectors = _unit_rows(vectors, vectors.shape[1])
+        verified = [i for i, h in enumerate(hits) if h["verified"]][:top_k]
+        regular = [i for i, h in enumerate(hits) if not h["verified"]]
+        picked = mmr_select(
+            np.asarray([hits[i]["score"] for i in regular], dtype=np.float32),
+            vectors[regular],
+            top_k - len(verified),
+            self.lambda_mult,
+            self.duplicate_threshold,
+            pinned=vectors[verified]
+        ) if regular else []
+        selected = [hits[regular[i]] for i in picked]
+
+        if self.cross_encoder is not None and len(selected) > 1:
+            selected = self._cross_encode(query, selected, self.budget - (time.perf_counter() - started))
+        return [hits[i] for i in verified] + selected
+
+    def _cross_encode(self, query: str, hits: List[Dict], remaining: float) -> List[Dict]:
+        """Reorder the head of `hits` by cross-encoder score, as far as the budget allows."""
+        if remaining <= 0:
+            return hits  # MMR used up the budget; not even the first (unmeasured) call fits
+        n = len(hits) if self._pair_seconds is None else int(remaining / self._pair_seconds)
+        n = min(n, len(hits))
+        if n < 2:
+            return hits
+
+        t0 = time.perf_counter()
+        scores = self.cross_encoder.predict([(query, h["problem"]) for h in hits[:n]])
+        per_pair = (time.perf_counter() - t0) / n
+        self._pair_seconds = per_pair if self._pair_seconds is None else 0.8 * self._pair_seconds + 0.2 * per_pair
+
+        for h, s in zip(hits[:n], scores):
+            h["rerank_score"] = float(s)
+        head = sorted(hits[:n], key=lambda h: h["rerank_score"], reverse=True)
+        return head + hits[n:]
@@ -0,0 +1,262 @@
+"""
+Resilience layer for LLM calls.
+
+Wraps every generation in a per-call deadline, an adaptive concurrency
+limit, optional request hedging and a circuit breaker so that a slow
+upstream cannot tie up a worker for the full gunicorn timeout.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.health import get_health
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the LLM cannot answer within budget (deadline, overload, open circuit)."""
+
+
+class LatencyTracker:
+    """Rolling window of observed call latencies in seconds."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0-100) or None if nothing was recorded."""
+        with self._lock:
+            data = sorted(self._samples)
+        if not data:
+            return None
+        idx = min(len(data) - 1, max(0, math.ceil(p / 100 * len(data)) - 1))
+        return data[idx]
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit sized from observed latency (gradient algorithm).
+
+    A long-term latency average acts as the no-load baseline; when the
+    short-term average rises above it the limit shrinks proportionally,
+    and it grows again by roughly sqrt(limit) while latency stays flat.
+    Calls that fail or time out halve the limit.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.in_flight = 0
+        self._short_rtt: Optional[float] = None
+        self._long_rtt: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        """Block until a slot is free or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now."""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, dropped: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if dropped:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self._update(latency)
+            self._cond.notify_all()
+
+    def _update(self, latency: float):
+        if self._short_rtt is None:
+            self._short_rtt = self._long_rtt = latency
+            return
+        self._short_rtt = 0.5 * self._short_rtt + 0.5 * latency
+        self._long_rtt = 0.95 * self._long_rtt + 0.05 * latency
+
+        gradient = max(0.5, min(1.0, self._long_rtt / self._short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = max(self.min_limit, min(self.max_limit, 0.8 * self.limit + 0.2 * new_limit))
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures; half-open after a cooldown."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def cancel_trial(self):
+        """Give back a half-open trial that never reached the upstream."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LLMExecutor:
+    """Runs LangChain runnables under deadline, concurrency, hedging and breaker policies."""
+
+    HEDGE_MIN_SAMPLES = 20
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        hedge: Optional[bool] = None
+    ):
+        self.timeout = timeout if timeout is not None else settings.LLM_TIMEOUT
+        max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.hedge = settings.LLM_HEDGE_ENABLED if hedge is None else hedge
+
+        self.latency = LatencyTracker()
+        self.limiter = AdaptiveLimiter(
+            initial=max_concurrency,
+            min_limit=settings.LLM_MIN_CONCURRENCY,
+            max_limit=max_concurrency
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            cooldown=settings.CIRCUIT_COOLDOWN
+        )
+        # Abandoned (timed-out) calls keep their limiter slot until they
+        # finish, so the pool can never hold more threads than the limit.
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def invoke(self, runnable, inputs: Dict[str, Any]):
+        """Invoke `runnable` with `inputs`; raises LLMUnavailableError when out of budget."""
+        if not self.breaker.allow():
+            raise LLMUnavailableError("circuit open")
+
+        deadline = time.monotonic() + self.timeout
+        if not self.limiter.acquire(timeout=self.timeout):
+            self.breaker.cancel_trial()
+            raise LLMUnavailableError("concurrency limit reached")
+
+        try:
+            result = self._run_hedged(runnable, inputs, deadline)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of limiter, breaker and latency state."""
+        return {
+            "limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "circuit": self.breaker.state,
+            "p50": self.latency.percentile(50),
+            "p95": self.latency.percentile(95)
+        }
+
+    def _submit(self, runnable, inputs: Dict[str, Any]) -> Future:
+        """Submit one call; its limiter slot is released when the call finishes."""
+        started = time.monotonic()
+        future = self._pool.submit(runnable.invoke, inputs)
+
+        def _done(f: Future):
+            elapsed = time.monotonic() - started
+            failed = f.cancelled() or f.exception() is not None
+            if not failed:
+                self.latency.record(elapsed)
+            if not f.cancelled():
+                # Real calls double as the LLM health probe
+                get_health().record("llm", elapsed, ok=not failed, error=repr(f.exception()) if failed else None)
+            self.limiter.release(elapsed, dropped=failed or elapsed > self.timeout)
+
+        future.add_done_callback(_done)
+        return future
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(95)
+
+    def _run_hedged(self, runnable, inputs: Dict[str, Any], deadline: float):
+        futures: List[Future] = [self._submit(runnable, inputs)]
+
+        hedge_after = self._hedge_delay()
+        if hedge_after is not None and hedge_after < deadline - time.monotonic():
+            done, _ = wait(futures, timeout=hedge_after)
+            # A hedge only goes out if there is spare capacity for it.
+            if not done and self.limiter.try_acquire():
+                futures.append(self._submit(runnable, inputs))
+
+        error: Optional[BaseException] = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    for p in pending:
+                        p.cancel()
+                    return f.result()
+                error = f.exception()
+            futures = list(pending)
+
+        if not futures and error is not None:
+            raise error
+        raise LLMUnavailableError(f"LLM call exceeded {self.timeout:g}s deadline")
@@ -0,0 +1,173 @@
+"""
+Time-partitioned retention for the conversations DB.
+
+Rows are partitioned by the calendar month (UTC) of `created_at`. The
+newest RETENTION_HOT_MONTHS months, the current one included, stay in
+SQLite, where recent-history and stats queries reach them through the
+created_at indexes. `Retention.run()` rolls every older month of
+conversations, feedback and human_interventions out to one zstd-compressed
+JSONL file per table and month, with the texts inlined so an archive
+needs nothing else to be read:
+
+    ARCHIVE_DIR/conversations/2026-07.jsonl.zst
+
+A month leaves the DB only after its file is written, synced and its row
+count checked; the delete and its `archived_partitions` catalog entry
+(carrying the aggregates all-time stats need) commit together. Texts no
+longer referenced are then garbage-collected. Re-running after a crash
+rewrites the file from the rows still in the DB.
+
+Historical queries read archives and hot rows through one interface:
+
+    python -m app.retention                  # archive cold months (cron it monthly)
+    python -m app.retention --keep-months 6 --vacuum
+    python -m app.retention --history feedback --since 2025-01 --until 2025-06 > old.jsonl
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import zstandard
+
+from app.config import settings
+
+# Children first, so a partially archived month never leaves feedback without its conversation
+TABLES = ["human_interventions", "feedback", "conversations"]
+
+
+def _month_index(month: str) -> int:
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def _month(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def current_month() -> str:
+    return datetime.utcnow().strftime("%Y-%m")  # created_at is CURRENT_TIMESTAMP, i.e. UTC
+
+
+def cutoff_date(keep_months: int) -> str:
+    """First day of the oldest hot month; rows before it are cold."""
+    return _month(_month_index(current_month()) - (max(keep_months, 1) - 1)) + "-01"
+
+
+class Retention:
+    """Moves cold months out of the conversations DB and reads them back."""
+
+    def __init__(self, db, archive_dir: Optional[Path] = None):
+        self.db = db
+        self.archive_dir = Path(archive_dir or settings.ARCHIVE_DIR)
+
+    def archive_path(self, table: str, month: str) -> Path:
+        return self.archive_dir / table / f"{month}.jsonl.zst"
+
+    # ===== ARCHIVING =====
+
+    def archive_month(self, table: str, month: str) -> int:
+        """Write one month of `table` to its archive file, then drop it from the DB."""
+        path = self.archive_path(table, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        rows = 0
+        with open(tmp, "wb") as f:
+            with zstandard.ZstdCompressor(level=settings.ARCHIVE_ZSTD_LEVEL).stream_writer(f, closefd=False) as writer:
+                for row in self.db.iter_month(table, month):
+                    writer.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+                    rows += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        rollup = self.db.month_rollup(table, month)
+        self.db.drop_month(table, month, rows, str(path.relative_to(self.archive_dir)), rollup)
+        return rows
+
+    def run(self, keep_months: Optional[int] = None, vacuum: bool = False) -> Dict:
+        """Archive every month older than the hot window; returns a summary."""
+        keep_months = keep_months or settings.RETENTION_HOT_MONTHS
+        before = cutoff_date(keep_months)
+        started = time.perf_counter()
+        archived: Dict[str, int] = {}
+        for table in TABLES:
+            for month in self.db.get_hot_months(table, before=before):
+                rows = self.archive_month(table, month)
+                archived[f"{table}/{month}"] = rows
+                print(f"   ... {table} {month}: {rows} rows -> {self.archive_path(table, month)}")
+
+        texts = self.db.gc_texts() if archived else 0
+        if vacuum:
+            self.db.vacuum()
+        summary = {
+            "cutoff": before,
+            "partitions": len(archived),
+            "rows": sum(archived.values()),
+            "texts_freed": texts,
+            "seconds": round(time.perf_counter() - started, 1)
+        }
+        print(f"✅ Archived {summary['partitions']} partitions ({summary['rows']} rows) older than {before}; "
+              f"{texts} unreferenced texts freed")
+        return summary
+
+    # ===== HISTORY =====
+
+    def read_archive(self, path: Path) -> Iterator[Dict]:
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                if line.strip():
+                    yield json.loads(line)
+
+    def history(self, table: str, since: str, until: Optional[str] = None) -> Iterator[Dict]:
+        """Rows of `table` from month `since` through `until` (inclusive), archived or hot, oldest first."""
+        if table not in TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        archived = {p["month"]: p["path"] for p in self.db.get_archived_partitions(table)}
+        for index in range(_month_index(since), _month_index(until or current_month()) + 1):
+            month = _month(index)
+            if month in archived:
+                yield from self.read_archive(self.archive_dir / archived[month])
+            else:
+                yield from self.db.iter_month(table, month)
+
+    def partitions(self) -> List[Dict]:
+        """Archived and hot partitions per table, for reporting."""
+        result = [dict(p, state="archived") for p in self.db.get_archived_partitions()]
+        for table in TABLES:
+            result.extend({"table_name": table, "month": month, "state": "hot"}
+                          for month in self.db.get_hot_months(table))
+        return result
+
+
+if __name__ == "__main__":
+    from contextlib import redirect_stdout
+    from app.database import get_db
+
+    parser = argparse.ArgumentParser(description="Archive old conversation history / query it back")
+    parser.add_argument("--keep-months", type=int, help="Months kept in the DB (default RETENTION_HOT_MONTHS)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the DB file")
+    parser.add_argument("--history", choices=TABLES, help="Print rows of this table as JSONL instead of archiving")
+    parser.add_argument("--since", help="First month (YYYY-MM) for --history")
+    parser.add_argument("--until", help="Last month (YYYY-MM) for --history (default: current month)")
+    parser.add_argument("--list", action="store_true", help="List archived and hot partitions")
+    args = parser.parse_args()
+
+    with redirect_stdout(sys.stderr):  # keep --history / --list output clean JSONL
+        retention = Retention(get_db())
+    if args.list:
+        for partition in retention.partitions():
+            print(json.dumps(partition))
+    elif args.history:
+        if not args.since:
+            parser.error("--history needs --since")
+        for row in retention.history(args.history, args.since, args.until):
+            sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+    else:
+        retention.run(args.keep_months, vacuum=args.vacuum)
@@ -0,0 +1,452 @@
+"""
+Knowledge-base retrievers.
+
+`QdrantRetriever` talks to Qdrant Cloud; `InMemoryRetriever` builds a
+brute-force numpy index over the local dataset file so the agent can be
+exercised without any network. Both return the same hit dictionaries.
+
+KB points carry a "problem" vector (problem text only, which is what
+a question looks like) and a "full" problem+solution vector (see
+app/ingest.py). Search uses the problem vector and, with
+RETRIEVAL_FUSE_FULL, also the full vector, keeping each point's best
+score. Qdrant collections created before named vectors keep working
+through their single unnamed vector.
+
+Both also hold a "verified" tier of human-corrected / highly rated Q&A
+pairs (see app/enrichment.py). Verified hits are listed before regular
+KB hits.
+"""
+
+import tempfile
+import uuid
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchValue,
+    NamedVector,
+    PayloadSchemaType,
+    PointStruct,
+    QuantizationSearchParams,
+    SearchParams,
+    SearchRequest,
+)
+
+from app.config import settings
+from app.ingest import VECTOR_FULL, VECTOR_PROBLEM, full_text, iter_dataset, named_vectors
+from app.providers import EMBEDDING_DIM, get_embedder
+from app.quantization import ProductQuantizer, ScalarQuantizer
+
+
+VERIFIED_TIER = "verified"
+_VERIFIED_NAMESPACE = uuid.UUID("6f1c8d1e-5b0a-4c55-9a43-2f9e7d3b8a10")
+
+
+def _hit(payload: Dict, score: float, vector=None) -> Dict:
+    hit = {
+        "problem": payload.get("problem", ""),
+        "solution": payload.get("solution", ""),
+        "level": payload.get("level", ""),
+        "type": payload.get("type", ""),
+        "score": float(score or 0.0),
+        "verified": payload.get("tier") == VERIFIED_TIER
+    }
+    if vector is not None:
+        # Only requested for re-ranking (app/rerank.py), which strips it again
+        hit["vector"] = np.asarray(vector, dtype=np.float32)
+    return hit
+
+
+def _verified_payload(entry: Dict) -> Dict:
+    return {
+        "problem": entry["problem"],
+        "solution": entry["solution"],
+        "level": entry.get("level", ""),
+        "type": entry.get("type", ""),
+        "rating": entry.get("rating"),
+        "source_key": entry["key"],
+        "tier": VERIFIED_TIER
+    }
+
+
+def _merge_tiers(verified: List[Dict], kb: List[Dict], top_k: int) -> List[Dict]:
+    """Verified hits first, then regular hits, without duplicates, capped at top_k."""
+    seen = set()
+    merged = []
+    for h in verified + kb:
+        key = (h["problem"], h["solution"])
+        if key not in seen:
+            seen.add(key)
+            merged.append(h)
+    return merged[:top_k]
+
+
+def _unit_rows(vectors: np.ndarray, dim: int) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, dim)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _memmap(vectors: np.ndarray) -> np.memmap:
+    """
+    Copy `vectors` into an anonymous file under DATA_DIR and map it, so the
+    OS pages rows in on demand instead of keeping the matrix on the heap.
+    DATA_DIR rather than /tmp, which is often RAM-backed in containers.
+    """
+    settings.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    mapped = np.memmap(
+        tempfile.TemporaryFile(dir=settings.DATA_DIR), dtype=np.float32, mode="w+", shape=vectors.shape
+    )
+    mapped[:] = vectors
+    mapped.flush()
+    return mapped
+
+
+def _fuse_max(result_lists: List[List], key) -> List:
+    """Union of several ranked lists keeping each item's best score, sorted by score."""
+    best = {}
+    for results in result_lists:
+        for r in results:
+            k = key(r)
+            if k not in best or r.score > best[k].score:
+                best[k] = r
+    return sorted(best.values(), key=lambda r: r.score, reverse=True)
+
+
+class QdrantRetriever:
+    shared_index = True  # every worker sees the same collection
+
+    def __init__(self, client: Optional[QdrantClient] = None, model=None):
+        if client is None:
+            settings.validate()
+            client = QdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY,
+                timeout=120
+            )
+        self.client = client
+        self.model = model if model is not None else get_embedder()
+        self.collection = settings.QDRANT_COLLECTION_NAME
+        self._verified_index_ready = False
+
+        try:
+            info = self.client.get_collection(self.collection)
+            if hasattr(info, "points_count"):
+                print(f"✓ Qdrant '{self.collection}' has {info.points_count} points")
+        except Exception as e:
+            raise RuntimeError(f"Cannot access Qdrant collection: {e}")
+
+        # None for legacy collections with a single unnamed vector
+        self.vector_names = named_vectors(info)
+        if self.vector_names is None:
+            self.search_vectors = [None]
+        else:
+            self.search_vectors = [VECTOR_PROBLEM]
+            if settings.RETRIEVAL_FUSE_FULL and VECTOR_FULL in self.vector_names:
+                self.search_vectors.append(VECTOR_FULL)
+
+        # Quantized collections: rescore oversampled candidates with the original vectors
+        self.search_params = None
+        if info.config.quantization_config is not None:
+            self.search_params = SearchParams(quantization=QuantizationSearchParams(
+                rescore=True, oversampling=settings.QUANTIZATION_OVERSAMPLING
+            ))
+
+    def embed(self, query: str) -> np.ndarray:
+        return self.model.encode(query)
+
+    def ping(self):
+        """One-point scroll: a full round trip over the pooled connection (health probe)."""
+        self.client.scroll(self.collection, limit=1, with_payload=False, with_vectors=False)
+
+    def search(
+        self, query: str, top_k: int, threshold: float,
+        vector: Optional[np.ndarray] = None, with_vectors: bool = False
+    ) -> List[Dict]:
+        vec = self.embed(query) if vector is None else vector
+        return self.search_batch(np.asarray([vec]), top_k, threshold, with_vectors)[0]
+
+    def embed_batch(self, queries: List[str]) -> np.ndarray:
+        return self.model.encode(queries, batch_size=64)
+
+    def search_batch(
+        self, vectors: np.ndarray, top_k: int, threshold: float, with_vectors: bool = False
+    ) -> List[List[Dict]]:
+        """
+        One search_batch round trip for many query vectors. Each vector gets
+        a verified-tier request plus one regular request per searched named
+        vector, fused by max score. With `with_vectors` every hit also
+        carries its stored (primary) vector under "vector".
+        """
+        verified_only = Filter(must=[FieldCondition(key="tier", match=MatchValue(value=VERIFIED_TIER))])
+        primary = self.search_vectors[0]
+        with_vector = ([primary] if primary else True) if with_vectors else False
+        per_query = 1 + len(self.search_vectors)
+        requests = []
+        for vec in vectors:
+            vec = vec.tolist()
+            query = lambda name: NamedVector(name=name, vector=vec) if name else vec
+            requests.append(SearchRequest(
+                vector=query(primary), limit=top_k, with_payload=True, with_vector=with_vector,
+                filter=verified_only, score_threshold=threshold, params=self.search_params
+            ))
+            for name in self.search_vectors:
+                requests.append(SearchRequest(
+                    vector=query(name), limit=top_k, with_payload=True, with_vector=with_vector,
+                    params=self.search_params
+                ))
+        batches = self.client.search_batch(collection_name=self.collection, requests=requests)
+
+        stored = lambda r: r.vector.get(primary) if isinstance(r.vector, dict) else r.vector
+        results = []
+        for start in range(0, len(batches), per_query):
+            verified = batches[start]
+            regular = _fuse_max(batches[start + 1:start + per_query], key=lambda r: r.id)
+            # Filter with threshold
+            kb = [_hit(r.payload, r.score, stored(r)) for r in regular if float(r.score or 0.0) >= threshold]
+            results.append(_merge_tiers([_hit(r.payload, r.score, stored(r)) for r in verified], kb, top_k))
+        return results
+
+    def upsert_verified(self, entries: List[Dict], vectors: np.ndarray):
+        """Add or refresh verified Q&A pairs; ids derive from entry keys so re-runs are idempotent."""
+        if not self._verified_index_ready:
+            self.client.create_payload_index(
+                collection_name=self.collection,
+                field_name="tier",
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+            self._verified_index_ready = True
+        self.client.upsert(
+            collection_name=self.collection,
+            points=[
+                PointStruct(
+                    id=str(uuid.uuid5(_VERIFIED_NAMESPACE, entry["key"])),
+                    # Verified entries are short questions: the same vector serves every name
+                    vector=(
+                        {name: np.asarray(vec).tolist() for name in self.vector_names}
+                        if self.vector_names else np.asarray(vec).tolist()
+                    ),
+                    payload=_verified_payload(entry)
+                )
+                for entry, vec in zip(entries, vectors)
+            ]
+        )
+
+
+class LocalVectorIndex:
+    """Exact cosine top-k over an in-memory float32 matrix of unit vectors."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.payloads: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def add(self, vectors: np.ndarray, payloads: List[Dict]):
+        self.vectors = np.vstack([self.vectors, _unit_rows(vectors, self.dim)])
+        self.payloads.extend(payloads)
+        self.train()
+
+    def train(self):
+        """Hook for subclasses that build a compressed copy of `vectors`."""
+
+    def spill(self):
+        """Move `vectors` off the heap into a memory-mapped file (see `_memmap`)."""
+        self.vectors = _memmap(self.vectors)
+
+    def memory_bytes(self) -> int:
+        """RAM needed to search (memory-mapped vectors stay on disk)."""
+        return 0 if isinstance(self.vectors, np.memmap) else self.vectors.nbytes
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[tuple]:
+        """Return [(score, payload), ...] sorted by descending cosine similarity."""
+        if not self.payloads:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.vectors @ q
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.payloads[i]) for i in top]
+
+    def search_batch(
+        self, query_vectors: np.ndarray, limit: int, with_vectors: bool = False,
+        fuse_with: Optional[np.ndarray] = None
+    ) -> List[List[tuple]]:
+        """
+        Top-k for many queries with a single matrix product. With
+        `with_vectors` each result is (score, payload, vector).
+        `fuse_with` is a second unit-vector matrix aligned row-for-row with
+        this index; each row then scores the max of both similarities.
+        """
+        if not self.payloads:
+            return [[] for _ in range(len(query_vectors))]
+        q = _unit_rows(query_vectors, self.dim)
+        scores = q @ self.vectors.T
+        if fuse_with is not None:
+            np.maximum(scores, q @ fuse_with.T, out=scores)
+        k = min(limit, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, idx in zip(scores, top):
+            idx = idx[np.argsort(-row[idx])]
+            results.append(self._rows(row[idx], idx, with_vectors))
+        return results
+
+    def _rows(self, scores: np.ndarray, idx: np.ndarray, with_vectors: bool) -> List[tuple]:
+        if with_vectors:
+            return [(float(s), self.payloads[i], self.vectors[i]) for s, i in zip(scores, idx)]
+        return [(float(s), self.payloads[i]) for s, i in zip(scores, idx)]
+
+
+class QuantizedVectorIndex(LocalVectorIndex):
+    """
+    LocalVectorIndex that ranks on quantized codes (see app/quantization.py)
+    and rescores the best `limit * oversampling` candidates with the
+    full-precision vectors, which may be memory-mapped from disk.
+    With `fuse_with`, candidates come from this index's codes only.
+    """
+
+    def __init__(self, dim: int, quantizer, oversampling: float = 2.0):
+        super().__init__(dim)
+        self.quantizer = quantizer
+        self.oversampling = oversampling
+        self.codes = None
+
+    def train(self):
+        self.quantizer.fit(self.vectors)
+        self.codes = self.quantizer.encode(self.vectors)
+
+    def memory_bytes(self) -> int:
+        """Codes plus the full-precision rescoring vectors, unless those are memory-mapped (`spill()`)."""
+        if self.codes is None:
+            return super().memory_bytes()
+        return self.codes.nbytes + self.quantizer.nbytes() + super().memory_bytes()
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[tuple]:
+        return self.search_batch(np.asarray(query_vector)[None, :], limit)[0]
+
+    def search_batch(
+        self, query_vectors: np.ndarray, limit: int, with_vectors: bool = False,
+        fuse_with: Optional[np.ndarray] = None
+    ) -> List[List[tuple]]:
+        if not self.payloads:
+            return [[] for _ in range(len(query_vectors))]
+        q = _unit_rows(query_vectors, self.dim)
+        approx = self.quantizer.scores(q, self.codes)
+        k = min(max(limit, int(np.ceil(limit * self.oversampling))), approx.shape[1])
+        candidates = np.argpartition(-approx, k - 1, axis=1)[:, :k]
+        results = []
+        for qi, idx in zip(q, candidates):
+            idx = np.sort(idx)  # ordered reads from memory-mapped vectors
+            exact = self.vectors[idx] @ qi
+            if fuse_with is not None:
+                np.maximum(exact, fuse_with[idx] @ qi, out=exact)
+            order = np.argsort(-exact)[:limit]
+            results.append(self._rows(exact[order], idx[order], with_vectors))
+        return results
+
+
+def make_local_index(kind: str, dim: int) -> LocalVectorIndex:
+    """Local index for a QUANTIZATION kind: "none" (exact float32), "int8" or "pq"."""
+    if kind in ("none", "exact"):
+        return LocalVectorIndex(dim)
+    if kind == "int8":
+        return QuantizedVectorIndex(dim, ScalarQuantizer(), settings.QUANTIZATION_OVERSAMPLING)
+    if kind == "pq":
+        return QuantizedVectorIndex(dim, ProductQuantizer(dim), settings.QUANTIZATION_OVERSAMPLING)
+    raise ValueError(f"Unknown QUANTIZATION: {kind}")
+
+
+class InMemoryRetriever:
+    """
+    Retriever over LocalVectorIndexes built from the dataset file at
+    startup: problem-text vectors, plus full-text vectors when
+    RETRIEVAL_FUSE_FULL is set. With QUANTIZATION only the codes stay on
+    the heap; the float32 matrices used for rescoring are memory-mapped.
+    """
+
+    shared_index = False  # each process holds its own copy
+
+    def __init__(self, dataset_path: Optional[Path] = None, model=None, limit: Optional[int] = None):
+        self.model = model if model is not None else get_embedder()
+        dataset_path = dataset_path or settings.DATASET_PATH
+        limit = limit if limit is not None else settings.MEMORY_KB_LIMIT
+
+        items = list(islice(iter_dataset(dataset_path), limit or None))
+
+        dim = self.model.get_sentence_embedding_dimension() or EMBEDDING_DIM
+        self.index = make_local_index(settings.QUANTIZATION, dim)
+        self.index.add(self.model.encode([item["problem"] for item in items], batch_size=64), items)
+        self.full_vectors = None  # row-aligned with self.index
+        if settings.RETRIEVAL_FUSE_FULL:
+            self.full_vectors = _unit_rows(
+                self.model.encode([full_text(item) for item in items], batch_size=64), dim
+            )
+        if isinstance(self.index, QuantizedVectorIndex):
+            self.index.spill()
+            if self.full_vectors is not None:
+                self.full_vectors = _memmap(self.full_vectors)
+        self.verified = LocalVectorIndex(dim=self.index.dim)
+        self._verified_keys: Dict[str, int] = {}
+        print(f"✓ In-memory index has {len(self.index)} points")
+
+    def embed(self, query: str) -> np.ndarray:
+        return self.model.encode(query)
+
+    def ping(self):
+        """Nothing remote to reach; the index lives in this process."""
+
+    def search(
+        self, query: str, top_k: int, threshold: float,
+        vector: Optional[np.ndarray] = None, with_vectors: bool = False
+    ) -> List[Dict]:
+        vec = self.embed(query) if vector is None else vector
+        return self.search_batch(np.asarray([vec]), top_k, threshold, with_vectors)[0]
+
+    def embed_batch(self, queries: List[str]) -> np.ndarray:
+        return self.model.encode(queries, batch_size=64)
+
+    def search_batch(
+        self, vectors: np.ndarray, top_k: int, threshold: float, with_vectors: bool = False
+    ) -> List[List[Dict]]:
+        regular = self.index.search_batch(vectors, top_k, with_vectors, fuse_with=self.full_vectors)
+        return [
+            _merge_tiers(
+                [_hit(payload, score, *vec) for score, payload, *vec in verified_rows if score >= threshold],
+                [_hit(payload, score, *vec) for score, payload, *vec in regular_rows if score >= threshold],
+                top_k
+            )
+            for verified_rows, regular_rows in zip(
+                self.verified.search_batch(vectors, top_k, with_vectors),
+                regular
+            )
+        ]
+
+    def upsert_verified(self, entries: List[Dict], vectors: np.ndarray):
+        for entry, vec in zip(entries, _unit_rows(vectors, self.verified.dim)):
+            pos = self._verified_keys.get(entry["key"])
+            if pos is None:
+                self._verified_keys[entry["key"]] = len(self.verified)
+                self.verified.add(vec[None, :], [_verified_payload(entry)])
+            else:
+                self.verified.vectors[pos] = vec
+                self.verified.payloads[pos] = _verified_payload(entry)
+
+
+def get_retriever():
+    """Build the retriever selected by RETRIEVER_PROVIDER ("qdrant" or "memory")."""
+    if settings.RETRIEVER_PROVIDER == "memory":
+        return InMemoryRetriever()
+    if settings.RETRIEVER_PROVIDER == "qdrant":
+        return QdrantRetriever()
+    raise ValueError(f"Unknown RETRIEVER_PROVIDER: {settings.RETRIEVER_PROVIDER}")
@@ -0,0 +1,329 @@
+"""
+Local symbolic-math fast path.
+
+`SymbolicSolver` recognises mechanically solvable questions (derivative,
+integral, solve, simplify/expand/factor, numeric evaluate) with cheap
+regexes in the serving process, then computes the answer with SymPy in
+a small process pool. Each job is limited by SIGALRM inside the worker;
+if a worker is stuck in C code past the deadline, the pool is killed
+and replaced, so a pathological expression can never hold a server
+worker or starve later requests.
+
+At most SYMBOLIC_WORKERS jobs are in flight, one per slot, so nothing
+queues inside the pool; a query that finds every slot busy skips the
+symbolic step. Workers publish when they start a job in a shared array,
+and deadlines count from that moment, so only a job that really ran
+over its time gets the pool restarted.
+"""
+
+import multiprocessing
+import re
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+MAX_EXPRESSION_CHARS = 200
+DEADLINE_MARGIN = 0.5  # seconds over the in-worker alarm, which normally fires first
+FUNCTIONS = {
+    "sin", "cos", "tan", "sec", "csc", "cot", "asin", "acos", "atan",
+    "sinh", "cosh", "tanh", "log", "ln", "exp", "sqrt", "abs", "pi", "e"
+}
+_UNICODE = {"²": "^2", "³": "^3", "√": "sqrt", "π": "pi", "×": "*", "·": "*", "÷": "/", "−": "-"}
+_ALLOWED = re.compile(r"^[0-9a-z+\-*/^().,=\s]+$")
+_WORDS = re.compile(r"[a-z]+")
+
+# No '!': a trailing one is a factorial, which no intent handles ("what is 5!" must not become 5)
+_END = r"\s*[.?]*\s*$"
+_VAR = r"(?:\s+(?:with respect to|wrt|for)\s+(?P<var>[a-z]))?"
+INTENTS = [
+    ("derivative", re.compile(
+        r"^(?:(?:find|compute|calculate|what is|evaluate)\s+)?(?:the\s+)?(?:derivative(?:\s+of)?|differentiate)\s+"
+        r"(?P<expr>.+?)" + _VAR + _END)),
+    ("derivative", re.compile(r"^d/d(?P<var>[a-z])\s*(?P<expr>.+?)" + _END)),
+    ("integral", re.compile(
+        r"^(?:(?:find|compute|calculate|what is|evaluate)\s+)?(?:the\s+)?(?:integral(?:\s+of)?|integrate|antiderivative(?:\s+of)?)\s+"
+        r"(?P<expr>.+?)(?:\s*d(?P<var>[a-z]))?(?:\s+from\s+(?P<lower>\S+)\s+to\s+(?P<upper>\S+?))?" + _END)),
+    ("solve", re.compile(r"^solve\s+(?:the\s+equation\s+)?(?P<expr>.+?)" + _VAR + _END)),
+    ("simplify", re.compile(r"^(?P<verb>simplify|expand|factor)\s+(?P<expr>.+?)" + _END)),
+    ("evaluate", re.compile(r"^(?:evaluate|compute|calculate|what is)\s+(?P<expr>[0-9+\-*/^().\s]+|.*\b(?:sqrt|sin|cos|tan|log|ln|exp)\b.*?)" + _END)),
+]
+
+
+def _clean(expr: str) -> Optional[str]:
+    """Normalise an expression and reject anything outside the safe vocabulary."""
+    for symbol, text in _UNICODE.items():
+        expr = expr.replace(symbol, text)
+    expr = expr.strip()
+    if not expr or len(expr) > MAX_EXPRESSION_CHARS or not _ALLOWED.match(expr):
+        return None
+    # Single-letter names are variables; longer names must be known functions
+    if any(len(word) > 1 and word not in FUNCTIONS for word in _WORDS.findall(expr)):
+        return None
+    return expr
+
+
+def parse_intent(query: str) -> Optional[Dict]:
+    """Match a query against the supported intents; None when it is not mechanical."""
+    text = " ".join(query.lower().split())
+    for intent, pattern in INTENTS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        expr = _clean(groups["expr"])
+        if expr is None:
+            return None
+        job = {"intent": groups.get("verb") or intent, "expr": expr, "var": groups.get("var")}
+        if intent == "integral" and groups.get("lower") is not None:
+            lower, upper = _clean(groups["lower"]), _clean(groups["upper"])
+            if lower is None or upper is None:
+                return None
+            job["bounds"] = (lower, upper)
+        return job
+    return None
+
+
+# ===== WORKER PROCESS =====
+
+def _alarm(signum, frame):
+    raise TimeoutError("symbolic computation timed out")
+
+
+_started = None  # shared with the serving process: per-slot job start time, 0 when idle
+
+
+def _init_worker(started):
+    global _started
+    import sympy  # noqa: F401  (pay the import once, at pool start)
+
+    _started = started
+    signal.signal(signal.SIGALRM, _alarm)
+
+
+def _format(value) -> str:
+    return str(value).replace("**", "^")
+
+
+def _solve_job(job: Dict, timeout: float, slot: int) -> Dict:
+    """Runs in a pool process; returns the job with "result" (or "error") filled in."""
+    # CLOCK_MONOTONIC is system-wide, so the serving process can compare against it
+    _started[slot] = time.monotonic()
+    import sympy
+    from sympy.parsing.sympy_parser import (
+        convert_xor,
+        implicit_multiplication_application,
+        parse_expr,
+        standard_transformations,
+    )
+
+    transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
+    names = {name: getattr(sympy, name) for name in ("sin", "cos", "tan", "sec", "csc", "cot",
+                                                      "asin", "acos", "atan", "sinh", "cosh",
+                                                      "tanh", "log", "exp", "sqrt", "pi")}
+    names.update({"ln": sympy.log, "abs": sympy.Abs, "e": sympy.E})
+    parse = lambda text: parse_expr(text, local_dict=names, transformations=transformations)
+
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        intent = job["intent"]
+        if intent == "solve":
+            sides = job["expr"].split("=")
+            if len(sides) > 2:
+                raise ValueError("more than one '='")
+            equation = parse(sides[0]) - (parse(sides[1]) if len(sides) == 2 else 0)
+            var = sympy.Symbol(job["var"]) if job["var"] else _main_symbol(equation)
+            if var not in equation.free_symbols:
+                # "solve 2x+3 = 7 for y" has no answer to verify; leave it to the KB/LLM
+                raise ValueError(f"{var} does not appear in the equation")
+            solutions = sympy.solve(equation, var)
+            result = ", ".join(f"{var} = {_format(s)}" for s in solutions) or "no solution"
+        else:
+            expr = parse(job["expr"])
+            var = sympy.Symbol(job["var"]) if job["var"] else _main_symbol(expr)
+            if intent == "derivative":
+                result = _format(sympy.simplify(sympy.diff(expr, var)))
+            elif intent == "integral" and job.get("bounds"):
+                lower, upper = (parse(b) for b in job["bounds"])
+                result = _format(sympy.simplify(sympy.integrate(expr, (var, lower, upper))))
+            elif intent == "integral":
+                result = _format(sympy.integrate(expr, var)) + " + C"
+            elif intent == "simplify":
+                result = _format(sympy.simplify(expr))
+            elif intent == "expand":
+                result = _format(sympy.expand(expr))
+            elif intent == "factor":
+                result = _format(sympy.factor(expr))
+            else:
+                value = sympy.nsimplify(expr) if expr.is_number else expr
+                result = _format(value)
+                if value.is_number and not value.is_Integer:
+                    result += f" ≈ {float(sympy.N(value)):.6g}"
+            job["var"] = str(var) if var is not None else None
+        job["result"] = result
+    except Exception as e:
+        job["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _started[slot] = 0.0
+    return job
+
+
+def _main_symbol(expr):
+    symbols = sorted(expr.free_symbols, key=lambda s: (s.name != "x", s.name))
+    return symbols[0] if symbols else None
+
+
+# ===== SERVING PROCESS =====
+
+DESCRIPTIONS = {
+    "derivative": "Derivative of {expr} with respect to {var}",
+    "integral": "Integral of {expr} d{var}",
+    "solve": "Solutions of {expr}",
+    "simplify": "Simplified form of {expr}",
+    "expand": "Expanded form of {expr}",
+    "factor": "Factored form of {expr}",
+    "evaluate": "Value of {expr}",
+}
+
+
+def describe(solved: Dict) -> str:
+    """One-line statement of a solved job, e.g. "Derivative of x^3 - 5x with respect to x: 3*x^2 - 5"."""
+    text = DESCRIPTIONS[solved["intent"]].format(expr=solved["expr"], var=solved.get("var") or "x")
+    if solved.get("bounds"):
+        text += " from {} to {}".format(*solved["bounds"])
+    return f"{text}: {solved['result']}"
+
+
+class SymbolicSolver:
+    """Intent parser in-process, SymPy in a restartable process pool with a hard deadline."""
+
+    def __init__(self, workers: int = None, timeout: float = None):
+        self.workers = workers or settings.SYMBOLIC_WORKERS
+        self.timeout = timeout or settings.SYMBOLIC_TIMEOUT
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None  # set once warmed up
+        self._started = multiprocessing.get_context("spawn").RawArray("d", self.workers)
+        self._free_slots = list(range(self.workers))
+        self.stats = {"solved": 0, "failed": 0, "timeouts": 0, "restarts": 0, "saturated": 0}
+        self._start_pool()
+
+    def _start_pool(self):
+        """
+        Start and warm up a pool in the background; until it is ready,
+        queries take the normal path instead of waiting. Spawn (not fork)
+        so workers never inherit the server's threads.
+        """
+        def start():
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._started,)
+            )
+            pool.submit(int).result()
+            with self._lock:
+                self._pool = pool
+
+        threading.Thread(target=start, daemon=True).start()
+
+    def _restart(self, pool: ProcessPoolExecutor):
+        """Kill a pool whose worker overran its deadline (e.g. stuck in a huge integer power)."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.stats["restarts"] += 1
+        # ProcessPoolExecutor cannot cancel a running task, so terminate its processes
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("⚠️ Symbolic worker overran its deadline; pool restarted")
+        self._start_pool()
+
+    def solve(self, query: str) -> Optional[Dict]:
+        return self.solve_many([query])[0]
+
+    def _take_slot(self) -> Optional[int]:
+        with self._lock:
+            return self._free_slots.pop() if self._free_slots else None
+
+    def _free_slot(self, slot: int):
+        """Done-callback: the worker is idle again (or its pool is gone)."""
+        with self._lock:
+            self._started[slot] = 0.0
+            self._free_slots.append(slot)
+
+    def _overran(self, slot: int, now: float) -> bool:
+        started = self._started[slot]
+        return started > 0 and now - started > self.timeout + DEADLINE_MARGIN
+
+    def solve_many(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        Solve queries concurrently; entries are None when not mechanical, failed,
+        timed out, or skipped because every worker is busy with other requests.
+        """
+        jobs = [parse_intent(q) for q in queries]
+        pool = self._pool
+        results: List[Optional[Dict]] = [None] * len(queries)
+        if pool is None or not any(jobs):
+            return results
+
+        pending = deque(i for i, job in enumerate(jobs) if job)
+        running: Dict = {}  # future -> (index, slot, submitted_at)
+        while pending or running:
+            # Refill freed slots with this call's remaining jobs
+            while pending:
+                slot = self._take_slot()
+                if slot is None:
+                    break
+                i = pending.popleft()
+                try:
+                    future = pool.submit(_solve_job, jobs[i], self.timeout, slot)
+                except RuntimeError:  # pool shut down by a concurrent restart
+                    self._free_slot(slot)
+                    return results
+                future.add_done_callback(lambda _, slot=slot: self._free_slot(slot))
+                running[future] = (i, slot, time.monotonic())
+            if not running:
+                self.stats["saturated"] += len(pending)
+                return results  # every worker busy with other requests: take the normal path
+
+            # Wake at the earliest deadline, counted from the job's start in its worker once it has one
+            limit = self.timeout + DEADLINE_MARGIN
+            deadline = min((self._started[slot] or submitted) + limit for _, slot, submitted in running.values())
+            done, _ = wait(running, timeout=max(deadline - time.monotonic(), 0.01), return_when=FIRST_COMPLETED)
+            for future in done:
+                i, _, _ = running.pop(future)
+                try:
+                    solved = future.result()
+                except Exception:
+                    solved = {"error": "worker crashed"}
+                if "error" in solved:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["solved"] += 1
+                    results[i] = solved
+            if done:
+                continue
+
+            now = time.monotonic()
+            if any(self._overran(slot, now) for _, slot, _ in running.values()):
+                self.stats["timeouts"] += 1
+                self._restart(pool)
+                return results
+            # Nothing started within a whole deadline (workers still starting up): give up on these
+            if all(now - submitted > limit and not self._started[slot]
+                   for _, slot, submitted in running.values()):
+                return results
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
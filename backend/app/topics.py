@@ -0,0 +1,45 @@
+"""
+Cheap local conversation titles.
+
+Titles are "<Topic>: <first words of the question>". The topic comes from
+the nearest KB hit's `type` when retrieval already ran, otherwise from a
+small keyword classifier, so no LLM or network call is ever needed.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+TITLE_WORDS = 7
+
+# Checked in order; the first topic with a matching keyword wins
+TOPIC_KEYWORDS = [
+    ("Calculus", r"derivative|differentiat|integra|limit|d/dx|dy/dx|antiderivative|tangent line"),
+    ("Counting & Probability", r"probabilit|how many ways|permutation|combination|choose|arrange|dice|coin|expected value"),
+    ("Number Theory", r"prime|divisib|remainder|modulo|mod\b|gcd|lcm|greatest common|least common|factors? of|digits?"),
+    ("Geometry", r"triangle|circle|angle|area|perimeter|radius|diameter|polygon|hexagon|square|rectangle|volume|hypotenuse|pythagore"),
+    ("Precalculus", r"(?:sin|sine|cos|cosine|tan|tangent|sec|csc|cot)(?![a-z])|trig|matri|vector|complex number|polar|radian"),
+    ("Intermediate Algebra", r"polynomial|logarithm|log\b|quadratic|inequalit|sequence|series|roots? of|ellipse|parabola|hyperbola"),
+    ("Algebra", r"solve|equation|simplify|expand|factor|slope|linear|x\s*=|variable"),
+    ("Prealgebra", r"fraction|percent|decimal|ratio|average|mean(?![a-z])|sum of|product of"),
+]
+_TOPIC_PATTERNS = [(topic, re.compile(rf"\b(?:{words})", re.IGNORECASE)) for topic, words in TOPIC_KEYWORDS]
+
+
+def classify_topic(query: str) -> Optional[str]:
+    """Return the first matching MATH topic for `query`, or None."""
+    for topic, pattern in _TOPIC_PATTERNS:
+        if pattern.search(query):
+            return topic
+    return None
+
+
+def make_title(query: str, kb_hits: Optional[List[Dict]] = None) -> str:
+    """Build a short conversation title, preferring the nearest KB hit's topic."""
+    topic = kb_hits[0].get("type") if kb_hits else None
+    topic = topic or classify_topic(query) or "Math"
+
+    words = query.strip().rstrip("?.!").split()
+    phrase = " ".join(words[:TITLE_WORDS])
+    if len(words) > TITLE_WORDS:
+        phrase += "..."
+    return f"{topic}: {phrase}"
@@ -0,0 +1,145 @@
+"""
+Answer-cache warm-up from the most asked questions.
+
+`CacheWarmer.run()` mines the conversations table for the top
+WARMUP_TOP_N normalized questions of the last WARMUP_LOOKBACK_DAYS.
+Each ask is weighted by recency (half-life WARMUP_HALF_LIFE_DAYS) and
+by the question's average feedback rating; questions mostly marked
+wrong are skipped. It answers them through the normal batch path
+(embedding, retrieval, LLM) with WARMUP_CONCURRENCY calls in flight and
+writes a snapshot to WARMUP_PATH. The answer cache is bypassed: workers
+count an entry's TTL from its `warmed_at`, so it must be when the answer
+was generated, not when a possibly old cached copy was read back. Every
+API worker loads that snapshot into its answer cache at startup, so the
+hottest questions hit the cache from the first request.
+
+Run it off-peak (e.g. nightly cron):
+
+    python -m app.warmup              # WARMUP_TOP_N questions
+    python -m app.warmup --top 500
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.cache import is_cacheable, normalize_query
+from app.config import settings
+from app.ingest import batched, write_jsonl
+
+CHUNK = 32  # questions per answer_batch call (one embedding call + one search each)
+
+
+class CacheWarmer:
+    """Precomputes answers for popular questions and loads them into the answer cache."""
+
+    def __init__(self, agent, db, path: Optional[Path] = None):
+        self.agent = agent
+        self.db = db
+        self.path = Path(path or settings.WARMUP_PATH)
+
+    def hot_queries(self, top_n: int) -> Tuple[List[Dict], float]:
+        """Top questions by weight, and the total weight of all recent traffic."""
+        days = settings.WARMUP_LOOKBACK_DAYS
+        half_life = settings.WARMUP_HALF_LIFE_DAYS
+        ranked: Dict[str, Dict] = {}
+        for row in self.db.get_query_activity(days):
+            key = normalize_query(row["query"])
+            entry = ranked.setdefault(key, {"query": row["query"], "asks": 0, "weight": 0.0})
+            entry["asks"] += row["asks"]
+            entry["weight"] += row["asks"] * 0.5 ** (max(row["age_days"], 0.0) / half_life)
+        total = sum(entry["weight"] for entry in ranked.values())
+
+        # Sum ratings per cache key first, so every spelling of a question counts once
+        ratings: Dict[str, Dict] = {}
+        for row in self.db.get_query_ratings(days):
+            key = normalize_query(row["query"])
+            totals = ratings.setdefault(key, {"rating_sum": 0, "rated": 0, "marked_wrong": 0, "ratings": 0})
+            for field in totals:
+                totals[field] += row[field]
+        for key, totals in ratings.items():
+            entry = ranked.get(key)
+            if entry is None:
+                continue
+            if totals["marked_wrong"] * 2 > totals["ratings"]:
+                del ranked[key]
+            elif totals["rated"]:
+                # 3 stars is neutral; 5 stars counts 5/3 as much, 1 star 1/3
+                entry["weight"] *= totals["rating_sum"] / totals["rated"] / 3.0
+
+        hot = sorted(ranked.values(), key=lambda e: e["weight"], reverse=True)[:top_n]
+        return hot, total
+
+    def run(self, top_n: Optional[int] = None, concurrency: Optional[int] = None) -> Dict:
+        """Answer the hot questions and write the snapshot; returns a summary."""
+        top_n = top_n or settings.WARMUP_TOP_N
+        concurrency = concurrency or settings.WARMUP_CONCURRENCY
+        started = time.perf_counter()
+        hot, total_weight = self.hot_queries(top_n)
+        print(f"📊 {len(hot)} hot questions selected from the last {settings.WARMUP_LOOKBACK_DAYS} days")
+
+        entries = []
+        failed = 0
+        for offset, chunk in batched(hot, CHUNK):
+            queries = [e["query"] for e in chunk]
+            for i, result in self.agent.answer_batch(queries, concurrency=concurrency, use_cache=False):
+                if is_cacheable(result):
+                    entries.append({
+                        "query": chunk[i]["query"],
+                        "share": chunk[i]["weight"] / total_weight if total_weight else 0.0,
+                        "warmed_at": time.time(),
+                        "result": result
+                    })
+                else:
+                    failed += 1
+            print(f"   ... {offset + len(chunk)}/{len(hot)} answered")
+
+        write_jsonl(entries, self.path)
+        # Share of recent (recency-weighted) traffic the snapshot can serve
+        coverage = sum(e["share"] for e in entries)
+        summary = {
+            "selected": len(hot),
+            "warmed": len(entries),
+            "failed": failed,
+            "coverage": round(coverage, 4),
+            "seconds": round(time.perf_counter() - started, 1)
+        }
+        print(f"✅ Warmed {len(entries)} answers ({coverage:.1%} of recent traffic) -> {self.path}")
+        return summary
+
+    def load(self) -> int:
+        """Load the snapshot into the agent's answer cache (entries past their TTL are skipped)."""
+        cache = self.agent.answer_cache
+        if cache is None or not self.path.exists():
+            return 0
+        now = time.time()
+        loaded, coverage = 0, 0.0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                expires_at = entry["warmed_at"] + cache.ttl
+                if expires_at <= now:
+                    continue
+                cache.put(entry["query"], entry["result"], expires_at=expires_at)
+                loaded += 1
+                coverage += entry["share"]
+        if loaded:
+            print(f"✅ Answer cache warmed with {loaded} answers ({coverage:.1%} of recent traffic)")
+        return loaded
+
+
+if __name__ == "__main__":
+    from app.agent import get_agent
+    from app.database import get_db
+
+    parser = argparse.ArgumentParser(description="Precompute answers for the most asked questions")
+    parser.add_argument("--top", type=int, help="Number of questions (default WARMUP_TOP_N)")
+    parser.add_argument("--concurrency", type=int, help="Answers generated in parallel (default WARMUP_CONCURRENCY)")
+    parser.add_argument("--output", type=Path, help="Snapshot path (default WARMUP_PATH)")
+    args = parser.parse_args()
+
+    CacheWarmer(get_agent(), get_db(), args.output).run(args.top, args.concurrency)
@@ -1,13 +1,28 @@
 """
 Fallback: Direct WolframAlpha Short Answers API.
 Use this if MCP server setup doesn't work in time.
+
+One pooled keep-alive client per process, so only the first call pays
+for the TLS handshake (`warm()` does that at startup). Every call reports
+its latency to the health monitor; WolframAlpha is metered, so real
+traffic is its only probe.
+
+A call that fails or takes longer than HEALTH_WOLFRAM_DEGRADED_MS counts
+against a circuit breaker: after WOLFRAM_FAILURE_THRESHOLD such calls in
+a row `allow()` turns False, so MathAgent goes straight to the LLM, and
+after WOLFRAM_COOLDOWN one trial call decides whether to close it again.
 """
 
 import httpx
 import os
+import time
 from typing import Dict
 from dotenv import load_dotenv
 
+from app.config import settings
+from app.health import get_health
+from app.resilience import CircuitBreaker
+
 load_dotenv()
 
 
@@ -17,15 +32,43 @@ class WolframSearchClient:
     def __init__(self):
         self.app_id = os.getenv("WOLFRAM_APP_ID", "")
         self.base_url = "https://api.wolframalpha.com/v1/result"
+        self.client = httpx.Client(
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60)
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.WOLFRAM_FAILURE_THRESHOLD,
+            cooldown=settings.WOLFRAM_COOLDOWN
+        )
+    
+    def allow(self) -> bool:
+        """Whether to call WolframAlpha now (False while its circuit is open)."""
+        return self.breaker.allow()
+    
+    def warm(self) -> bool:
+        """Open the pooled connection without spending a query; False if there is no API key."""
+        if not self.app_id:
+            return False
+        self.client.head(self.base_url)
+        return True
     
     def search_web(self, query: str) -> Dict:
         """Query WolframAlpha Short Answers API."""
         if not self.app_id:
+            self.breaker.cancel_trial()
             return {"content": "", "source": "no_api_key", "success": False}
         
+        started = time.perf_counter()
         try:
-            url = f"{self.base_url}?i={query}&appid={self.app_id}"
-            response = httpx.get(url, timeout=10)
+            response = self.client.get(self.base_url, params={"i": query, "appid": self.app_id})
+            elapsed = time.perf_counter() - started
+            # 501 means "no short answer for this input", not that the service is unhealthy
+            ok = response.status_code < 500 or response.status_code == 501
+            get_health().record("wolfram", elapsed, ok=ok, error=None if ok else f"HTTP {response.status_code}")
+            if ok and elapsed * 1000 <= settings.HEALTH_WOLFRAM_DEGRADED_MS:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
             
             if response.status_code == 200:
                 return {
@@ -40,6 +83,8 @@ class WolframSearchClient:
                     "success": False
                 }
         except Exception as e:
+            get_health().record("wolfram", time.perf_counter() - started, ok=False, error=f"{type(e).__name__}: {e}")
+            self.breaker.record_failure()
             return {"content": str(e), "source": "error", "success": False}
 
 def get_web_search_client():
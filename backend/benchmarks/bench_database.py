@@ -0,0 +1,173 @@
+"""
+Database benchmarks: conversation writes and aggregate/feedback queries
+on pre-populated SQLite files of increasing size, and the on-disk size
+of the content-addressed text store vs. the legacy full-text layout,
+and stats queries before/after rolling old months out to archives.
+"""
+
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.database import Database
+from app.retention import Retention
+from benchmarks.harness import benchmark, measure, result
+
+ROW_COUNTS = {"quick": [10_000, 100_000], "full": [10_000, 100_000, 1_000_000, 10_000_000]}
+CHUNK = 50_000
+SOURCES = ["knowledge_base", "web_search", "llm_knowledge"]
+DISTINCT_QUESTIONS = 2_000  # popular questions repeat, as in production traffic
+
+
+def _answer(q: int) -> str:
+    return f"To solve problem {q}, first isolate the variable. " + "Step: simplify both sides and check the result. " * 30
+
+
+def populate(db: Database, rows: int, seed: int = 0):
+    """Bulk-insert `rows` synthetic conversations and feedback entries."""
+    rng = random.Random(seed)
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, rows, CHUNK):
+            n = min(CHUNK, rows - start)
+            picks = [rng.randrange(DISTINCT_QUESTIONS) for _ in range(n)]
+            hashes = db.put_texts(cursor, (t for q in picks for t in (f"question {q}", _answer(q))))
+            cursor.executemany(
+                "INSERT INTO conversations (query_hash, answer_hash, source, confidence_score, kb_matches) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (hashes[2 * i], hashes[2 * i + 1], rng.choice(SOURCES), rng.random(), rng.randint(0, 5))
+                    for i in range(n)
+                )
+            )
+            cursor.executemany(
+                "INSERT INTO feedback (conversation_id, query_hash, answer_hash, rating, is_correct, correction) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (start + i + 1, hashes[2 * i], hashes[2 * i + 1], rng.randint(1, 5),
+                     rng.random() > 0.2, None if rng.random() > 0.05 else "corrected " * 10)
+                    for i in range(n)
+                )
+            )
+
+
+@benchmark("database")
+def bench_database(config):
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in ROW_COUNTS[config["scale"]]:
+            db = Database(db_path=Path(tmp) / f"bench_{rows}.db")
+            populate(db, rows)
+
+            stats = measure(
+                lambda: db.save_conversation("What is 2+2?", "4", "knowledge_base", 0.9, 3),
+                repeat=config["repeat"]
+            )
+            records.append(result("database.save_conversation", {"rows": rows}, stats))
+
+            stats = measure(db.get_feedback_stats, repeat=max(5, config["repeat"] // 10))
+            records.append(result("database.get_feedback_stats", {"rows": rows}, stats))
+
+            stats = measure(lambda: db.get_recent_conversations(limit=50), repeat=max(5, config["repeat"] // 10))
+            records.append(result(
+                "database.get_recent_conversations", {"rows": rows, "limit": 50}, stats,
+                file_mb=round(db.db_path.stat().st_size / 1e6, 1)
+            ))
+    return records
+
+
+LEGACY_SCHEMA = """
+    CREATE TABLE conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT NOT NULL, answer TEXT NOT NULL,
+        source TEXT NOT NULL, confidence_score REAL, kb_matches INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id INTEGER, query TEXT NOT NULL,
+        answer TEXT NOT NULL, rating INTEGER, is_correct BOOLEAN, correction TEXT, notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE human_interventions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, feedback_id INTEGER NOT NULL, original_answer TEXT NOT NULL,
+        corrected_answer TEXT NOT NULL, reason TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+def populate_legacy(path: Path, rows: int, seed: int = 0):
+    """The same synthetic traffic in the pre-text-store layout (full texts in every row)."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(str(path))
+    conn.executescript(LEGACY_SCHEMA)
+    for start in range(0, rows, CHUNK):
+        n = min(CHUNK, rows - start)
+        picks = [rng.randrange(DISTINCT_QUESTIONS) for _ in range(n)]
+        conn.executemany(
+            "INSERT INTO conversations (query, answer, source, confidence_score, kb_matches) VALUES (?, ?, ?, ?, ?)",
+            ((f"question {q}", _answer(q), rng.choice(SOURCES), rng.random(), rng.randint(0, 5)) for q in picks)
+        )
+        conn.executemany(
+            "INSERT INTO feedback (conversation_id, query, answer, rating, is_correct, correction) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (start + i + 1, f"question {q}", _answer(q), rng.randint(1, 5),
+                 rng.random() > 0.2, None if rng.random() > 0.05 else "corrected " * 10)
+                for i, q in enumerate(picks)
+            )
+        )
+    conn.commit()
+    conn.close()
+
+
+@benchmark("database")
+def bench_text_store(config):
+    """Legacy full-text rows vs. the content-addressed store: file size and migration time."""
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in ROW_COUNTS[config["scale"]][:2]:
+            path = Path(tmp) / f"legacy_{rows}.db"
+            populate_legacy(path, rows)
+            legacy_mb = path.stat().st_size / 1e6
+
+            started = time.perf_counter()
+            db = Database(db_path=path)  # migrates and VACUUMs
+            seconds = time.perf_counter() - started
+
+            stats = measure(lambda: db.get_recent_conversations(limit=50), repeat=max(5, config["repeat"] // 10))
+            records.append(result(
+                "database.text_store", {"rows": rows, "distinct_questions": DISTINCT_QUESTIONS}, stats,
+                legacy_mb=round(legacy_mb, 1),
+                file_mb=round(path.stat().st_size / 1e6, 1),
+                migration_s=round(seconds, 2)
+            ))
+    return records
+
+
+@benchmark("database")
+def bench_retention(config):
+    """A year of history in one table vs. RETENTION_HOT_MONTHS hot months plus archived rollups."""
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = ROW_COUNTS[config["scale"]][-1]
+        db = Database(db_path=Path(tmp) / "retention.db")
+        populate(db, rows)
+        with db.get_connection() as conn:
+            for table in ("conversations", "feedback"):
+                conn.execute(f"UPDATE {table} SET created_at = datetime('now', '-' || (id % 12) || ' months')")
+
+        for layout in ("one_year_hot", f"{settings.RETENTION_HOT_MONTHS}_months_hot"):
+            if layout != "one_year_hot":
+                Retention(db, Path(tmp) / "archive").run(vacuum=True)
+            repeat = max(5, config["repeat"] // 10)
+            for name, fn in (
+                ("database.get_feedback_stats", db.get_feedback_stats),
+                ("database.get_source_distribution", db.get_source_distribution)
+            ):
+                records.append(result(
+                    name, {"rows": rows, "layout": layout}, measure(fn, repeat=repeat),
+                    file_mb=round(db.db_path.stat().st_size / 1e6, 1)
+                ))
+    return records
@@ -0,0 +1,102 @@
+"""
+Embedding benchmarks: per-worker models vs. the shared sidecar.
+
+WORKERS processes (standing in for gunicorn workers) each encode single
+queries concurrently, either with their own model or through one
+sidecar process. Reports per-encode latency across all workers and the
+total resident memory of the workers plus the sidecar.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import settings
+from benchmarks.bench_retrieval import sample_queries
+from benchmarks.harness import benchmark, result
+
+WORKERS = 4
+ENCODES = {"quick": 200, "full": 2_000}
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def _rss_mb(pid: str = "self") -> float:
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _encode_worker(args):
+    """Runs in a spawned process: load the embedder, then time single-query encodes."""
+    mode, provider, path, n, start_at = args
+    from app.embedding_sidecar import SidecarEmbedder
+    from app.providers import get_local_embedder
+
+    settings.EMBEDDING_PROVIDER = provider
+
+    model = SidecarEmbedder(path) if mode == "sidecar" else get_local_embedder()
+    queries = sample_queries(64)
+    model.encode(queries[:4])
+    time.sleep(max(0.0, start_at - time.time()))  # start all workers together
+
+    latencies = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        model.encode(queries[i % len(queries)])
+        latencies.append(time.perf_counter() - t0)
+    return latencies, _rss_mb()
+
+
+def _start_sidecar(path: str) -> subprocess.Popen:
+    env = dict(os.environ, EMBEDDING_SIDECAR_SOCKET=path, EMBEDDING_PROVIDER=settings.EMBEDDING_PROVIDER)
+    process = subprocess.Popen([sys.executable, "-m", "app.embedding_sidecar"], cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 120
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("embedding sidecar failed to start")
+        time.sleep(0.1)
+    return process
+
+
+@benchmark("embedding")
+def bench_shared_embedder(config):
+    n = ENCODES[config["scale"]]
+    ctx = multiprocessing.get_context("spawn")
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("per_worker", "sidecar"):
+            path = str(Path(tmp) / "embed.sock")
+            sidecar = _start_sidecar(path) if mode == "sidecar" else None
+            try:
+                with ctx.Pool(WORKERS) as pool:
+                    runs = pool.map(_encode_worker, [(mode, settings.EMBEDDING_PROVIDER, path, n, time.time() + 3.0)] * WORKERS)
+                sidecar_mb = _rss_mb(str(sidecar.pid)) if sidecar else 0.0
+            finally:
+                if sidecar:
+                    sidecar.terminate()
+                    sidecar.wait()
+
+            samples = sorted(s for latencies, _ in runs for s in latencies)
+            mean = sum(samples) / len(samples)
+            stats = {
+                "rounds": len(samples),
+                "median_ms": samples[len(samples) // 2] * 1000,
+                "mean_ms": mean * 1000,
+                "p95_ms": samples[int(0.95 * len(samples))] * 1000,
+                "p99_ms": samples[int(0.99 * len(samples))] * 1000,
+                "ops_per_s": WORKERS / mean
+            }
+            records.append(result(
+                "embedding.concurrent_encode",
+                {"workers": WORKERS, "mode": mode, "embedder": settings.EMBEDDING_PROVIDER},
+                stats,
+                total_rss_mb=round(sum(rss for _, rss in runs) + sidecar_mb, 1),
+                sidecar_rss_mb=round(sidecar_mb, 1)
+            ))
+    return records
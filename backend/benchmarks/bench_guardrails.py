@@ -0,0 +1,65 @@
+"""
+Input guardrail benchmarks, including how the compiled engine scales with
+the number of rules compared with a per-term substring scan.
+"""
+
+import random
+import string
+
+from app.agent import basic_input_guardrails
+from app.guardrails import DEFAULT_RULES, GuardrailEngine
+from benchmarks.bench_retrieval import sample_queries
+from benchmarks.harness import benchmark, measure, result
+
+RULE_COUNTS = [6, 100, 1_000, 5_000]
+
+
+def synthetic_rules(n: int, seed: int = 0):
+    """The default rules padded with random lowercase terms up to `n` in total."""
+    rng = random.Random(seed)
+    terms = [t for terms in DEFAULT_RULES.values() for t in terms][:n]
+    while len(terms) < n:
+        terms.append("".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 12))))
+    return terms
+
+
+def substring_scan(text: str, terms) -> bool:
+    """The original guardrail algorithm: lowercase, then `in` per term."""
+    t = text.lower()
+    for bad in terms:
+        if bad in t:
+            return False
+    return True
+
+
+@benchmark("guardrails")
+def bench_guardrails(config):
+    records = []
+    for length, queries in {
+        "short": sample_queries(64),
+        "long": [q * 20 for q in sample_queries(64)]
+    }.items():
+        stats = measure(
+            lambda: [basic_input_guardrails(q) for q in queries],
+            repeat=config["repeat"], min_time=0.2
+        )
+        stats["per_query_us"] = stats["median_ms"] * 1000 / len(queries)
+        records.append(result("guardrails.basic_input_guardrails", {"queries": length}, stats))
+    return records
+
+
+@benchmark("guardrails")
+def bench_guardrail_rule_scaling(config):
+    queries = sample_queries(64)
+    records = []
+    for n in RULE_COUNTS:
+        terms = synthetic_rules(n)
+        engine = GuardrailEngine({"blocked": terms})
+        for name, check in (
+            ("compiled", engine.allows),
+            ("substring_scan", lambda q: substring_scan(q, terms))
+        ):
+            stats = measure(lambda: [check(q) for q in queries], repeat=config["repeat"], min_time=0.2)
+            stats["per_query_us"] = stats["median_ms"] * 1000 / len(queries)
+            records.append(result("guardrails.rule_scaling", {"rules": n, "engine": name}, stats))
+    return records
@@ -0,0 +1,123 @@
+"""
+Ingest benchmarks: embedding, point building and upsert into an
+in-process Qdrant, for the legacy single full-text vector vs. the named
+problem + full vectors, and the streaming JSONL pipeline vs. loading a
+JSON array up front. Reports time per item and peak Python memory.
+"""
+
+import json
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+
+from app.ingest import (
+    DatasetStats,
+    batched,
+    build_points,
+    embed_items,
+    iter_dataset,
+    prefetch,
+    vectors_config,
+    write_jsonl,
+)
+from app.providers import get_embedder
+from benchmarks.bench_retrieval import sample_queries
+from benchmarks.harness import benchmark, measure, result
+
+ITEM_COUNTS = {"quick": [1_000], "full": [1_000, 10_000]}
+UPLOAD_BATCH = 100
+STREAM_ITEMS = {"quick": [20_000], "full": [20_000, 200_000]}
+
+
+def sample_items(n: int):
+    return [
+        {
+            "problem": question,
+            "solution": f"Step 1: rewrite the expression. Step 2: simplify. The answer is {i}.",
+            "level": f"Level {i % 5 + 1}",
+            "type": "Algebra"
+        }
+        for i, question in enumerate(sample_queries(n))
+    ]
+
+
+def ingest(model, items, named: bool):
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        collection_name="bench_ingest",
+        vectors_config=vectors_config(model.get_sentence_embedding_dimension(), named)
+    )
+    for start in range(0, len(items), UPLOAD_BATCH):
+        batch = items[start:start + UPLOAD_BATCH]
+        points = build_points(batch, embed_items(model, batch, named=named), start_id=start, named=named)
+        client.upsert(collection_name="bench_ingest", points=points)
+    return client
+
+
+@benchmark("ingest")
+def bench_ingest_vectors(config):
+    model = get_embedder()
+    records = []
+    for n in ITEM_COUNTS[config["scale"]]:
+        items = sample_items(n)
+        for named in (False, True):
+            tracemalloc.start()
+            ingest(model, items, named)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            stats = measure(lambda: ingest(model, items, named), repeat=min(config["repeat"], 3), warmup=0)
+            stats["per_item_ms"] = stats["median_ms"] / n
+            records.append(result(
+                "ingest.qdrant_upsert",
+                {"items": n, "vectors": "problem+full" if named else "full"},
+                stats,
+                peak_memory_mb=round(peak / 2 ** 20, 1)
+            ))
+    return records
+
+
+def _embed_stream(model, path: Path, streaming: bool) -> int:
+    """Read + stats + embed the whole file; vectors are dropped after each batch (upload stand-in)."""
+    stats = DatasetStats()
+    if streaming:
+        items = stats.track(iter_dataset(path))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            items = list(stats.track(json.load(f)))
+    batches = ((start, embed_items(model, batch)) for start, batch in batched(items, UPLOAD_BATCH))
+    for _ in prefetch(batches, depth=2) if streaming else batches:
+        pass
+    return stats.total
+
+
+@benchmark("ingest")
+def bench_stream_pipeline(config):
+    model = get_embedder()
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in STREAM_ITEMS[config["scale"]]:
+            items = sample_items(n)
+            jsonl = Path(tmp) / "kb.jsonl"
+            write_jsonl(items, jsonl)
+            legacy = Path(tmp) / "kb.json"
+            legacy.write_text(json.dumps(items, indent=2), encoding="utf-8")
+            del items
+
+            for streaming, path in ((False, legacy), (True, jsonl)):
+                tracemalloc.start()
+                _embed_stream(model, path, streaming)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                stats = measure(lambda: _embed_stream(model, path, streaming), repeat=min(config["repeat"], 3), warmup=0)
+                stats["per_item_ms"] = stats["median_ms"] / n
+                records.append(result(
+                    "ingest.read_embed",
+                    {"items": n, "format": "jsonl-stream" if streaming else "json-load"},
+                    stats,
+                    peak_memory_mb=round(peak / 2 ** 20, 1)
+                ))
+    return records
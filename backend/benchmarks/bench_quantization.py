@@ -0,0 +1,72 @@
+"""
+Quantization benchmarks: recall@k against exact search, resident index
+memory and search latency for the exact, int8 and PQ local indexes.
+Quantized indexes keep their rescoring vectors in RAM ("heap") or
+memory-mapped the way InMemoryRetriever holds them ("mmap"); index_mb
+counts only what is on the heap.
+
+Vectors are drawn around random cluster centres (a crude stand-in for
+topic structure in real embeddings); queries are perturbed copies of
+indexed vectors.
+"""
+
+import numpy as np
+
+from app.retrieval import make_local_index
+from benchmarks.harness import benchmark, measure, result
+
+INDEX_SIZES = {"quick": [100_000], "full": [100_000, 1_000_000]}
+KINDS = ["exact", "int8", "pq"]
+OVERSAMPLING = [2.0, 8.0]
+RESCORE = ["heap", "mmap"]
+DIM = 384
+TOP_K = 10
+QUERIES = 50
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 256, spread: float = 0.6, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(index, exact, queries: np.ndarray, k: int) -> float:
+    found = index.search_batch(queries, k)
+    truth = exact.search_batch(queries, k)
+    hits = sum(len({id(p) for _, p in a} & {id(p) for _, p in b}) for a, b in zip(found, truth))
+    return hits / (k * len(queries))
+
+
+@benchmark("quantization")
+def bench_quantized_index(config):
+    records = []
+    for n in INDEX_SIZES[config["scale"]]:
+        vectors = clustered_vectors(n, DIM)
+        payloads = [{"id": i} for i in range(n)]
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.choice(n, QUERIES, replace=False)] + 0.05 * rng.standard_normal((QUERIES, DIM), dtype=np.float32)
+
+        exact = None
+        for kind in KINDS:
+            index = make_local_index(kind, DIM)
+            index.add(vectors, payloads)
+            if exact is None:
+                exact = index
+            for rescore in RESCORE if kind != "exact" else [None]:
+                if rescore == "mmap":
+                    index.spill()
+                for oversampling in OVERSAMPLING if kind != "exact" else [None]:
+                    if oversampling is not None:
+                        index.oversampling = oversampling
+                    i = iter(range(10 ** 9))
+                    stats = measure(lambda: index.search(queries[next(i) % QUERIES], TOP_K), repeat=config["repeat"])
+                    records.append(result(
+                        "quantization.local_search",
+                        {"vectors": n, "index": kind, "rescore": rescore, "oversampling": oversampling, "top_k": TOP_K},
+                        stats,
+                        recall_at_k=round(recall_at_k(index, exact, queries, TOP_K), 4),
+                        index_mb=round(index.memory_bytes() / 2 ** 20, 1)
+                    ))
+    return records
@@ -0,0 +1,50 @@
+"""
+Full /api/query latency with fake upstreams (zero-latency fake LLM,
+in-memory retriever, no WolframAlpha key), i.e. our own overhead.
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.agent import MathAgent
+from app.database import Database
+from app.providers import FakeChatModel
+from app.retrieval import InMemoryRetriever
+from app.web_search import WolframSearchClient
+from benchmarks.bench_retrieval import sample_queries
+from benchmarks.harness import benchmark, measure, result
+
+KB_SIZE = 2_000
+
+
+@benchmark("request")
+def bench_query_endpoint(config):
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = Path(tmp) / "kb.json"
+        problems = sample_queries(KB_SIZE)
+        dataset.write_text(json.dumps([
+            {"problem": p, "solution": "Apply the standard method.", "level": "Level 1", "type": "Algebra"}
+            for p in problems
+        ]), encoding="utf-8")
+
+        web = WolframSearchClient()
+        web.app_id = ""
+        main.agent = MathAgent(
+            retriever=InMemoryRetriever(dataset_path=dataset, limit=0),
+            llm=FakeChatModel(latency_dist="constant", latency_ms=0.0, token_ms=0.0),
+            web_search_client=web
+        )
+        main.db = Database(db_path=Path(tmp) / "bench.db")
+        client = TestClient(main.app)
+
+        queries = sample_queries(32)
+        i = iter(range(10 ** 9))
+        stats = measure(
+            lambda: client.post("/api/query", json={"query": queries[next(i) % len(queries)]}),
+            repeat=config["repeat"]
+        )
+        return [result("request.api_query", {"kb_size": KB_SIZE, "llm": "fake-0ms"}, stats)]
@@ -0,0 +1,100 @@
+"""
+Retrieval benchmarks: query encoding, local top-k search and
+QdrantRetriever.search against an in-process Qdrant.
+"""
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from app.config import settings
+from app.providers import get_embedder
+from app.retrieval import LocalVectorIndex, QdrantRetriever
+from benchmarks.harness import benchmark, measure, result
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+INDEX_SIZES = {"quick": [10_000, 100_000], "full": [10_000, 100_000, 1_000_000]}
+TOP_KS = [5, 50]
+QDRANT_POINTS = 5_000
+
+
+def sample_queries(n: int):
+    templates = [
+        "Find the derivative of x^{i} - {i}x.",
+        "Solve {i}x + 7 = {j} for x.",
+        "What is the area of a circle with radius {i}?",
+        "How many ways can {i} people sit around a round table?",
+        "Evaluate the integral of {i}x^2 dx from 0 to {j}.",
+    ]
+    return [templates[k % len(templates)].format(i=k + 2, j=3 * k + 1) for k in range(n)]
+
+
+def random_unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
+
+
+@benchmark("retrieval")
+def bench_encode(config):
+    model = get_embedder()
+    records = []
+    for batch_size in BATCH_SIZES:
+        texts = sample_queries(batch_size)
+        stats = measure(lambda: model.encode(texts, batch_size=batch_size), repeat=config["repeat"])
+        stats["per_item_ms"] = stats["median_ms"] / batch_size
+        records.append(result(
+            "retrieval.encode",
+            {"batch_size": batch_size, "embedder": settings.EMBEDDING_PROVIDER},
+            stats
+        ))
+    return records
+
+
+@benchmark("retrieval")
+def bench_local_topk(config):
+    model = get_embedder()
+    dim = model.get_sentence_embedding_dimension()
+    queries = model.encode(sample_queries(16))
+    records = []
+    for n in INDEX_SIZES[config["scale"]]:
+        index = LocalVectorIndex(dim)
+        index.vectors = random_unit_vectors(n, dim)
+        index.payloads = [{}] * n
+        for top_k in TOP_KS:
+            i = iter(range(10 ** 9))
+            stats = measure(lambda: index.search(queries[next(i) % len(queries)], top_k), repeat=config["repeat"])
+            records.append(result("retrieval.local_topk", {"vectors": n, "top_k": top_k}, stats))
+    return records
+
+
+@benchmark("retrieval")
+def bench_qdrant_retriever_search(config):
+    model = get_embedder()
+    dim = model.get_sentence_embedding_dimension()
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+    )
+    vectors = random_unit_vectors(QDRANT_POINTS, dim)
+    client.upsert(
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        points=[
+            PointStruct(id=i, vector=vectors[i].tolist(), payload={"problem": f"p{i}", "solution": f"s{i}"})
+            for i in range(QDRANT_POINTS)
+        ]
+    )
+    retriever = QdrantRetriever(client=client, model=model)
+    queries = sample_queries(16)
+    i = iter(range(10 ** 9))
+    stats = measure(
+        lambda: retriever.search(queries[next(i) % len(queries)], settings.TOP_K, settings.SCORE_THRESHOLD),
+        repeat=config["repeat"]
+    )
+    return [result(
+        "retrieval.qdrant_search",
+        {"points": QDRANT_POINTS, "top_k": settings.TOP_K, "embedder": settings.EMBEDDING_PROVIDER},
+        stats
+    )]
@@ -0,0 +1,88 @@
+"""
+Serialization benchmarks for /api/conversations/recent?limit=50.
+
+Encodes the same 50 multi-paragraph conversations the way the endpoint
+used to (jsonable_encoder + stdlib JSONResponse) and the way it does now
+(ORJSONResponse straight from the DB rows), in the full and summary
+views, then times gzip and brotli on each body. Every record carries the
+body size in bytes.
+"""
+
+import gzip
+import random
+import tempfile
+from pathlib import Path
+
+import brotli
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.config import settings
+from app.database import Database
+from benchmarks.harness import benchmark, measure, result
+
+LIMIT = 50
+WORDS = (
+    "first isolate the variable subtract both sides divide by coefficient so we get then substitute "
+    "back check derivative integral limit series converges because therefore apply chain rule "
+    "product quotient factor roots quadratic formula discriminant"
+).split()
+
+
+def _answer(rng: random.Random) -> str:
+    """A few paragraphs of step-by-step text with numbers, like an LLM answer."""
+    paragraphs = []
+    for step in range(1, rng.randint(4, 8)):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(40, 90)))
+        paragraphs.append(f"Step {step}: {text} = {rng.uniform(-100, 100):.4f}")
+    return "\n\n".join(paragraphs)
+
+
+def populate(db: Database, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    db.save_conversations([
+        {
+            "query": f"Solve {rng.randint(2, 9)}x + {rng.randint(1, 50)} = {rng.randint(1, 99)} " + " ".join(rng.choices(WORDS, k=6)),
+            "answer": _answer(rng),
+            "source": rng.choice(["knowledge_base", "web_search", "llm_knowledge"]),
+            "confidence_score": rng.random(),
+            "kb_matches": rng.randint(0, 5)
+        }
+        for _ in range(rows)
+    ])
+
+
+@benchmark("serialization")
+def bench_recent_conversations(config):
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_path=Path(tmp) / "serialization.db")
+        populate(db, LIMIT)
+
+        encoders = {
+            "fastapi_json": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+            "orjson": lambda payload: ORJSONResponse(payload).body
+        }
+        compressors = {
+            "gzip": lambda body: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL),
+            "br": lambda body: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        }
+        for view in ("full", "summary"):
+            payload = {"conversations": db.get_recent_conversations(limit=LIMIT, summary=view == "summary")}
+            for name, encode in encoders.items():
+                body = encode(payload)
+                stats = measure(lambda: encode(payload), repeat=config["repeat"], min_time=0.2)
+                records.append(result(
+                    "serialization.encode", {"limit": LIMIT, "view": view, "encoder": name}, stats,
+                    bytes=len(body)
+                ))
+
+            body = encoders["orjson"](payload)
+            for name, compress in compressors.items():
+                stats = measure(lambda: compress(body), repeat=config["repeat"], min_time=0.2)
+                records.append(result(
+                    "serialization.compress", {"limit": LIMIT, "view": view, "encoding": name}, stats,
+                    bytes=len(compress(body)),
+                    uncompressed_bytes=len(body)
+                ))
+    return records
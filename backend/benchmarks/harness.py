@@ -0,0 +1,112 @@
+"""
+Minimal benchmark harness: timing, registration, JSON results and
+regression comparison between runs.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# suite name -> benchmark functions; each takes the run config and returns result records
+BENCHMARKS: Dict[str, List[Callable]] = {}
+
+
+def benchmark(suite: str):
+    """Register a benchmark function under `suite`."""
+    def decorator(fn: Callable) -> Callable:
+        BENCHMARKS.setdefault(suite, []).append(fn)
+        return fn
+    return decorator
+
+
+def measure(fn: Callable, repeat: int = 50, warmup: int = 3, min_time: float = 0.0) -> Dict:
+    """
+    Time `fn()` `repeat` times (after `warmup` untimed calls).
+
+    If `min_time` is set, keeps sampling until at least that many seconds
+    have been spent so very fast functions still get stable numbers.
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return {
+        "rounds": len(samples),
+        "min_ms": samples[0] * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": mean * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(0.95 * len(samples)))] * 1000,
+        "stdev_ms": statistics.pstdev(samples) * 1000,
+        "ops_per_s": 1.0 / mean if mean else None
+    }
+
+
+def result(name: str, params: Dict, stats: Dict, **extra) -> Dict:
+    record = {"name": name, "params": params, "stats": stats}
+    record.update(extra)
+    return record
+
+
+def _key(record: Dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(record["params"].items()))
+    return f"{record['name']}[{params}]"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def write_results(path: Path, records: List[Dict], config: Dict):
+    payload = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "config": config,
+        "results": records
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def compare(baseline_path: Path, records: List[Dict], threshold: float = 0.10) -> List[Dict]:
+    """Compare median latency against a previous results file; returns one row per shared benchmark."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    old = {_key(r): r for r in baseline["results"]}
+
+    rows = []
+    for record in records:
+        prev = old.get(_key(record))
+        if prev is None:
+            continue
+        before = prev["stats"]["median_ms"]
+        after = record["stats"]["median_ms"]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            "benchmark": _key(record),
+            "before_ms": before,
+            "after_ms": after,
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
@@ -0,0 +1,69 @@
+"""
+Run the benchmark suite and store results as JSON.
+
+Usage (from backend/):
+    python -m benchmarks.run                             # all suites, quick sizes
+    python -m benchmarks.run --suite database --scale full
+    python -m benchmarks.run --compare benchmarks/results/<old>.json
+
+Results go to benchmarks/results/<commit>.json by default; --compare
+prints the median-latency change against an earlier file and exits
+non-zero if anything regressed by more than --threshold.
+"""
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+from app.config import settings
+from benchmarks.harness import BENCHMARKS, _git_commit, compare, write_results
+
+MODULES = ["bench_retrieval", "bench_embedding", "bench_ingest", "bench_quantization", "bench_database", "bench_guardrails", "bench_request", "bench_serialization"]
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def main():
+    for module in MODULES:
+        importlib.import_module(f"benchmarks.{module}")
+
+    parser = argparse.ArgumentParser(description="Math Agent benchmark suite")
+    parser.add_argument("--suite", action="append", choices=sorted(BENCHMARKS), help="Suites to run (default: all)")
+    parser.add_argument("--scale", choices=["quick", "full"], default="quick", help="Dataset sizes to use")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed rounds per benchmark")
+    parser.add_argument(
+        "--embedder", choices=["sentence_transformers", "hashing"],
+        default=settings.EMBEDDING_PROVIDER, help="Embedding provider for retrieval benchmarks"
+    )
+    parser.add_argument("--output", type=Path, help="Results file (default: results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (fraction)")
+    args = parser.parse_args()
+
+    settings.EMBEDDING_PROVIDER = args.embedder
+    config = {"scale": args.scale, "repeat": args.repeat, "embedder": args.embedder}
+
+    records = []
+    for suite in args.suite or sorted(BENCHMARKS):
+        for fn in BENCHMARKS[suite]:
+            print(f"▶ {suite}.{fn.__name__}")
+            for record in fn(config):
+                records.append(record)
+                params = ", ".join(f"{k}={v}" for k, v in record["params"].items())
+                print(f"   {record['name']} [{params}]: median {record['stats']['median_ms']:.3f} ms")
+
+    output = args.output or RESULTS_DIR / f"{_git_commit() or 'local'}.json"
+    write_results(output, records, config)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        rows = compare(args.compare, records, args.threshold)
+        for row in rows:
+            flag = "❌" if row["regression"] else "  "
+            print(f"{flag} {row['benchmark']}: {row['before_ms']:.3f} → {row['after_ms']:.3f} ms ({row['change']:+.1%})")
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,15 @@ Gunicorn configuration for production deployment.
 """
 
 import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+# Prometheus multiprocess mode: every worker writes its samples here and
+# /metrics aggregates them. Must be set before the app is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/math-agent-metrics")
 
 # Server socket
 bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
@@ -33,3 +42,44 @@ tmp_upload_dir = None
 
 # Preload app for better performance
 preload_app = True
+
+# ==================== HOOKS ====================
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory."""
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    
+    if os.getenv("EMBEDDING_SIDECAR", "false").lower() == "true":
+        _start_embedding_sidecar(server)
+
+def _start_embedding_sidecar(server):
+    """
+    One embedding process for all workers (app/embedding_sidecar.py);
+    restarted if it dies, workers reconnect on their next request.
+    """
+    def supervise():
+        while not getattr(server, "embedding_sidecar_stopping", False):
+            server.embedding_sidecar = subprocess.Popen(
+                [sys.executable, "-m", "app.embedding_sidecar"],
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            code = server.embedding_sidecar.wait()
+            if not getattr(server, "embedding_sidecar_stopping", False):
+                server.log.warning(f"Embedding sidecar exited with {code}; restarting")
+                time.sleep(1)
+    
+    threading.Thread(target=supervise, name="embedding-sidecar", daemon=True).start()
+
+def on_exit(server):
+    """Stop the embedding sidecar with the master."""
+    sidecar = getattr(server, "embedding_sidecar", None)
+    if sidecar is not None:
+        server.embedding_sidecar_stopping = True
+        sidecar.terminate()
+
+def child_exit(server, worker):
+    """Drop live-gauge files of workers that exited."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
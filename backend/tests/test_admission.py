@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from app.admission import STANDARD, AdmissionController, Overloaded
+
+
+def test_queue_timeout_records_no_service_time():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, priority_reserve=0, slo=0.05)
+        async with admission.slot("a"):
+            await asyncio.sleep(0.02)
+        served = admission._service[STANDARD]
+
+        async with admission.slot("a"):
+            with pytest.raises(Overloaded):
+                await admission.acquire("b")
+            await asyncio.sleep(0.02)  # still holding the slot past b's timeout
+        return admission, served
+
+    admission, served = asyncio.run(scenario())
+    assert admission.shed == {"timeout": 1}
+    assert admission.abandoned == 1
+    # One timed-out waiter and one real 20 ms sample: the estimate must not drift towards 0
+    assert admission._service[STANDARD] >= served * 0.8
+    assert admission.stats()["in_flight"][STANDARD] == 0
+
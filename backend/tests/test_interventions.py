@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import agent as agent_module, database, health, main
+from app.config import settings
+
+QUESTION = "What is the area of a circle of radius 2?"
+CORRECTION = "The area is pi * r^2 = pi * 2^2 = 4*pi, about 12.57 square units. FINAL ANSWER: 4π"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The API on the offline providers, with a fresh database and no background threads."""
+    kb = tmp_path / "kb.jsonl"
+    kb.write_text(json.dumps({"problem": "What is 2+2?", "solution": "4", "type": "arithmetic"}) + "\n")
+    for name, value in {
+        "LLM_PROVIDER": "fake", "RETRIEVER_PROVIDER": "memory", "EMBEDDING_PROVIDER": "hashing",
+        "DATASET_PATH": kb, "DATA_DIR": tmp_path, "WARMUP_PATH": tmp_path / "warm.jsonl",
+        "FAKE_LLM_LATENCY_MS": 1.0, "FAKE_LLM_TOKEN_MS": 0.0, "SYMBOLIC_ENABLED": False,
+        "KB_ENRICH_INTERVAL": 0.0, "HEALTH_PROBE_INTERVAL": 0.0, "HEALTH_LLM_PROBE_INTERVAL": 0.0,
+        "CACHE_BACKEND": "none", "ADMIN_TOKEN": "secret",
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(agent_module, "_agent", None)
+    monkeypatch.setattr(database, "_db", None)
+    monkeypatch.setattr(health, "_health", None)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_approved_correction_replaces_the_cached_answer(client):
+    first = client.post("/api/query", json={"query": QUESTION}).json()
+    assert client.post("/api/query", json={"query": QUESTION}).json()["answer"] == first["answer"]
+    assert main.agent.answer_cache.counts["l1_hit"] == 1
+
+    client.post("/api/feedback", json={
+        "query": QUESTION, "answer": first["answer"], "rating": 1, "is_correct": False,
+        "correction": CORRECTION, "conversation_id": first["conversation_id"],
+    }).raise_for_status()
+    admin = {"X-Admin-Token": "secret"}
+    (pending,) = client.get("/api/admin/interventions/pending", headers=admin).json()["interventions"]
+    approved = client.post(f"/api/admin/interventions/{pending['id']}/approve", headers=admin).json()
+    assert approved["synced"] >= 1
+
+    after = client.post("/api/query", json={"query": QUESTION}).json()
+    assert after["source"] == "verified_kb"
+    assert CORRECTION in after["answer"]
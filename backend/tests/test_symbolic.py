@@ -0,0 +1,32 @@
+import multiprocessing
+
+import pytest
+
+from app import symbolic
+from app.symbolic import parse_intent
+
+
+@pytest.fixture
+def worker():
+    """Run `_solve_job` in this process, set up the way a pool worker would be."""
+    symbolic._init_worker(multiprocessing.RawArray("d", 1))
+    return lambda job: symbolic._solve_job(job, 5.0, 0)
+
+
+@pytest.mark.parametrize("query", ["What is 5!", "What is 10!", "Evaluate 3!.", "Simplify x!"])
+def test_factorial_is_not_mechanical(query):
+    assert parse_intent(query) is None
+
+
+def test_trailing_punctuation_still_parses():
+    assert parse_intent("What is 2+3?") == {"intent": "evaluate", "expr": "2+3", "var": None}
+
+
+def test_solve_for_the_equation_variable(worker):
+    solved = worker(parse_intent("solve 2x+3 = 7 for x"))
+    assert solved["result"] == "x = 2"
+
+
+def test_solve_for_a_variable_not_in_the_equation(worker):
+    solved = worker(parse_intent("solve 2x+3 = 7 for y"))
+    assert "result" not in solved and "error" in solved
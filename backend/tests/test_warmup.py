@@ -0,0 +1,42 @@
+import pytest
+
+from app.database import Database
+from app.warmup import CacheWarmer
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(tmp_path / "conversations.db")
+
+
+def ask(db, query, times=1):
+    for _ in range(times):
+        db.save_conversation(query, "answer", "kb", 0.9, 1)
+
+
+def hot(db):
+    queries, _ = CacheWarmer(agent=None, db=db, path=None).hot_queries(10)
+    return {entry["query"]: entry for entry in queries}
+
+
+def test_ratings_apply_to_the_spelling_that_was_rated(db):
+    ask(db, "Solve X", times=4)
+    ask(db, "solve x")
+    for _ in range(3):
+        db.save_feedback("Solve X", "answer", rating=1, is_correct=False)
+    db.save_feedback("Solve X", "answer", rating=5, is_correct=True)
+    db.save_feedback("solve x", "answer", rating=5, is_correct=True)
+
+    assert set(hot(db)) == {"solve x"}
+
+
+def test_rating_factor_is_applied_once_per_cache_key(db):
+    ask(db, "What is 2+2?")
+    ask(db, "What is 2+2")
+    (unrated,) = hot(db).values()
+    db.save_feedback("What is 2+2?", "answer", rating=5, is_correct=True)
+    db.save_feedback("What is 2+2", "answer", rating=4, is_correct=True)
+
+    (entry,) = hot(db).values()
+    assert entry["asks"] == 2
+    assert entry["weight"] == pytest.approx(unrated["weight"] * 4.5 / 3)
@@ -61,21 +61,6 @@ const Icons = {
     ),
 };
 
-const fetchTitleFromAPI = async (question) => {
-    try {
-        const resp = await fetch(`${API_BASE_URL}/api/topic-title`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query: question })
-        });
-        if (!resp.ok) throw new Error();
-        const data = await resp.json();
-        return data.title || question.split(' ').slice(0, 7).join(' ') + '...';
-    } catch (err) {
-        return question.split(' ').slice(0, 7).join(' ') + '...';
-    }
-};
-
 // Main App Component
 function MathAgentApp() {
     const [conversations, setConversations] = useState({});
@@ -104,7 +89,8 @@ function MathAgentApp() {
 
     const loadConversations = async () => {
         try {
-            const response = await fetch(`${API_BASE_URL}/api/conversations/recent?limit=50`);
+            // Summary view: questions only; each answer is fetched when its conversation is opened
+            const response = await fetch(`${API_BASE_URL}/api/conversations/recent?limit=50&view=summary`);
             const data = await response.json();
             
             const grouped = {};
@@ -120,7 +106,7 @@ function MathAgentApp() {
                 }
                 grouped[threadId].messages.push(
                     { id: `${conv.id}-q`, role: 'user', content: conv.query, timestamp: conv.created_at },
-                    { id: `${conv.id}-a`, role: 'assistant', content: conv.answer, source: conv.source, confidence: conv.confidence_score, conversationId: conv.id, timestamp: conv.created_at }
+                    { id: `${conv.id}-a`, role: 'assistant', content: null, source: conv.source, confidence: conv.confidence_score, conversationId: conv.id, timestamp: conv.created_at }
                 );
             });
             
@@ -144,8 +130,35 @@ function MathAgentApp() {
         setActiveConversationId(newId);
     };
 
+    const loadFullAnswers = async (id) => {
+        const pending = (conversations[id]?.messages || []).filter(m => m.role === 'assistant' && m.content === null);
+        if (pending.length === 0) return;
+
+        // Each answer settles on its own; a failed one stays null (retried when the conversation is reopened)
+        const loaded = await Promise.all(pending.map(async (m) => {
+            try {
+                const response = await fetch(`${API_BASE_URL}/api/conversations/${m.conversationId}`);
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                const data = await response.json();
+                return [m.id, { content: data.answer, loadFailed: false }];
+            } catch (error) {
+                console.error('Failed to load answer:', error);
+                return [m.id, { content: null, loadFailed: true }];
+            }
+        }));
+        const answers = Object.fromEntries(loaded);
+        setConversations(prev => ({
+            ...prev,
+            [id]: {
+                ...prev[id],
+                messages: prev[id].messages.map(m => m.id in answers ? { ...m, ...answers[m.id] } : m)
+            }
+        }));
+    };
+
     const handleSelectConversation = (id) => {
         setActiveConversationId(id);
+        loadFullAnswers(id);
     };
 
     const handleDeleteConversation = async (id) => {
@@ -224,13 +237,21 @@ function MathAgentApp() {
     setLoading(true);
 
     try {
-        // Only fetch title if this is the first message in conversation
+        // Only set title if this is the first message in conversation
         const isFirstMessage = (conversations[convId]?.messages || []).length === 0;
-        
-        let autoTitle = conversations[convId]?.title || savedInputValue.split(' ').slice(0, 7).join(' ') + '...';
-        
+
+        // Fetch answer from backend (the response carries the auto-title)
+        const response = await fetch(`${API_BASE_URL}/api/query`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ query: savedInputValue })
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+        const data = await response.json();
+
         if (isFirstMessage) {
-            autoTitle = await fetchTitleFromAPI(savedInputValue);
+            const autoTitle = data.title || savedInputValue.split(' ').slice(0, 7).join(' ') + '...';
             setConversations(prev => ({
                 ...prev,
                 [convId]: {
@@ -240,15 +261,6 @@ function MathAgentApp() {
             }));
         }
 
-        // Fetch answer from backend
-        const response = await fetch(`${API_BASE_URL}/api/query`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query: savedInputValue })
-        });
-
-        const data = await response.json();
-
         const assistantMessage = {
             id: Date.now() + 1,
             role: 'assistant',
@@ -291,13 +303,14 @@ function MathAgentApp() {
     const handleFeedback = async (messageId, rating) => {
         const activeConv = conversations[activeConversationId];
         const message = activeConv?.messages.find(m => m.id === messageId);
-        if (!message) return;
+        // The answer text must be loaded: feedback repeats it for the server to match
+        if (!message || message.content === null) return;
 
         const messageIndex = activeConv.messages.indexOf(message);
         const userMessage = activeConv.messages[messageIndex - 1];
 
         try {
-            await fetch(`${API_BASE_URL}/api/feedback`, {
+            const response = await fetch(`${API_BASE_URL}/api/feedback`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -310,6 +323,7 @@ function MathAgentApp() {
                     conversation_id: message.conversationId
                 })
             });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
             alert('Feedback submitted! Thank you 🎉');
             setShowFeedback(null);
@@ -318,6 +332,7 @@ function MathAgentApp() {
 
         } catch (error) {
             console.error('Feedback submission failed:', error);
+            alert('Feedback could not be submitted. Please try again.');
         }
     };
 
@@ -536,20 +551,24 @@ function MathAgentApp() {
                                                     )}
                                                 </div>
                                                 <div className="prose prose-sm max-w-none text-gray-800 whitespace-pre-wrap">
-                                                    {message.content}
+                                                    {message.content ?? (message.loadFailed
+                                                        ? <span className="text-red-600">Failed to load this answer. Reopen the conversation to retry.</span>
+                                                        : 'Loading answer...')}
                                                 </div>
                                                 
                                                 <div className="flex items-center gap-2 mt-4">
                                                     <button 
                                                         onClick={() => navigator.clipboard.writeText(message.content)}
-                                                        className="flex items-center gap-1 px-3 py-1.5 text-sm text-gray-600 hover:bg-gray-100 rounded-lg transition-colors"
+                                                        disabled={message.content === null}
+                                                        className="flex items-center gap-1 px-3 py-1.5 text-sm text-gray-600 hover:bg-gray-100 rounded-lg transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
                                                     >
                                                         <Icons.Copy />
                                                         Copy
                                                     </button>
                                                     <button
                                                         onClick={() => setShowFeedback(message.id)}
-                                                        className="flex items-center gap-1 px-3 py-1.5 text-sm text-gray-600 hover:bg-gray-100 rounded-lg transition-colors"
+                                                        disabled={message.content === null}
+                                                        className="flex items-center gap-1 px-3 py-1.5 text-sm text-gray-600 hover:bg-gray-100 rounded-lg transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
                                                     >
                                                         <Icons.ThumbUp />
                                                         Feedback
@@ -587,7 +606,7 @@ function MathAgentApp() {
                                                         <div className="flex gap-2 mt-3">
                                                             <button
                                                                 onClick={() => handleFeedback(message.id, feedbackRating)}
-                                                                disabled={feedbackRating === 0}
+                                                                disabled={feedbackRating === 0 || message.content === null}
                                                                 className="px-4 py-2 text-sm bg-indigo-600 text-white rounded-lg hover:bg-indigo-700 disabled:bg-gray-300 disabled:cursor-not-allowed transition-colors"
                                                             >
                                                                 Submit Feedback
@@ -1,88 +1,71 @@
 """
 Download MATH dataset from HuggingFace - ALL SAMPLES for better accuracy.
 This downloads the full dataset (~12K problems) for production-ready knowledge base.
+
+Rows are streamed from HuggingFace, normalized and written to
+data/math_kb.jsonl one line at a time, with the dataset statistics
+computed in the same pass, so memory stays flat however large the
+dataset is.
 """
 
-import json
+import argparse
+import sys
 from datasets import load_dataset
 from pathlib import Path
-import os
 
-def download_math_dataset():
-    """Download complete MATH dataset from HuggingFace."""
-    
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.ingest import DatasetStats, normalize_item, write_jsonl  # noqa: E402
+
+def download_math_dataset(name: str = "qwedsacf/competition_math", split: str = "train", output_path: Path = None):
+    """Stream the MATH dataset from HuggingFace into a JSONL file."""
+
     print("📥 Downloading COMPLETE MATH dataset from HuggingFace...")
     print("⏳ This will take 2-3 minutes (downloading ~12,500 problems)...")
-    
+
     # Get the correct path (we're in scripts folder)
     current_dir = Path(__file__).parent
     project_root = current_dir.parent
     data_dir = project_root / "data"
-    output_path = data_dir / "math_kb.json"
-    
+    output_path = output_path or data_dir / "math_kb.jsonl"
+
     # Create data directory if it doesn't exist
-    data_dir.mkdir(parents=True, exist_ok=True)
-    
-    print(f"📂 Data directory: {data_dir}")
-    
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"📂 Output file: {output_path}")
+
     try:
-        # Load FULL dataset from HuggingFace
+        # Stream the dataset instead of materializing it
         dataset = load_dataset(
-            "qwedsacf/competition_math",
-            split="train",
+            name,
+            split=split,
+            streaming=True,
             trust_remote_code=True
         )
-        
-        print(f"✅ Dataset loaded. Total samples: {len(dataset)}")
-        
-        # Convert all samples to our format
-        all_data = []
-        
-        for item in dataset:
-            all_data.append({
-                'problem': item['problem'],
-                'solution': item['solution'],
-                'level': item['level'],
-                'type': item['type']
-            })
-        
-        print(f"✅ Processed {len(all_data)} samples (ALL levels)")
-        
-        # Save to JSON
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
-        
+
+        # Normalize, count and write in a single pass
+        stats = DatasetStats()
+        written = write_jsonl(stats.track(normalize_item(row) for row in dataset), output_path)
+
         print(f"✅ Dataset saved to {output_path}")
-        print(f"📊 Dataset statistics:\n")
-        
-        # Show distribution
-        level_counts = {}
-        type_counts = {}
-        
-        for item in all_data:
-            level = item['level']
-            topic = item['type']
-            level_counts[level] = level_counts.get(level, 0) + 1
-            type_counts[topic] = type_counts.get(topic, 0) + 1
-        
-        print("By Difficulty Level:")
-        for level, count in sorted(level_counts.items()):
-            print(f"  {level}: {count}")
-        
-        print("\nBy Math Topic:")
-        for topic, count in sorted(type_counts.items()):
-            print(f"  {topic}: {count}")
-        
-        return len(all_data)
-    
+        stats.print_summary()
+
+        return written
+
     except Exception as e:
         print(f"❌ ERROR downloading dataset: {e}")
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a HuggingFace math dataset into JSONL")
+    parser.add_argument("--dataset", default="qwedsacf/competition_math", help="HuggingFace dataset name")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--output", type=Path, help="Output .jsonl (default: data/math_kb.jsonl)")
+    args = parser.parse_args()
+
     try:
-        total = download_math_dataset()
+        total = download_math_dataset(args.dataset, args.split, args.output)
         print(f"\n🎉 SUCCESS! Downloaded {total} math problems")
-        print("✅ Next step: Run setup_vector_store.py")
+        print("✅ Next step: Run setup_qdrant_cloud.py")
     except Exception as e:
         print(f"❌ FAILED: {e}")
@@ -0,0 +1,222 @@
+"""
+Offline evaluation of routing quality vs. latency for retrieval settings.
+
+Replays a held-out split of the KB dataset (problem text only, as a
+student would ask it) or logged questions from the conversations table
+through the local index, in parallel across processes, and reports for
+every (index, top_k, threshold) combination. The corpus is embedded the
+way app/ingest.py stores it in Qdrant: queries are matched against the
+problem-text vectors ("exact", "int8", "pq"), and each index is also
+scored fused with the full problem+solution vectors ("exact+full", ...),
+which is what RETRIEVAL_FUSE_FULL=true does:
+
+  • recall@k        - the source problem is among the hits that pass the threshold
+  • kb_hit_rate     - share of queries answered from the KB
+  • fallback_rate   - share that would fall through to WolframAlpha / LLM-only
+  • simulated latency (mean / p95) - measured embed + search time plus a
+    cost model for the downstream path (--llm-ms, --wolfram-ms, ...)
+
+The corpus is embedded once in the parent; workers share both vector sets
+via memory-mapped .npy files and each embed and search their own slice of
+queries at the largest top_k (smaller k are prefixes of that ranking).
+
+Usage:
+    python scripts/evaluate_retrieval.py --holdout 0.1 --top-k 3 5 10 --threshold 0.3 0.4 0.5 0.6
+    python scripts/evaluate_retrieval.py --source conversations --limit 2000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.config import settings  # noqa: E402
+from app.ingest import VECTOR_FULL, VECTOR_PROBLEM, embed_items, iter_dataset  # noqa: E402
+from app.providers import get_embedder  # noqa: E402
+from app.retrieval import LocalVectorIndex, make_local_index  # noqa: E402
+
+INDEX_TYPES = ["exact", "int8", "pq"]
+FUSED = "+full"
+
+_worker = {}
+
+
+def build_index(kind: str, vectors: np.ndarray) -> LocalVectorIndex:
+    """Index over the shared (memory-mapped) corpus; quantized kinds keep only their codes in RAM."""
+    index = make_local_index(kind, vectors.shape[1])
+    index.vectors = vectors
+    index.payloads = list(range(len(vectors)))
+    index.train()
+    return index
+
+
+def _init_worker(vectors_dir: str, index_types):
+    problem = np.load(os.path.join(vectors_dir, f"{VECTOR_PROBLEM}.npy"), mmap_mode="r")
+    _worker["full"] = np.load(os.path.join(vectors_dir, f"{VECTOR_FULL}.npy"), mmap_mode="r")
+    _worker["model"] = get_embedder()
+    _worker["indexes"] = {kind: build_index(kind, problem) for kind in index_types}
+
+
+def _run_chunk(args):
+    """Embed and search one slice of queries; returns per-query rankings and timings."""
+    queries, max_k = args
+    model = _worker["model"]
+    rows = []
+    for text, target in queries:
+        t0 = time.perf_counter()
+        vec = model.encode(text)
+        embed_s = time.perf_counter() - t0
+        for kind, index in _worker["indexes"].items():
+            for name, fuse_with in ((kind, None), (kind + FUSED, _worker["full"])):
+                t0 = time.perf_counter()
+                ranking, = index.search_batch(np.asarray(vec)[None, :], max_k, fuse_with=fuse_with)
+                rows.append({
+                    "index": name,
+                    "target": target,
+                    "ranking": [(score, doc_id) for score, doc_id in ranking],
+                    "retrieval_ms": (embed_s + time.perf_counter() - t0) * 1000
+                })
+    return rows
+
+
+def load_queries(args, items):
+    """Return (queries, corpus_items) where queries are (text, target_doc_id or None)."""
+    if args.source == "conversations":
+        from app.database import Database
+
+        db = Database(db_path=Path(args.db) if args.db else None)
+        logged = db.get_recent_conversations(limit=args.limit)
+        return [(row["query"], None) for row in logged], items
+
+    rng = random.Random(args.seed)
+    ids = list(range(len(items)))
+    rng.shuffle(ids)
+    held_out = ids[:max(1, int(len(ids) * args.holdout))]
+    if args.limit:
+        held_out = held_out[:args.limit]
+    return [(items[i]["problem"], i) for i in held_out], items
+
+
+def simulate_latency(retrieval_ms: float, hits: int, args) -> float:
+    """Cost model for the path a query would take after retrieval."""
+    if hits:
+        return retrieval_ms + args.llm_ms + args.llm_ms_per_hit * hits
+    # KB miss: WolframAlpha is always tried before the LLM
+    return retrieval_ms + args.wolfram_ms + args.llm_ms
+
+
+def evaluate(rows, top_ks, thresholds, args):
+    """Score every (index, top_k, threshold) combination from the max-k rankings."""
+    report = []
+    for kind in sorted({r["index"] for r in rows}):
+        kind_rows = [r for r in rows if r["index"] == kind]
+        for top_k in top_ks:
+            for threshold in thresholds:
+                hits_found = 0
+                recalled = 0
+                labelled = 0
+                latencies = []
+                for r in kind_rows:
+                    passed = [doc for score, doc in r["ranking"][:top_k] if score >= threshold]
+                    hits_found += bool(passed)
+                    if r["target"] is not None:
+                        labelled += 1
+                        recalled += r["target"] in passed
+                    latencies.append(simulate_latency(r["retrieval_ms"], len(passed), args))
+                latencies.sort()
+                n = len(kind_rows)
+                report.append({
+                    "index": kind,
+                    "top_k": top_k,
+                    "threshold": threshold,
+                    "recall_at_k": round(recalled / labelled, 4) if labelled else None,
+                    "kb_hit_rate": round(hits_found / n, 4),
+                    "fallback_rate": round(1 - hits_found / n, 4),
+                    "retrieval_ms_p50": round(float(np.median([r["retrieval_ms"] for r in kind_rows])), 3),
+                    "simulated_ms_mean": round(sum(latencies) / n, 1),
+                    "simulated_ms_p95": round(latencies[min(n - 1, math.ceil(0.95 * n) - 1)], 1)
+                })
+    return report
+
+
+def recommend(report, tolerance: float):
+    """Fastest setting whose recall is within `tolerance` of the best observed recall."""
+    scored = [r for r in report if r["recall_at_k"] is not None]
+    if not scored:
+        return min(report, key=lambda r: r["simulated_ms_mean"])
+    best = max(r["recall_at_k"] for r in scored)
+    eligible = [r for r in scored if r["recall_at_k"] >= best - tolerance]
+    return min(eligible, key=lambda r: r["simulated_ms_mean"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval thresholds vs. latency")
+    parser.add_argument("--dataset", type=Path, default=settings.DATASET_PATH)
+    parser.add_argument("--source", choices=["holdout", "conversations"], default="holdout")
+    parser.add_argument("--db", help="conversations.db path (default: configured DATA_DIR)")
+    parser.add_argument("--holdout", type=float, default=0.1, help="Fraction of the KB replayed as queries")
+    parser.add_argument("--limit", type=int, default=2000, help="Max queries to replay")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--threshold", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument("--index", nargs="+", choices=INDEX_TYPES, default=["exact"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-ms", type=float, default=2500.0, help="Modelled LLM generation time")
+    parser.add_argument("--llm-ms-per-hit", type=float, default=150.0, help="Extra LLM time per context hit")
+    parser.add_argument("--wolfram-ms", type=float, default=1200.0, help="Modelled WolframAlpha round trip")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Recall loss accepted for speed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    items = list(iter_dataset(args.dataset))
+    queries, corpus = load_queries(args, items)
+    print(f"📂 {len(corpus)} KB problems, replaying {len(queries)} queries ({args.source})")
+
+    print("🔧 Embedding corpus...")
+    model = get_embedder()
+    vectors = embed_items(model, corpus)
+
+    max_k = max(args.top_k)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, matrix in vectors.items():
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            np.save(os.path.join(tmp, f"{name}.npy"), matrix)
+
+        chunk = max(1, math.ceil(len(queries) / (args.workers * 4)))
+        chunks = [(queries[i:i + chunk], max_k) for i in range(0, len(queries), chunk)]
+        print(f"⚙️  Replaying with {args.workers} processes...")
+        with Pool(args.workers, initializer=_init_worker, initargs=(tmp, args.index)) as pool:
+            rows = [row for part in pool.imap_unordered(_run_chunk, chunks) for row in part]
+
+    report = evaluate(rows, args.top_k, args.threshold, args)
+    best = recommend(report, args.tolerance)
+
+    header = f"{'index':<12}{'k':>4}{'thr':>6}{'recall':>9}{'kb_hit':>9}{'fallbk':>9}{'mean_ms':>10}{'p95_ms':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in report:
+        recall = f"{r['recall_at_k']:.3f}" if r["recall_at_k"] is not None else "-"
+        marker = "  ◀ recommended" if r is best else ""
+        print(f"{r['index']:<12}{r['top_k']:>4}{r['threshold']:>6.2f}{recall:>9}"
+              f"{r['kb_hit_rate']:>9.3f}{r['fallback_rate']:>9.3f}"
+              f"{r['simulated_ms_mean']:>10.1f}{r['simulated_ms_p95']:>10.1f}{marker}")
+
+    fuse = "true" if best["index"].endswith(FUSED) else "false"
+    print(f"\n✅ Recommended: TOP_K={best['top_k']} SCORE_THRESHOLD={best['threshold']} "
+          f"RETRIEVAL_FUSE_FULL={fuse} (index: {best['index']})")
+    if args.output:
+        args.output.write_text(json.dumps({"results": report, "recommended": best}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Open-loop load generator for /api/query.
+
+Requests are fired on a fixed schedule (constant or Poisson arrivals at
+--rps) regardless of how fast earlier ones complete, so queueing delay
+shows up in the latency numbers instead of silently lowering the load.
+
+Targets either a running server (--url) or starts the app on a loopback
+port in a background thread (--in-process); the app gets its own event
+loop so blocking handlers cannot stall the load generator. For a
+reproducible offline baseline combine --in-process with the local
+providers, e.g.:
+
+    LLM_PROVIDER=fake RETRIEVER_PROVIDER=memory EMBEDDING_PROVIDER=hashing \\
+        python scripts/load_test.py --in-process --rps 20 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+
+DEFAULT_QUERIES = [
+    "What is the quadratic formula?",
+    "Find the derivative of x^3 - 5x.",
+    "State and use the Pythagorean theorem to find the hypotenuse for legs 5 and 12.",
+    "Evaluate the integral of 2x dx.",
+    "How many ways can 5 people sit around a round table?",
+    "What is the sum of the interior angles of a hexagon?",
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+async def _one_request(client, query, results, started_at):
+    t0 = time.perf_counter()
+    try:
+        resp = await client.post("/api/query", json={"query": query})
+        status = resp.status_code
+        source = resp.json().get("source") if status == 200 else None
+    except Exception as e:
+        status, source = type(e).__name__, None
+    results.append({
+        "offset": t0 - started_at,
+        "latency": time.perf_counter() - t0,
+        "status": status,
+        "source": source
+    })
+
+
+async def run_load(client, queries, rps, duration, poisson, seed):
+    """Fire requests open-loop for `duration` seconds and collect per-request results."""
+    rng = random.Random(seed)
+    results = []
+    tasks = []
+    started_at = time.perf_counter()
+    next_at = 0.0
+    i = 0
+
+    while next_at < duration:
+        delay = started_at + next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        query = queries[i % len(queries)]
+        tasks.append(asyncio.create_task(_one_request(client, query, results, started_at)))
+        i += 1
+        next_at += rng.expovariate(rps) if poisson else 1.0 / rps
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started_at
+    return results, elapsed
+
+
+def summarize(results, elapsed, rps, duration):
+    latencies = sorted(r["latency"] for r in results if r["status"] == 200)
+    total = len(results)
+    ok = len(latencies)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "target_rps": rps,
+        "duration_s": duration,
+        "requests": total,
+        "completed_ok": ok,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else None
+        },
+        "status_counts": dict(Counter(str(r["status"]) for r in results)),
+        "source_counts": dict(Counter(r["source"] for r in results if r["source"]))
+    }
+
+
+def start_in_process_server():
+    """Serve app.main:app on 127.0.0.1 in a daemon thread; returns its base URL."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import uvicorn
+    from app.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("In-process server failed to start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def main_async(args, base_url):
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        results, elapsed = await run_load(
+            client, queries, args.rps, args.duration, args.poisson, args.seed
+        )
+
+    return summarize(results, elapsed, args.rps, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for /api/query")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running server")
+    parser.add_argument("--in-process", action="store_true", help="Serve the app locally for the run")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target arrival rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of constant spacing")
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here as well")
+    args = parser.parse_args()
+
+    base_url = start_in_process_server() if args.in_process else args.url
+    report = asyncio.run(main_async(args, base_url))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
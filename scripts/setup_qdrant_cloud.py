@@ -3,10 +3,10 @@ Upload MATH dataset to Qdrant Cloud - FIXED VERSION
 Works with qdrant-client 1.12.0+ (uses numeric timeout instead of httpx.Timeout)
 """
 
-import json
+import argparse
+import sys
 from pathlib import Path
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 import os
@@ -14,26 +14,44 @@ from dotenv import load_dotenv
 import time
 import random
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.ingest import (  # noqa: E402
+    VECTOR_PROBLEM,
+    DatasetStats,
+    batched,
+    build_points,
+    embed_items,
+    iter_dataset,
+    prefetch,
+    quantization_config,
+    vectors_config,
+)
+
 # Load environment variables
 env_path = Path(__file__).parent.parent 
 
 env_path = env_path / "backend" / "app" / ".env"
 load_dotenv(env_path)
 
-def setup_qdrant_cloud():
-    """Upload complete dataset to Qdrant Cloud with proper error handling."""
+def setup_qdrant_cloud(data_path: Path = None):
+    """Stream the dataset into Qdrant Cloud with proper error handling."""
     
     print("🚀 Setting up Qdrant Cloud vector database...")
     
-    # Get paths
+    # Get paths (JSONL from download_dataset.py; a legacy .json array also works)
     current_dir = Path(__file__).parent
     project_root = current_dir.parent
-    data_path = project_root / "data" / "math_kb.json"
+    if data_path is None:
+        data_path = project_root / "data" / "math_kb.jsonl"
+        if not data_path.exists():
+            data_path = project_root / "data" / "math_kb.json"
     
     # Load environment variables
     qdrant_url = os.getenv("QDRANT_URL")
     qdrant_api_key = os.getenv("QDRANT_API_KEY")
     collection_name = os.getenv("QDRANT_COLLECTION_NAME", "math_knowledge_base")
+    quantization = os.getenv("QUANTIZATION", "none")
     
     if not qdrant_url or not qdrant_api_key:
         raise ValueError(
@@ -41,13 +59,7 @@ def setup_qdrant_cloud():
             "Get these from https://cloud.qdrant.io/"
         )
     
-    print(f"📂 Loading dataset from: {data_path}")
-    
-    # Load dataset
-    with open(data_path, 'r', encoding='utf-8') as f:
-        math_data = json.load(f)
-    
-    print(f"✅ Loaded {len(math_data)} problems")
+    print(f"📂 Streaming dataset from: {data_path}")
     
     # Initialize Qdrant client with NUMERIC timeout (180 seconds)
     print(f"🔗 Connecting to Qdrant Cloud (timeout: 180s)...")
@@ -79,13 +91,13 @@ def setup_qdrant_cloud():
     except:
         print(f"  ✓ No existing collection to delete")
     
-    # Create collection with optimized settings
+    # Create collection with named "problem" and "full" vectors; when quantized,
+    # originals go to disk and only the codes stay in RAM
+    quantized = quantization != "none"
     client.create_collection(
         collection_name=collection_name,
-        vectors_config=VectorParams(
-            size=embedding_dim,
-            distance=Distance.COSINE
-        )
+        vectors_config=vectors_config(embedding_dim, on_disk=quantized),
+        quantization_config=quantization_config(quantization)
     )
     
     print(f"✅ Collection '{collection_name}' created")
@@ -96,48 +108,31 @@ def setup_qdrant_cloud():
     print("   • Batch size: 100 points")
     print("   • Rate limit: 0.5s between batches")
     print("   • Retry attempts: 3 per batch")
+    print("   • Next batches embedded while the current one uploads (2 ahead)")
     print("   • Estimated time: 15-20 minutes\n")
     
     BATCH_SIZE = 100  # Conservative batch size for stability
     SLEEP_BETWEEN_BATCHES = 0.5  # 500ms delay
     MAX_RETRIES = 3
+    PREFETCH_BATCHES = 2  # bounds memory: at most this many embedded batches wait
     
     total_uploaded = 0
     failed_batches = []
     
-    # Process in batches with progress bar
-    num_batches = (len(math_data) + BATCH_SIZE - 1) // BATCH_SIZE
+    # Read -> count -> batch -> embed runs on a background thread, bounded by PREFETCH_BATCHES
+    stats = DatasetStats()
+    embedded = prefetch(
+        (
+            (batch_start, batch_data, embed_items(model, batch_data))
+            for batch_start, batch_data in batched(stats.track(iter_dataset(data_path)), BATCH_SIZE)
+        ),
+        depth=PREFETCH_BATCHES
+    )
     
-    with tqdm(total=len(math_data), desc="Uploading", unit="problems") as pbar:
-        for batch_start in range(0, len(math_data), BATCH_SIZE):
-            batch_data = math_data[batch_start:batch_start + BATCH_SIZE]
+    with tqdm(desc="Uploading", unit="problems") as pbar:
+        for batch_start, batch_data, vectors in embedded:
             batch_num = batch_start // BATCH_SIZE + 1
-            
-            # Prepare batch embeddings and points
-            points = []
-            
-            for idx, item in enumerate(batch_data):
-                global_idx = batch_start + idx
-                
-                # Create text for embedding
-                text_content = f"Problem: {item['problem']}\n\nSolution: {item['solution']}"
-                
-                # Generate embedding
-                embedding = model.encode(text_content).tolist()
-                
-                # Create point
-                point = PointStruct(
-                    id=global_idx,
-                    vector=embedding,
-                    payload={
-                        'problem': item['problem'],
-                        'solution': item['solution'],
-                        'level': item['level'],
-                        'type': item['type'],
-                        'text': text_content
-                    }
-                )
-                points.append(point)
+            points = build_points(batch_data, vectors, start_id=batch_start)
             
             # Upload with retry logic
             upload_success = False
@@ -158,7 +153,7 @@ def setup_qdrant_cloud():
                     if "timeout" in error_msg or "timed out" in error_msg:
                         # Exponential backoff
                         sleep_time = min(30, (2 ** attempt) + random.uniform(0, 1))
-                        pbar.write(f"⚠️  Batch {batch_num}/{num_batches} timeout, "
+                        pbar.write(f"⚠️  Batch {batch_num} timeout, "
                                   f"retry {attempt + 1}/{MAX_RETRIES} in {sleep_time:.1f}s...")
                         time.sleep(sleep_time)
                     else:
@@ -169,11 +164,12 @@ def setup_qdrant_cloud():
                 failed_batches.append(batch_start)
                 pbar.write(f"❌ Batch {batch_num} failed after {MAX_RETRIES} retries")
             
-            # Rate limiting
-            if upload_success and batch_start + BATCH_SIZE < len(math_data):
+            # Rate limiting (embedding of the next batches continues meanwhile)
+            if upload_success:
                 time.sleep(SLEEP_BETWEEN_BATCHES)
     
-    print(f"\n✅ Upload complete! Uploaded: {total_uploaded}/{len(math_data)} problems")
+    print(f"\n✅ Upload complete! Uploaded: {total_uploaded}/{stats.total} problems")
+    stats.print_summary()
     
     # Report failures
     if failed_batches:
@@ -189,7 +185,8 @@ def setup_qdrant_cloud():
         collection_info = client.get_collection(collection_name=collection_name)
         print(f"\n📊 Collection Statistics:")
         print(f"   Total vectors: {collection_info.points_count}")
-        print(f"   Vector dimension: {embedding_dim}")
+        print(f"   Vectors: problem + full, dimension {embedding_dim}")
+        print(f"   Quantization: {quantization}")
         print(f"   Distance metric: COSINE")
     except Exception as e:
         print(f"⚠️  Could not retrieve stats: {e}")
@@ -209,7 +206,7 @@ def setup_qdrant_cloud():
             
             results = client.search(
                 collection_name=collection_name,
-                query_vector=query_vector,
+                query_vector=(VECTOR_PROBLEM, query_vector),
                 limit=2
             )
             
@@ -230,12 +227,17 @@ def setup_qdrant_cloud():
     return client
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload the KB dataset to Qdrant Cloud")
+    parser.add_argument("--dataset", type=Path, help="Dataset .jsonl (default: data/math_kb.jsonl)")
+    args = parser.parse_args()
+
     try:
         print("="*70)
         print("           QDRANT CLOUD UPLOAD - FIXED VERSION")
         print("="*70)
         print("\nFeatures:")
         print("  ✓ Numeric timeout (180 seconds)")
+        print("  ✓ Named vectors: problem-only + full text")
         print("  ✓ Batch size: 100 points")
         print("  ✓ Rate limiting: 500ms between batches")
         print("  ✓ Retry logic: 3 attempts with exponential backoff")
@@ -243,7 +245,7 @@ if __name__ == "__main__":
         print("\nEstimated time: 15-20 minutes for 12,500 problems")
         print("="*70 + "\n")
         
-        client = setup_qdrant_cloud()
+        client = setup_qdrant_cloud(args.dataset)
         
         print("\n" + "="*70)
         print("           🎉 SUCCESS! Qdrant Cloud Ready")